@@ -0,0 +1,276 @@
+"""
+Columnar export of scoring history (PredictionLog and CreditRequest rows) for
+offline analysis.
+
+Rows are streamed with QuerySet.iterator(), which uses a server-side cursor
+on PostgreSQL, and written `chunk_size` rows per row group into one file per
+table and day (UTC) of a run, named after the file's first row:
+
+    <out>/prediction_logs/date=2026-10-18/part-000000012345.parquet
+    <out>/credit_requests/date=2026-10-18/part-20261018T040000123456-000000000678.parquet
+
+The partitions are hive-style, so pyarrow.dataset, pandas and DuckDB read a
+table directory as one dataset with a `date` column. Memory is bounded by
+`chunk_size` rows, whatever the table size.
+
+JSON columns become typed columns:
+- explanation / attributions: the top `drivers` entries by |impact| as
+  driver_<i>_feature / driver_<i>_impact (attribution_<i>_... for SHAP),
+  plus n_drivers
+- meta: the keys the scoring code writes (meta_request_ip, meta_updated_via,
+  meta_applicant_type, ...) and the scoring inputs in meta["raw_features"]
+  as feature_<name>. Anything else is kept as JSON text in meta_extra.
+  Values that don't fit the column type are null.
+
+Incremental runs: <out>/_watermarks.json keeps the last exported position per
+table. Prediction logs are append-only and resume by id. Credit requests
+change, so they resume by (updated_at, id): an updated request is exported
+again under its new updated_at day, so keep the latest updated_at per id.
+Rows younger than `lag` seconds are left for the next run, so rows from
+transactions still in flight aren't skipped. The watermark advances as
+each file is completed, so a failed run resumes after its last complete file.
+A run that dies between renaming a file into place and saving the watermark
+starts again at the same row and so rewrites the same file, rather than
+exporting its rows a second time under a new name.
+"""
+import json
+import os
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.individuals.models import PredictionLog
+
+from .models import CreditRequest
+
+WATERMARK_FILE = "_watermarks.json"
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+# scoring inputs recorded in PredictionLog.meta["raw_features"] (see scoring.build_features)
+FEATURES = [
+    ("yearly_income", float), ("existing_debt", float), ("requested_amount", float), ("collateral_value", float),
+    ("credit_history_score", float), ("criminal_history", bool),
+    ("revenue", float), ("net_income", float), ("assets", float), ("liabilities", float),
+]
+META_FIELDS = [
+    ("request_ip", str), ("user_agent", str), ("updated_via", str), ("applicant_type", str),
+    ("requested_amount", float), ("term_months", int),
+]
+
+
+def _coerce(value: Any, kind: type) -> Any:
+    if value is None:
+        return None
+    try:
+        if kind is bool:
+            return value if isinstance(value, bool) else None
+        if kind is str:
+            return str(value)
+        return kind(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def _driver_columns(prefix: str, drivers: int) -> List[Tuple[str, str]]:
+    columns = [(f"n_{prefix}s", "int32")]
+    for i in range(1, drivers + 1):
+        columns += [(f"{prefix}_{i}_feature", "string"), (f"{prefix}_{i}_impact", "float64")]
+    return columns
+
+
+def _flatten_drivers(prefix: str, items: Any, drivers: int) -> Dict[str, Any]:
+    row = {f"n_{prefix}s": len(items) if isinstance(items, list) else None}
+    items = [item for item in items if isinstance(item, dict)] if isinstance(items, list) else []
+    ranked = sorted(items, key=lambda item: -abs(_coerce(item.get("impact"), float) or 0.0))
+    for i in range(1, drivers + 1):
+        item = ranked[i - 1] if i <= len(ranked) else {}
+        row[f"{prefix}_{i}_feature"] = _coerce(item.get("feature"), str)
+        row[f"{prefix}_{i}_impact"] = _coerce(item.get("impact"), float)
+    return row
+
+
+def _flatten_meta(meta: Any) -> Dict[str, Any]:
+    meta = meta if isinstance(meta, dict) else {}
+    raw = meta.get("raw_features") if isinstance(meta.get("raw_features"), dict) else {}
+    row = {f"meta_{name}": _coerce(meta.get(name), kind) for name, kind in META_FIELDS}
+    row.update({f"feature_{name}": _coerce(raw.get(name), kind) for name, kind in FEATURES})
+    known = {name for name, _ in META_FIELDS} | {"raw_features"}
+    extra = {key: value for key, value in meta.items() if key not in known}
+    row["meta_extra"] = json.dumps(extra, default=str, sort_keys=True) if extra else None
+    return row
+
+
+class TableSpec:
+    """How one table is queried, flattened and watermarked."""
+    def __init__(self, name: str, columns: List[Tuple[str, str]], rows: Callable, flatten: Callable,
+                 timestamp: str, position: Callable, part_name: Callable):
+        self.name = name
+        self.columns = columns  # (name, arrow type name), without `date`
+        self.rows = rows  # (watermark, upper bound, chunk_size) -> iterator of .values() dicts
+        self.flatten = flatten  # .values() dict -> output row
+        self.timestamp = timestamp  # column that picks the day partition
+        self.position = position  # .values() dict -> watermark
+        self.part_name = part_name  # first .values() dict of a file -> its name, "part-<name>.<ext>"
+
+
+_LOG_FIELDS = ("id", "created_at", "profile_id", "credit_request_id", "score", "model_version",
+               "explanation", "attributions", "meta")
+
+
+def _log_rows(watermark: Dict[str, Any], upper: datetime, chunk_size: int) -> Iterator[Dict[str, Any]]:
+    rows = (
+        PredictionLog.objects.filter(id__gt=watermark.get("id", 0))
+        .order_by("id").values(*_LOG_FIELDS).iterator(chunk_size=chunk_size)
+    )
+    for row in rows:
+        # ids follow insertion order; stop (rather than skip) so the id watermark never passes a young row
+        if row["created_at"] > upper:
+            return
+        yield row
+
+
+def _request_rows(watermark: Dict[str, Any], upper: datetime, chunk_size: int) -> Iterator[Dict[str, Any]]:
+    qs = CreditRequest.objects.filter(updated_at__lte=upper)
+    if watermark:
+        updated_at = datetime.fromisoformat(watermark["updated_at"])
+        qs = qs.filter(updated_at__gte=updated_at).filter(Q(updated_at__gt=updated_at) | Q(id__gt=watermark["id"]))
+    fields = ("id", "applicant_type", "individual_id", "company_id", "requested_amount", "term_months", "status",
+              "score", "model_version", "scoring_status", "explanation", "created_at", "updated_at")
+    return qs.order_by("updated_at", "id").values(*fields).iterator(chunk_size=chunk_size)
+
+
+def table_specs(drivers: int = 3) -> Dict[str, TableSpec]:
+    log_columns = [
+        ("id", "int64"), ("created_at", "timestamp"), ("profile_id", "int64"), ("credit_request_id", "int64"),
+        ("score", "int32"), ("model_version", "string"),
+        *_driver_columns("driver", drivers), *_driver_columns("attribution", drivers),
+        *[(f"meta_{name}", {str: "string", float: "float64", int: "int64"}[kind]) for name, kind in META_FIELDS],
+        *[(f"feature_{name}", "bool" if kind is bool else "float64") for name, kind in FEATURES],
+        ("meta_extra", "string"),
+    ]
+    request_columns = [
+        ("id", "int64"), ("applicant_type", "string"), ("individual_id", "int64"), ("company_id", "int64"),
+        ("requested_amount", "int64"), ("term_months", "int32"), ("status", "string"), ("score", "int32"),
+        ("model_version", "string"), ("scoring_status", "string"), ("created_at", "timestamp"),
+        ("updated_at", "timestamp"), *_driver_columns("driver", drivers),
+    ]
+
+    def flatten_log(row):
+        out = {name: row[name] for name in _LOG_FIELDS[:6]}
+        out.update(_flatten_drivers("driver", row["explanation"], drivers))
+        out.update(_flatten_drivers("attribution", row["attributions"], drivers))
+        out.update(_flatten_meta(row["meta"]))
+        return out
+
+    def flatten_request(row):
+        out = {name: value for name, value in row.items() if name != "explanation"}
+        out.update(_flatten_drivers("driver", row["explanation"], drivers))
+        return out
+
+    return {
+        "prediction_logs": TableSpec("prediction_logs", log_columns, _log_rows, flatten_log, "created_at",
+                                     lambda row: {"id": row["id"]}, lambda row: f"{row['id']:012d}"),
+        "credit_requests": TableSpec("credit_requests", request_columns, _request_rows, flatten_request, "updated_at",
+                                     lambda row: {"updated_at": row["updated_at"].isoformat(), "id": row["id"]},
+                                     lambda row: f"{row['updated_at'].astimezone(dt_timezone.utc):%Y%m%dT%H%M%S%f}"
+                                                 f"-{row['id']:012d}"),
+    }
+
+
+def load_watermarks(out_dir: str) -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(os.path.join(out_dir, WATERMARK_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_watermarks(out_dir: str, watermarks: Dict[str, Dict[str, Any]]) -> None:
+    path = os.path.join(out_dir, WATERMARK_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(watermarks, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+class _PartitionFile:
+    """
+    One day's output file, written to a temp name and renamed into place on
+    close. The temp name starts with "_", which pyarrow / DuckDB dataset
+    discovery skips, so a crashed run doesn't leave a truncated file readers pick up.
+    """
+    def __init__(self, path: str, schema, fmt: str):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.tmp_path = os.path.join(os.path.dirname(path), "_" + os.path.basename(path) + ".tmp")
+        if fmt == "parquet":
+            self._writer = pq.ParquetWriter(self.tmp_path, schema)
+        else:
+            self._sink = pa.OSFile(self.tmp_path, "wb")
+            self._writer = pa.ipc.new_file(self._sink, schema)
+        self.fmt = fmt
+
+    def write(self, table) -> None:
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        self._writer.close()
+        if self.fmt != "parquet":
+            self._sink.close()
+        os.replace(self.tmp_path, self.path)
+
+
+def export_table(spec: TableSpec, out_dir: str, watermarks: Dict[str, Dict[str, Any]], fmt: str = "parquet",
+                 chunk_size: int = 50000, lag: float = 60) -> Dict[str, Any]:
+    """
+    Export the rows of `spec` past its watermark into day partitions under
+    `out_dir`, saving the watermark after each completed file. Returns rows,
+    files and days written.
+    """
+    import pyarrow as pa
+
+    types = {"int64": pa.int64(), "int32": pa.int32(), "float64": pa.float64(), "string": pa.string(),
+             "bool": pa.bool_(), "timestamp": pa.timestamp("us", tz="UTC")}
+    schema = pa.schema([(name, types[kind]) for name, kind in spec.columns])
+    names = [name for name, _ in spec.columns]
+    upper = timezone.now() - timedelta(seconds=lag)
+
+    rows_written = 0
+    days: List[str] = []
+    current_day = partition = last_row = None
+    buffer: List[Dict[str, Any]] = []
+
+    def flush():
+        if buffer:
+            partition.write(pa.Table.from_pylist(buffer, schema=schema))
+            buffer.clear()
+
+    def finish():
+        flush()
+        partition.close()
+        watermarks[spec.name] = spec.position(last_row)
+        save_watermarks(out_dir, watermarks)
+
+    for row in spec.rows(watermarks.get(spec.name, {}), upper, chunk_size):
+        day = row[spec.timestamp].astimezone(dt_timezone.utc).date().isoformat()
+        if day != current_day:
+            if partition is not None:
+                finish()
+            current_day = day
+            days.append(day)
+            # the first row follows the watermark, so a run restarted from it rewrites this file
+            path = os.path.join(out_dir, spec.name, f"date={day}", f"part-{spec.part_name(row)}{FORMATS[fmt]}")
+            partition = _PartitionFile(path, schema, fmt)
+        flat = spec.flatten(row)
+        buffer.append({name: flat.get(name) for name in names})
+        last_row = row
+        rows_written += 1
+        if len(buffer) >= chunk_size:
+            flush()
+    if partition is not None:
+        finish()
+    return {"rows": rows_written, "files": len(days), "days": days}
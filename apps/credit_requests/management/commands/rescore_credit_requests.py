@@ -0,0 +1,41 @@
+"""
+Rescore the pending credit request backlog from the command line, spreading
+the scoring over a pool of worker processes.
+
+Usage: python manage.py rescore_credit_requests [--workers 8] [--chunk-size 4000] [--limit N] [--explain top_k]
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.scoring_engine.pool import default_workers
+from tasks.tasks import rescore_pending_credit_requests
+
+
+class Command(BaseCommand):
+    help = "Rescore pending credit requests whose inputs or model changed, using a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=None,
+                            help="scoring processes (default SCORING_POOL_WORKERS or one per CPU; 0 = this process)")
+        parser.add_argument("--chunk-size", type=int, default=None,
+                            help="rows loaded and saved per transaction (default 500 per worker)")
+        parser.add_argument("--limit", type=int, default=None, help="stop after this many rows")
+        parser.add_argument("--after-id", type=int, default=0, help="start after this credit request id")
+        parser.add_argument("--explain", default=None, help="full, top_k or none (default RESCORE_EXPLAIN)")
+
+    def handle(self, *args, **options):
+        workers = default_workers() if options["workers"] is None else options["workers"]
+        if workers < 0:
+            raise CommandError("--workers must be >= 0")
+        chunk_size = options["chunk_size"] or 500 * max(workers, 1)
+        try:
+            # run in this process, without a time budget (nothing is re-enqueued)
+            summary = rescore_pending_credit_requests(
+                limit=options["limit"], chunk_size=chunk_size, after_id=options["after_id"],
+                time_budget=None, explain=options["explain"], workers=workers,
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(
+            f"processed={summary['processed']} failed={summary['failed']} skipped={summary['skipped']} "
+            f"cursor={summary['cursor']} rows/sec={summary['rows_per_sec']}"
+        )
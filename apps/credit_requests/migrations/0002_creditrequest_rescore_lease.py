@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_requests', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='creditrequest',
+            name='rescore_lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='creditrequest',
+            name='rescore_lease_token',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_requests', '0002_creditrequest_rescore_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='creditrequest',
+            name='scoring_status',
+            field=models.CharField(blank=True, choices=[('queued', 'Queued'), ('scored', 'Scored'), ('failed', 'Failed')], max_length=16, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_requests', '0003_creditrequest_scoring_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='creditrequest',
+            name='feature_fingerprint',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
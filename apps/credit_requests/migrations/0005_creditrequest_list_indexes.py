@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0001_initial'),
+        ('credit_requests', '0004_creditrequest_feature_fingerprint'),
+        ('individuals', '0004_predictionlog_attributions'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='creditrequest',
+            options={'ordering': ['-created_at', '-id'], 'verbose_name': 'Credit Request', 'verbose_name_plural': 'Credit Requests'},
+        ),
+        migrations.AddIndex(
+            model_name='creditrequest',
+            index=models.Index(fields=['created_at', 'id'], name='creditreq_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='creditrequest',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='creditreq_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='creditrequest',
+            index=models.Index(fields=['applicant_type', 'created_at', 'id'], name='creditreq_type_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='creditrequest',
+            index=models.Index(fields=['score'], name='creditreq_score_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0001_initial'),
+        ('credit_requests', '0005_creditrequest_list_indexes'),
+        ('individuals', '0005_predictionlog_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='creditrequest',
+            index=models.Index(fields=['updated_at', 'id'], name='creditreq_updated_id_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0001_initial'),
+        ('credit_requests', '0006_creditrequest_updated_index'),
+        ('individuals', '0005_predictionlog_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='creditrequest',
+            name='creditreq_score_idx',
+        ),
+        migrations.AddIndex(
+            model_name='creditrequest',
+            index=models.Index(fields=['score', 'created_at', 'id'], name='creditreq_score_created_idx'),
+        ),
+    ]
@@ -17,6 +17,15 @@ class CreditRequest(models.Model):
         (STATUS_REJECTED, "Rejected"),
     ]
 
+    SCORING_QUEUED = "queued"
+    SCORING_DONE = "scored"
+    SCORING_FAILED = "failed"
+    SCORING_STATUS_CHOICES = [
+        (SCORING_QUEUED, "Queued"),
+        (SCORING_DONE, "Scored"),
+        (SCORING_FAILED, "Failed"),
+    ]
+
     applicant_type = models.CharField(max_length=20, choices=APPLICANT_CHOICES)
     # Use "app_label.ModelName" strings for lazy references
     individual = models.ForeignKey(
@@ -43,14 +52,31 @@ class CreditRequest(models.Model):
     score = models.IntegerField(null=True, blank=True)
     model_version = models.CharField(max_length=128, null=True, blank=True)
     explanation = models.JSONField(null=True, blank=True)  # store last prediction explanation
+    # null = scored inline (or never scored); set when scoring runs in the background
+    scoring_status = models.CharField(max_length=16, choices=SCORING_STATUS_CHOICES, null=True, blank=True)
+    # sha256 of the scoring inputs + model version behind `score`; unchanged means no rescore is needed
+    feature_fingerprint = models.CharField(max_length=64, null=True, blank=True)
+
+    # Lease held by a rescoring worker so overlapping rescoring runs don't score the same row twice
+    rescore_lease_token = models.CharField(max_length=64, null=True, blank=True)
+    rescore_lease_expires_at = models.DateTimeField(null=True, blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ["-created_at"]
+        ordering = ["-created_at", "-id"]
         verbose_name = "Credit Request"
         verbose_name_plural = "Credit Requests"
+        # keyset pagination of the list endpoint, unfiltered and per filter (see pagination.py)
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="creditreq_created_id_idx"),
+            models.Index(fields=["status", "created_at", "id"], name="creditreq_status_created_idx"),
+            models.Index(fields=["applicant_type", "created_at", "id"], name="creditreq_type_created_idx"),
+            models.Index(fields=["score", "created_at", "id"], name="creditreq_score_created_idx"),
+            # incremental history exports (history_export.py)
+            models.Index(fields=["updated_at", "id"], name="creditreq_updated_id_idx"),
+        ]
 
     def __str__(self):
         return f"CreditRequest({self.id}) {self.applicant_type} amount={self.requested_amount}"
\ No newline at end of file
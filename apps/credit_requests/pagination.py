@@ -0,0 +1,93 @@
+"""
+Keyset pagination for the credit request listing.
+
+Pages are ordered newest first by (created_at, id), and the cursor is the
+(created_at, id) of the last row served. The next page is
+"created_at <= c AND (created_at < c OR id < i) ORDER BY created_at DESC, id DESC
+LIMIT n": the first condition bounds the index range scan and the second only
+breaks ties. Page 1000 costs the same as page 1, since there is no OFFSET and
+no COUNT(*). The scan needs an index on (created_at, id), or on
+(<filter column>, created_at, id) for filtered listings (see CreditRequest.Meta.indexes).
+A score range can't be read in page order from (score, created_at, id), so the
+view filters it on "score + 0" and the page walks (created_at, id) instead,
+checking the score per row; a single score (score_min == score_max) uses the index.
+
+Response: {"next": <url or null>, "results": [...]}. The cursor is opaque
+(url-safe base64); a malformed one is a 400.
+"""
+import base64
+import binascii
+from collections import OrderedDict
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import ParseError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+
+    def get_page_size(self, request) -> int:
+        default = getattr(settings, "CREDIT_REQUEST_PAGE_SIZE", 50)
+        maximum = getattr(settings, "CREDIT_REQUEST_MAX_PAGE_SIZE", 500)
+        raw = request.query_params.get(self.page_size_query_param)
+        if raw is None:
+            return default
+        try:
+            size = int(raw)
+        except ValueError:
+            raise ParseError("page_size must be a positive integer.")
+        if size < 1:
+            raise ParseError("page_size must be a positive integer.")
+        return min(size, maximum)
+
+    @staticmethod
+    def encode_cursor(created_at: datetime, pk: int) -> str:
+        return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{pk}".encode()).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+            created_at, pk = raw.rsplit("|", 1)
+            return datetime.fromisoformat(created_at), int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise ParseError("Invalid cursor.")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        size = self.get_page_size(request)
+        queryset = queryset.order_by("-created_at", "-id")
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            created_at, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(created_at__lte=created_at).filter(Q(created_at__lt=created_at) | Q(id__lt=pk))
+        rows = list(queryset[:size + 1])
+        self.next_cursor = None
+        if len(rows) > size:
+            rows = rows[:size]
+            self.next_cursor = self.encode_cursor(rows[-1].created_at, rows[-1].pk)
+        return rows
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([("next", self.get_next_link()), ("results", data)]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
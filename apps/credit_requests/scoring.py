@@ -0,0 +1,206 @@
+"""
+Helpers to turn CreditRequest rows into scoring features and score them in bulk.
+Callers should select_related("individual", "company") to avoid a query per row.
+"""
+import logging
+from datetime import timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.individuals.models import PredictionLog
+from apps.scoring_engine.attributions import attribution_meta
+from apps.scoring_engine.ml.risk_model import (
+    current_model_version, feature_fingerprint, predict_individual_risk, predict_company_risk,
+    predict_individual_risk_batch, predict_company_risk_batch,
+)
+
+from .models import CreditRequest
+
+logger = logging.getLogger(__name__)
+
+
+def build_features(cr: CreditRequest) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """Return (applicant_type, features) for a credit request, or (None, None) if it can't be scored."""
+    if cr.applicant_type == CreditRequest.APPLICANT_INDIVIDUAL and cr.individual:
+        p = cr.individual
+        return CreditRequest.APPLICANT_INDIVIDUAL, {
+            "yearly_income": p.yearly_income,
+            "existing_debt": p.existing_debt,
+            "requested_amount": cr.requested_amount,
+            "collateral_value": p.collateral_value,
+            "credit_history_score": p.credit_history_score,
+            "criminal_history": p.criminal_history,
+        }
+    if cr.applicant_type == CreditRequest.APPLICANT_COMPANY and cr.company:
+        c = cr.company
+        return CreditRequest.APPLICANT_COMPANY, {
+            "revenue": c.revenue,
+            "net_income": c.net_income,
+            "assets": c.assets,
+            "liabilities": c.liabilities,
+            "requested_amount": cr.requested_amount,
+        }
+    return None, None
+
+
+def fingerprint(cr: CreditRequest, model_version: str) -> Optional[str]:
+    """Feature fingerprint of the request's current scoring inputs for `model_version`."""
+    kind, features = build_features(cr)
+    if kind is None:
+        return None
+    return feature_fingerprint(kind, features, model_version)
+
+
+def log_meta(cr: CreditRequest, model_version: str, meta: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """PredictionLog meta for a scored request (model-scored ones also keep their inputs for attributions)."""
+    kind, features = build_features(cr)
+    if kind is None:
+        return meta
+    return attribution_meta(kind, features, model_version, meta)
+
+
+def needs_rescore(cr: CreditRequest) -> bool:
+    """
+    False when the stored score was computed from the same inputs with the
+    model that would score it now; unscorable requests never need a rescore.
+    """
+    kind, features = build_features(cr)
+    if kind is None:
+        return False
+    if cr.score is None or not cr.feature_fingerprint:
+        return True
+    return feature_fingerprint(kind, features, current_model_version(kind)) != cr.feature_fingerprint
+
+
+_SCORERS = {
+    CreditRequest.APPLICANT_INDIVIDUAL: predict_individual_risk,
+    CreditRequest.APPLICANT_COMPANY: predict_company_risk,
+}
+
+_BATCH_SCORERS = {
+    CreditRequest.APPLICANT_INDIVIDUAL: predict_individual_risk_batch,
+    CreditRequest.APPLICANT_COMPANY: predict_company_risk_batch,
+}
+
+
+def score_one(cr: CreditRequest, explain="full") -> Optional[Tuple[int, Optional[list], str]]:
+    """
+    Score a single credit request with the single-record scorers. Works on
+    unsaved instances, so views can score before their first write.
+    Returns (score, explanation, model_version) or None if it can't be scored;
+    `explain` is passed to the scorer (see risk_model.explain_mode).
+    """
+    kind, features = build_features(cr)
+    if kind is None:
+        return None
+    score, explanation, model_ver = _SCORERS[kind](features, explain=explain)
+    if score is None:
+        return None
+    return int(score), explanation, model_ver
+
+
+def score_credit_requests(credit_requests: Iterable[CreditRequest], explain="full", pool=None) -> List[Tuple[CreditRequest, int, Optional[list], str]]:
+    """
+    Score many credit requests with one batch call per applicant type.
+    Returns (credit_request, score, explanation, model_version) in input order;
+    requests without a linked profile are skipped. With explain=False the
+    explanation is None (nothing is built or encoded); "top_k" keeps the main drivers.
+    A ScoringPool (apps.scoring_engine.pool) spreads each batch over its worker processes.
+    """
+    grouped: Dict[str, List[Tuple[int, CreditRequest, Dict[str, Any]]]] = {}
+    position = 0
+    for cr in credit_requests:
+        kind, features = build_features(cr)
+        if kind is not None:
+            grouped.setdefault(kind, []).append((position, cr, features))
+            position += 1
+
+    results: List[Optional[Tuple[CreditRequest, int, list, str]]] = [None] * position
+    for kind, items in grouped.items():
+        records = [features for _, _, features in items]
+        scored = pool.score(kind, records, explain=explain) if pool is not None else _BATCH_SCORERS[kind](records, explain=explain)
+        for (pos, cr, _), (score, explanation, model_ver) in zip(items, scored):
+            results[pos] = (cr, score, explanation, model_ver)
+    return results
+
+
+def claim_for_rescore(queryset, token: str, lease_seconds: int) -> List[CreditRequest]:
+    """
+    Lease the rows of `queryset` that no live lease holds to `token` for
+    `lease_seconds`, and return them loaded with their profiles, in id order.
+    Rows another run holds are left out; save them with save_scores(...,
+    lease_token=token) and call release_lease(token) for the rest.
+    """
+    now = timezone.now()
+    queryset.filter(Q(rescore_lease_expires_at__isnull=True) | Q(rescore_lease_expires_at__lt=now)).update(
+        rescore_lease_token=token, rescore_lease_expires_at=now + timedelta(seconds=lease_seconds)
+    )
+    return list(
+        CreditRequest.objects.filter(rescore_lease_token=token)
+        .select_related("individual", "company")
+        .defer("explanation")
+        .order_by("id")
+    )
+
+
+def release_lease(token: str) -> int:
+    """Drop the lease `token` still holds (rows that weren't saved)."""
+    return CreditRequest.objects.filter(rescore_lease_token=token).update(
+        rescore_lease_token=None, rescore_lease_expires_at=None
+    )
+
+
+def save_scores(scored: Sequence[Tuple[CreditRequest, int, list, str]], meta: Optional[Dict[str, Any]] = None,
+                lease_token: Optional[str] = None) -> int:
+    """
+    Persist the output of score_credit_requests: one bulk_update of the score
+    fields (releasing any rescoring lease) and one bulk_create of PredictionLog
+    rows, in a single transaction. Returns the number of requests saved.
+
+    With `lease_token`, only rows that lease still holds are written: the rows
+    are locked and checked inside the transaction, and results for rows whose
+    lease expired (and may have been claimed by another run) are dropped.
+    """
+    scored = list(scored)
+    with transaction.atomic():
+        if lease_token is not None:
+            held = set(
+                CreditRequest.objects.select_for_update()
+                .filter(id__in=[cr.id for cr, *_ in scored], rescore_lease_token=lease_token)
+                .values_list("id", flat=True)
+            )
+            if len(held) < len(scored):
+                logger.warning("Lease %s lost on %d credit requests; dropping their scores", lease_token, len(scored) - len(held))
+                scored = [item for item in scored if item[0].id in held]
+        if not scored:
+            return 0
+
+        now = timezone.now()
+        logs = []
+        for cr, score, explanation, model_ver in scored:
+            cr.score = int(score) if score is not None else None
+            cr.model_version = model_ver
+            cr.explanation = explanation
+            cr.scoring_status = CreditRequest.SCORING_DONE
+            cr.feature_fingerprint = fingerprint(cr, model_ver)
+            cr.rescore_lease_token = None
+            cr.rescore_lease_expires_at = None
+            cr.updated_at = now
+            logs.append(PredictionLog(
+                profile_id=cr.individual_id,
+                credit_request=cr,
+                score=cr.score,
+                model_version=model_ver,
+                explanation=explanation,
+                meta=log_meta(cr, model_ver, meta),
+            ))
+        CreditRequest.objects.bulk_update(
+            [cr for cr, *_ in scored],
+            ["score", "model_version", "explanation", "scoring_status", "feature_fingerprint",
+             "rescore_lease_token", "rescore_lease_expires_at", "updated_at"],
+        )
+        PredictionLog.objects.bulk_create(logs)
+    return len(scored)
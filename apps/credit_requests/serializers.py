@@ -3,11 +3,18 @@ from .models import CreditRequest
 from apps.individuals.models import IndividualCreditProfile
 from apps.companies.models import CompanyCreditProfile
 
+# columns loaded for the list endpoint (see CreditRequestListSerializer)
+LIST_FIELDS = (
+    'id', 'applicant_type', 'individual', 'company', 'requested_amount', 'term_months', 'status',
+    'score', 'model_version', 'scoring_status', 'created_at', 'updated_at',
+)
+
+
 class CreditRequestSerializer(serializers.ModelSerializer):
     class Meta:
         model=CreditRequest
-        fields='__all__'
-        read_only_fields=('id', 'score', 'model_version', 'explanation', 'created_at', 'updated_at')
+        exclude=('rescore_lease_token', 'rescore_lease_expires_at', 'feature_fingerprint')
+        read_only_fields=('id', 'score', 'model_version', 'explanation', 'scoring_status', 'created_at', 'updated_at')
 
     def validate(self, data):
         applicant_type = data.get('applicant_type') or getattr(self.instance, 'applicant_type', None)
@@ -38,4 +45,12 @@ class CreditRequestSerializer(serializers.ModelSerializer):
         if req_amt is None or req_amt <= 0:
             raise serializers.ValidationError({"requested_amount": "requested_amount must be > 0."})
 
-        return data
\ No newline at end of file
+        return data
+
+
+class CreditRequestListSerializer(serializers.ModelSerializer):
+    """Listing rows: the scalar columns only; the explanation JSON is on the detail endpoint."""
+    class Meta:
+        model=CreditRequest
+        fields=LIST_FIELDS
+        read_only_fields=LIST_FIELDS
@@ -1,8 +1,22 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework.test import APIClient
 from django.urls import reverse
 from apps.individuals.models import IndividualCreditProfile
 from apps.companies.models import CompanyCreditProfile
+from apps.individuals.models import PredictionLog
+from .models import CreditRequest
 
 class CreditRequestTests(TestCase):
     def setUp(self):
@@ -48,4 +62,389 @@ class CreditRequestTests(TestCase):
         }
         resp = self.client.post(self.list_url, payload, format='json')
         self.assertEqual(resp.status_code, 201)
-        self.assertIn('score', resp.data)
\ No newline at end of file
+        self.assertIn('score', resp.data)
+
+
+    def test_create_writes_score_and_log_in_one_transaction(self):
+        payload = {
+            "applicant_type": "individual",
+            "individual": self.individual.id,
+            "requested_amount": 200000,
+            "term_months": 12
+        }
+        # SELECT profile (validation), SAVEPOINT, INSERT request (score included), INSERT log, RELEASE
+        with self.assertNumQueries(5):
+            resp = self.client.post(self.list_url, payload, format='json')
+        self.assertEqual(resp.status_code, 201)
+        cr = CreditRequest.objects.get(id=resp.data['id'])
+        self.assertEqual(cr.scoring_status, CreditRequest.SCORING_DONE)
+        log = PredictionLog.objects.get(credit_request=cr)
+        self.assertEqual((log.score, log.profile_id), (cr.score, self.individual.id))
+
+    def test_update_rescores_in_one_transaction(self):
+        resp = self.client.post(self.list_url, {
+            "applicant_type": "individual",
+            "individual": self.individual.id,
+            "requested_amount": 200000,
+            "term_months": 12
+        }, format='json')
+        url = reverse('creditrequest-detail', args=[resp.data['id']])
+        # SELECT request + profiles, SAVEPOINT, UPDATE request (score included), INSERT log, RELEASE
+        with self.assertNumQueries(5):
+            resp = self.client.patch(url, {"requested_amount": 900000}, format='json')
+        self.assertEqual(resp.status_code, 200)
+        logs = PredictionLog.objects.filter(credit_request_id=resp.data['id'])
+        self.assertEqual(logs.count(), 2)
+        self.assertEqual(logs.latest('id').score, resp.data['score'])
+
+    def test_update_without_scoring_changes_skips_rescore(self):
+        resp = self.client.post(self.list_url, {
+            "applicant_type": "company",
+            "company": self.company.id,
+            "requested_amount": 1000000,
+            "term_months": 24
+        }, format='json')
+        url = reverse('creditrequest-detail', args=[resp.data['id']])
+        # the company scorer doesn't read requested_amount, so neither change affects the score
+        # SELECT request + profiles, UPDATE request
+        with self.assertNumQueries(2):
+            resp = self.client.patch(url, {"term_months": 36, "requested_amount": 2000000}, format='json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(PredictionLog.objects.filter(credit_request_id=resp.data['id']).count(), 1)
+
+        CreditRequest.objects.filter(pk=resp.data['id']).update(feature_fingerprint='stale')
+        self.client.patch(url, {"term_months": 48}, format='json')
+        self.assertEqual(PredictionLog.objects.filter(credit_request_id=resp.data['id']).count(), 2)
+
+class AsyncCreditRequestScoringTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.list_url = reverse('creditrequest-list-create')
+        self.individual = IndividualCreditProfile.objects.create(
+            full_name="Async Individual",
+            yearly_income=1000000,
+            existing_debt=100000,
+            collateral_value=200000,
+            credit_history_score=650,
+            criminal_history=False
+        )
+        self.payload = {
+            "applicant_type": "individual",
+            "individual": self.individual.id,
+            "requested_amount": 200000,
+            "term_months": 12
+        }
+
+    def test_async_create_returns_status_url_and_scores_in_task(self):
+        from tasks.tasks import score_credit_request
+
+        with mock.patch('tasks.tasks.score_credit_request.delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(self.list_url + '?async=true', self.payload, format='json')
+        self.assertEqual(resp.status_code, 202)
+        self.assertIsNone(resp.data['score'])
+        self.assertEqual(resp.data['scoring_status'], CreditRequest.SCORING_QUEUED)
+        self.assertEqual(resp['Location'], resp.data['status_url'])
+        delay.assert_called_once_with(resp.data['id'])
+
+        status_url = reverse('creditrequest-score-status', args=[resp.data['id']])
+        self.assertEqual(self.client.get(status_url).data['scoring_status'], CreditRequest.SCORING_QUEUED)
+
+        result = score_credit_request.run(resp.data['id'])
+        self.assertIsNotNone(result['score'])
+        status_resp = self.client.get(status_url, {'wait': 1})
+        self.assertEqual(status_resp.data['scoring_status'], CreditRequest.SCORING_DONE)
+        self.assertEqual(status_resp.data['score'], result['score'])
+        self.assertEqual(PredictionLog.objects.filter(credit_request_id=resp.data['id']).count(), 1)
+
+    def test_prefer_header_opts_in(self):
+        with mock.patch('tasks.tasks.score_credit_request.delay'):
+            resp = self.client.post(self.list_url, self.payload, format='json', HTTP_PREFER='respond-async')
+        self.assertEqual(resp.status_code, 202)
+
+    def test_sync_mode_is_default(self):
+        with mock.patch('tasks.tasks.score_credit_request.delay') as delay:
+            resp = self.client.post(self.list_url, self.payload, format='json')
+        self.assertEqual(resp.status_code, 201)
+        self.assertIsNotNone(resp.data['score'])
+        delay.assert_not_called()
+
+    def test_task_marks_unscorable_request_failed(self):
+        from tasks.tasks import score_credit_request
+
+        cr = CreditRequest.objects.create(applicant_type="individual", requested_amount=1000,
+                                          scoring_status=CreditRequest.SCORING_QUEUED)
+        score_credit_request.run(cr.id)
+        resp = self.client.get(reverse('creditrequest-score-status', args=[cr.id]))
+        self.assertEqual(resp.data['scoring_status'], CreditRequest.SCORING_FAILED)
+
+
+class CreditRequestListTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.list_url = reverse('creditrequest-list-create')
+        self.individual = IndividualCreditProfile.objects.create(full_name="List Person", yearly_income=1000000)
+        self.company = CompanyCreditProfile.objects.create(company_name="List Co", revenue=5000000)
+        rows = []
+        for i in range(23):
+            if i % 3:
+                rows.append(CreditRequest(applicant_type="individual", individual=self.individual, requested_amount=1000 + i,
+                                          score=i * 4, explanation=[{"feature": "x", "impact": i}]))
+            else:
+                rows.append(CreditRequest(applicant_type="company", company=self.company, requested_amount=1000 + i,
+                                          score=i * 4, status=CreditRequest.STATUS_APPROVED))
+        self.rows = CreditRequest.objects.bulk_create(rows)
+        # ties on created_at are broken by id
+        CreditRequest.objects.filter(id__in=[r.id for r in self.rows[5:12]]).update(created_at=self.rows[5].created_at)
+
+    def _walk(self, params):
+        ids, url, pages = [], self.list_url, 0
+        while url:
+            resp = self.client.get(url, params if pages == 0 else None)
+            self.assertEqual(resp.status_code, 200)
+            ids += [item['id'] for item in resp.data['results']]
+            url, pages = resp.data['next'], pages + 1
+        return ids, pages
+
+    def test_pages_cover_every_row_once_newest_first(self):
+        ids, pages = self._walk({'page_size': 4})
+        expected = list(CreditRequest.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 6)
+
+    def test_list_rows_leave_out_the_explanation(self):
+        item = self.client.get(self.list_url).data['results'][0]
+        self.assertNotIn('explanation', item)
+        self.assertIn('score', item)
+        detail = self.client.get(reverse('creditrequest-detail', args=[item['id']])).data
+        self.assertIn('explanation', detail)
+
+    def test_filters(self):
+        ids, _ = self._walk({'status': 'approved', 'page_size': 3})
+        self.assertEqual(set(ids), {r.id for r in self.rows[::3]})
+        ids, _ = self._walk({'applicant_type': 'individual', 'score_min': 20, 'score_max': 60})
+        self.assertEqual(set(ids), {r.id for i, r in enumerate(self.rows) if i % 3 and 20 <= i * 4 <= 60})
+        ids, _ = self._walk({'score_min': 32, 'page_size': 2})
+        self.assertEqual(ids, list(CreditRequest.objects.filter(score__gte=32).values_list('id', flat=True)))
+        ids, _ = self._walk({'score_min': 40, 'score_max': 40})
+        self.assertEqual(ids, [self.rows[10].id])
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'reads the SQLite query plan')
+    def test_score_filters_are_served_in_page_order(self):
+        for params, index in (({'score_min': 40, 'score_max': 40}, 'creditreq_score_created_idx'),
+                              ({'score_min': 20, 'score_max': 60}, 'creditreq_created_id_idx')):
+            with self.subTest(params=params), CaptureQueriesContext(connection) as ctx:
+                self.client.get(self.list_url, params)
+            with connection.cursor() as cursor:
+                cursor.execute("EXPLAIN QUERY PLAN " + ctx.captured_queries[-1]['sql'])
+                plan = " ".join(str(row[-1]) for row in cursor.fetchall())
+            self.assertIn(index, plan)
+            self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_deep_pages_cost_one_query(self):
+        resp = self.client.get(self.list_url, {'page_size': 2})
+        for _ in range(5):
+            resp = self.client.get(resp.data['next'])
+        with self.assertNumQueries(1):
+            self.client.get(resp.data['next'])
+
+    def test_bad_parameters_are_rejected(self):
+        for params in ({'cursor': 'not-a-cursor'}, {'status': 'open'}, {'score_min': 'high'}, {'page_size': 0}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.list_url, params).status_code, 400)
+
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:
+    pyarrow = None
+
+
+@unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+class ExportScoringHistoryTests(TestCase):
+    def setUp(self):
+        self.out = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.out)
+        self.client = APIClient()
+        self.individual = IndividualCreditProfile.objects.create(
+            full_name="Export Person", yearly_income=1000000, existing_debt=100000, credit_history_score=700,
+        )
+        for amount in (100000, 200000, 300000):
+            self.client.post(reverse('creditrequest-list-create'), {
+                "applicant_type": "individual", "individual": self.individual.id, "requested_amount": amount,
+            }, format='json')
+        # one log from two days ago
+        old = PredictionLog.objects.order_by('id').first()
+        PredictionLog.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=2))
+        self.model_log = PredictionLog.objects.create(
+            profile=self.individual, score=40, model_version="joblib:m",
+            explanation=[{"feature": "model", "impact": 0, "reason": "scored by ML model"}],
+            attributions=[{"feature": "existing_debt", "impact": -0.2}, {"feature": "yearly_income", "impact": 0.7}],
+            meta={"applicant_type": "individual", "source": "batch",
+                  "raw_features": {"yearly_income": 1000000, "credit_history_score": "n/a", "criminal_history": False}},
+        )
+
+    def _export(self, *args):
+        out = StringIO()
+        call_command("export_scoring_history", "--out", self.out, "--lag", "0", *args, stdout=out)
+        return out.getvalue()
+
+    def _read(self, table):
+        import pyarrow.dataset as ds
+
+        return ds.dataset(os.path.join(self.out, table), format="parquet", partitioning="hive").to_table().to_pylist()
+
+    def test_exports_flattened_rows_by_day(self):
+        self.assertIn("prediction_logs: rows=4 files=2", self._export())
+        logs = {row["id"]: row for row in self._read("prediction_logs")}
+        self.assertEqual(len({str(row["date"]) for row in logs.values()}), 2)
+
+        scored = logs[self.model_log.id - 1]
+        explanation = PredictionLog.objects.get(pk=scored["id"]).explanation
+        self.assertEqual(scored["meta_requested_amount"], 300000.0)
+        self.assertEqual(scored["n_drivers"], len(explanation))
+        self.assertEqual(abs(scored["driver_1_impact"]), max(abs(item["impact"]) for item in explanation))
+
+        model = logs[self.model_log.id]
+        self.assertEqual((model["attribution_1_feature"], model["attribution_1_impact"]), ("yearly_income", 0.7))
+        self.assertEqual(model["n_attributions"], 2)
+        self.assertIsNone(model["attribution_3_feature"])
+        self.assertEqual(model["feature_yearly_income"], 1000000.0)
+        self.assertIsNone(model["feature_credit_history_score"])  # not a number
+        self.assertIs(model["feature_criminal_history"], False)
+        self.assertEqual(model["meta_applicant_type"], "individual")
+        self.assertEqual(model["meta_extra"], '{"source": "batch"}')
+
+        requests = self._read("credit_requests")
+        self.assertEqual(sorted(row["requested_amount"] for row in requests), [100000, 200000, 300000])
+        self.assertNotIn("explanation", requests[0])
+
+    def test_incremental_runs_export_only_new_rows(self):
+        self._export()
+        self.assertIn("prediction_logs: rows=0 files=0", self._export())
+
+        cr = CreditRequest.objects.order_by('id').first()
+        self.client.patch(reverse('creditrequest-detail', args=[cr.id]), {"requested_amount": 999999}, format='json')
+        output = self._export()
+        self.assertIn("prediction_logs: rows=1 files=1", output)
+        self.assertIn("credit_requests: rows=1 files=1", output)
+        exported = [row for row in self._read("credit_requests") if row["id"] == cr.id]
+        self.assertEqual(sorted(row["requested_amount"] for row in exported), [100000, 999999])
+
+        self.assertIn("prediction_logs: rows=5", self._export("--full", "--tables", "prediction_logs"))
+
+    def test_crashed_run_leaves_no_file_readers_pick_up(self):
+        from apps.credit_requests import history_export
+
+        with mock.patch.object(history_export._PartitionFile, "close", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self._export("--tables", "credit_requests")
+        leftovers = [name for _, _, names in os.walk(self.out) for name in names]
+        self.assertTrue(leftovers and all(name.startswith("_part-") for name in leftovers))
+
+        self.assertIn("credit_requests: rows=3 files=1", self._export("--tables", "credit_requests"))
+        self.assertEqual(len(self._read("credit_requests")), 3)
+
+    def test_run_that_died_before_saving_its_watermark_is_not_exported_twice(self):
+        from apps.credit_requests import history_export
+
+        with mock.patch.object(history_export, "save_watermarks", side_effect=OSError("killed")):
+            with self.assertRaises(OSError):
+                self._export("--tables", "prediction_logs")
+        self.assertEqual(len(self._read("prediction_logs")), 1)  # first file renamed, watermark not saved
+
+        self.assertIn("prediction_logs: rows=4 files=2", self._export("--tables", "prediction_logs"))
+        ids = [row["id"] for row in self._read("prediction_logs")]
+        self.assertEqual(sorted(ids), list(PredictionLog.objects.order_by("id").values_list("id", flat=True)))
+
+    def test_arrow_format(self):
+        import pyarrow as pa
+
+        self._export("--format", "arrow", "--tables", "credit_requests", "--chunk-size", "2")
+        paths = [os.path.join(root, name) for root, _, names in os.walk(self.out) for name in names if name.endswith(".arrow")]
+        self.assertEqual(len(paths), 1)
+        with pa.memory_map(paths[0]) as source:
+            table = pa.ipc.open_file(source).read_all()
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(str(table.schema.field("created_at").type), "timestamp[us, tz=UTC]")
+
+
+class ImportProfilesTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def _file(self, name, content):
+        path = os.path.join(self.dir, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def _import(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command("import_profiles", *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_rows_are_validated_imported_and_scored(self):
+        path = self._file("people.csv", (
+            "full_name,email,yearly_income,existing_debt,requested_amount,credit_history_score,criminal_history,salary,birth_date,score\n"
+            "Ann Lee,ann@example.com,50000,1000,20000,700,false,1234.50,1990-01-02,999\n"
+            ",not-an-email,12.5,0,1,1,maybe,1.234,1990-13-01,\n"
+            "Bob Ray,,60000.0,,10000,650,1,,,\n"
+        ))
+        rejects = os.path.join(self.dir, "rejects.csv")
+        out, err = self._import("individual", path, "--score", "--rejects", rejects)
+
+        self.assertIn("read=3 imported=2 rejected=1", out)
+        for message in ("full_name: This field is required.", "email: Enter a valid email address.",
+                        "yearly_income: A valid integer is required.", "criminal_history: Must be a valid boolean.",
+                        "salary: Ensure that there are no more than 2 decimal places.", "birth_date: Date has wrong format."):
+            self.assertIn(message, err)
+        with open(rejects) as f:
+            self.assertTrue(f.read().splitlines()[1].startswith("2,full_name"))
+
+        ann = IndividualCreditProfile.objects.get(full_name="Ann Lee")
+        self.assertEqual((ann.yearly_income, str(ann.salary), ann.birth_date.isoformat()), (50000, "1234.50", "1990-01-02"))
+        self.assertNotEqual(ann.score, 999)  # read-only column is ignored
+        self.assertIsNotNone(ann.model_version)
+        bob = IndividualCreditProfile.objects.get(full_name="Bob Ray")
+        self.assertEqual((bob.yearly_income, bob.existing_debt, bob.criminal_history), (60000, None, True))
+
+        log = PredictionLog.objects.get(profile=ann)
+        self.assertEqual((log.score, log.model_version), (ann.score, ann.model_version))
+        self.assertEqual(log.meta["updated_via"], "import_profiles")
+        self.assertEqual(log.meta["raw_features"]["requested_amount"], 20000)
+
+    def test_ndjson_companies_in_chunks(self):
+        path = self._file("companies.jsonl", "\n".join([
+            '{"company_name": "Acme", "revenue": 100, "net_income": -5, "financial_ratios": {"current": 1.5}}',
+            '{"company_name": "Negative", "revenue": -1}',
+            '{"company_name": "Odd", "status": "unknown"}',
+            '{"company_name": "Plain", "incorporated_date": "2001-02-03"}',
+        ]) + "\n")
+        out, err = self._import("company", path, "--chunk-size", "2")
+
+        self.assertIn("read=4 imported=2 rejected=2 chunks=2", out)
+        self.assertIn("line 2: revenue: Revenue must be non-negative.", err)
+        self.assertIn("line 3: status: must be one of", err)
+        acme = CompanyCreditProfile.objects.get(company_name="Acme")
+        self.assertEqual(acme.financial_ratios, {"current": 1.5})
+        self.assertEqual(acme.status, CompanyCreditProfile.STATUS_PENDING)
+        self.assertIsNone(acme.score)
+        self.assertEqual(CompanyCreditProfile.objects.get(company_name="Plain").incorporated_date.isoformat(), "2001-02-03")
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_parquet_dry_run_and_import(self):
+        import pandas as pd
+
+        path = os.path.join(self.dir, "companies.parquet")
+        pd.DataFrame([{"company_name": "Parquet Co", "revenue": 5000000, "assets": 100, "liabilities": 50}]).to_parquet(path)
+
+        out, _ = self._import("company", path, "--dry-run")
+        self.assertIn("Validated company profiles: read=1 imported=0", out)
+        self.assertFalse(CompanyCreditProfile.objects.exists())
+
+        self._import("company", path, "--score")
+        company = CompanyCreditProfile.objects.get()
+        self.assertEqual((company.revenue, company.assets), (5000000, 100))
+        self.assertIsNotNone(company.score)
@@ -1,7 +1,8 @@
 from django.urls import path
-from .views import CreditRequestListCreateView, CreditRequestDetailView
+from .views import CreditRequestListCreateView, CreditRequestDetailView, CreditRequestScoreStatusView
 
 urlpatterns = [
     path('', CreditRequestListCreateView.as_view(), name='creditrequest-list-create'),
     path('<int:pk>/', CreditRequestDetailView.as_view(), name='creditrequest-detail'),
+    path('<int:pk>/score/', CreditRequestScoreStatusView.as_view(), name='creditrequest-score-status'),
 ]
\ No newline at end of file
@@ -1,124 +1,202 @@
+import logging
+import time
+
 from rest_framework import generics, status
+from rest_framework.exceptions import ParseError
 from rest_framework.response import Response
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 
 from .models import CreditRequest
-from .serializers import CreditRequestSerializer
-
-# scoring functions
-from apps.scoring_engine.ml.risk_model import predict_individual_risk, predict_company_risk
+from .pagination import KeysetPagination
+from .scoring import fingerprint, log_meta, needs_rescore, score_one
+from .serializers import LIST_FIELDS, CreditRequestListSerializer, CreditRequestSerializer
 
 # Import PredictionLog to persist audit entries for credit requests
 from apps.individuals.models import PredictionLog
+from apps.individuals.prediction_logs import prediction_log_writer
+
+logger = logging.getLogger(__name__)
+
+_TRUTHY = ("1", "true", "yes", "on")
+
+
+def wants_async_scoring(request) -> bool:
+    """Opt-in per request: ?async=true or a `Prefer: respond-async` header (RFC 7240)."""
+    if request.query_params.get("async", "").lower() in _TRUTHY:
+        return True
+    return "respond-async" in request.headers.get("Prefer", "").lower()
+
+
+def _int_param(request, name):
+    raw = request.query_params.get(name)
+    if raw in (None, ""):
+        return None
+    try:
+        return int(raw)
+    except ValueError:
+        raise ParseError(f"{name} must be an integer.")
+
 
 class CreditRequestListCreateView(generics.ListCreateAPIView):
+    """
+    GET lists newest first with keyset pagination (?cursor=, ?page_size=; see
+    pagination.py) and the list serializer, which leaves out the explanation.
+    Filters: ?status=, ?applicant_type=, ?score_min= / ?score_max= (inclusive).
+    POST creates and scores a request (see create()).
+    """
     queryset = CreditRequest.objects.all()
     serializer_class = CreditRequestSerializer
+    pagination_class = KeysetPagination
 
-    def perform_create(self, serializer):
-        # Save initial record first (will be status=pending)
-        instance = serializer.save()
+    def get_serializer_class(self):
+        return CreditRequestListSerializer if self.request.method == "GET" else CreditRequestSerializer
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.request.method != "GET":
+            return qs
+        params = self.request.query_params
+        for name, choices in (("status", CreditRequest.STATUS_CHOICES), ("applicant_type", CreditRequest.APPLICANT_CHOICES)):
+            value = params.get(name)
+            if value:
+                if value not in dict(choices):
+                    raise ParseError(f"{name} must be one of: {', '.join(dict(choices))}.")
+                qs = qs.filter(**{name: value})
+        score_min, score_max = _int_param(self.request, "score_min"), _int_param(self.request, "score_max")
+        if score_min is not None and score_min == score_max:
+            # one score: the (score, created_at, id) index returns rows in page order
+            qs = qs.filter(score=score_min)
+        elif score_min is not None or score_max is not None:
+            # a range read from that index would be sorted in full for every page; "score + 0"
+            # can't use it, so pages walk the (created_at, id) order and check the score per row
+            qs = qs.alias(score_value=F("score") + 0)
+            if score_min is not None:
+                qs = qs.filter(score_value__gte=score_min)
+            if score_max is not None:
+                qs = qs.filter(score_value__lte=score_max)
+        return qs.only(*LIST_FIELDS)
+
+    def create(self, request, *args, **kwargs):
+        if not wants_async_scoring(request):
+            return super().create(request, *args, **kwargs)
 
-        # Build features from linked profile and request fields
+        # async mode: save as pending, score in a Celery worker, hand back a URL to poll
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        instance = serializer.save(scoring_status=CreditRequest.SCORING_QUEUED)
+        transaction.on_commit(lambda: self._dispatch_scoring(instance.pk))
+
+        status_url = request.build_absolute_uri(reverse('creditrequest-score-status', args=[instance.pk]))
+        data = dict(serializer.data, status_url=status_url)
+        headers = {"Location": status_url, "Preference-Applied": "respond-async"}
+        return Response(data, status=status.HTTP_202_ACCEPTED, headers=headers)
+
+    @staticmethod
+    def _dispatch_scoring(pk):
         try:
-            if instance.applicant_type == CreditRequest.APPLICANT_INDIVIDUAL and instance.individual:
-                p = instance.individual
-                features = {
-                    "yearly_income": p.yearly_income,
-                    "existing_debt": p.existing_debt,
-                    "requested_amount": instance.requested_amount,
-                    "collateral_value": p.collateral_value,
-                    "credit_history_score": p.credit_history_score,
-                    "criminal_history": p.criminal_history,
-                }
-                score, explanation, model_ver = predict_individual_risk(features)
-            elif instance.applicant_type == CreditRequest.APPLICANT_COMPANY and instance.company:
-                c = instance.company
-                features = {
-                    "revenue": c.revenue,
-                    "net_income": c.net_income,
-                    "assets": c.assets,
-                    "liabilities": c.liabilities,
-                    "requested_amount": instance.requested_amount,
-                }
-                score, explanation, model_ver = predict_company_risk(features)
-            else:
-                # nothing to score
-                score, explanation, model_ver = None, None, None
-        except Exception as exc:
-            # Do not block creation if scoring fails, but log/store nulls
-            score, explanation, model_ver = None, None, None
-
-        if score is not None:
-            instance.score = int(score)
-            instance.model_version = model_ver
-            instance.explanation = explanation
-            instance.save(update_fields=['score', 'model_version', 'explanation', 'updated_at'])
-
-            # create an audit log entry referencing the credit request (and profile if available)
-            try:
-                PredictionLog.objects.create(
-                    profile=instance.individual if instance.individual_id else None,
-                    credit_request=instance,
-                    score=int(score),
-                    model_version=model_ver,
-                    explanation=explanation,
-                    meta={
-                        "requested_amount": instance.requested_amount,
-                        "term_months": instance.term_months
-                    }
-                )
-            except Exception:
-                pass
+            from tasks.tasks import score_credit_request
+
+            score_credit_request.delay(pk)
+        except Exception:
+            # broker down: the row stays queued/pending and the periodic rescoring job picks it up
+            logger.exception("Could not enqueue scoring for CreditRequest %s", pk)
+
+    def perform_create(self, serializer):
+        instance = CreditRequest(**serializer.validated_data)
+        score_and_save(serializer, instance, meta={
+            "requested_amount": instance.requested_amount,
+            "term_months": instance.term_months
+        })
 
 class CreditRequestDetailView(generics.RetrieveUpdateAPIView):
-    queryset = CreditRequest.objects.all()
+    queryset = CreditRequest.objects.select_related('individual', 'company')
     serializer_class = CreditRequestSerializer
 
     def perform_update(self, serializer):
-        instance = serializer.save()
-        # Optionally re-score on update if applicant_type or amounts changed.
+        # apply the changes in memory so the new values are scored before the UPDATE
+        instance = serializer.instance
+        for attr, value in serializer.validated_data.items():
+            setattr(instance, attr, value)
+        if not needs_rescore(instance):
+            # only non-scoring fields (status, term_months, ...) changed: no rescore, no new log entry
+            serializer.save()
+            return
+        score_and_save(serializer, instance, meta={"updated_via": "credit_request_update"})
+
+
+def score_and_save(serializer, instance, meta):
+    """
+    Score the (unsaved) state of `instance` first, then write the credit request
+    and its PredictionLog entry in one transaction: a single INSERT/UPDATE of the
+    row with the score fields included, plus one INSERT into the audit log.
+    Scoring failures don't block the write; the request is saved unscored.
+    """
+    try:
+        result = score_one(instance)
+    except Exception:
+        logger.exception("Scoring failed for credit request %s", instance.pk or "(new)")
+        result = None
+
+    if result is None:
+        return serializer.save()
+
+    score, explanation, model_ver = result
+    with transaction.atomic():
+        instance = serializer.save(
+            score=score,
+            model_version=model_ver,
+            explanation=explanation,
+            scoring_status=CreditRequest.SCORING_DONE,
+            feature_fingerprint=fingerprint(instance, model_ver),
+        )
+        prediction_log_writer.write(PredictionLog(
+            profile_id=instance.individual_id,
+            credit_request=instance,
+            score=score,
+            model_version=model_ver,
+            explanation=explanation,
+            meta=log_meta(instance, model_ver, meta),
+        ))
+    return instance
+
+
+class CreditRequestScoreStatusView(generics.GenericAPIView):
+    """
+    Scoring status of a credit request. Pass ?wait=<seconds> to long-poll:
+    the response is held until scoring finishes or the wait runs out
+    (capped by CREDIT_REQUEST_STATUS_MAX_WAIT, 2s by default: the wait holds a
+    sync worker, so clients should re-poll rather than ask for long waits).
+    """
+    queryset = CreditRequest.objects.all()
+    status_fields = ['score', 'model_version', 'explanation', 'scoring_status', 'updated_at']
+
+    def get(self, request, pk):
+        instance = get_object_or_404(CreditRequest.objects.only('id', *self.status_fields), pk=pk)
+
         try:
-            if instance.applicant_type == CreditRequest.APPLICANT_INDIVIDUAL and instance.individual:
-                p = instance.individual
-                features = {
-                    "yearly_income": p.yearly_income,
-                    "existing_debt": p.existing_debt,
-                    "requested_amount": instance.requested_amount,
-                    "collateral_value": p.collateral_value,
-                    "credit_history_score": p.credit_history_score,
-                    "criminal_history": p.criminal_history,
-                }
-                score, explanation, model_ver = predict_individual_risk(features)
-            elif instance.applicant_type == CreditRequest.APPLICANT_COMPANY and instance.company:
-                c = instance.company
-                features = {
-                    "revenue": c.revenue,
-                    "net_income": c.net_income,
-                    "assets": c.assets,
-                    "liabilities": c.liabilities,
-                    "requested_amount": instance.requested_amount,
-                }
-                score, explanation, model_ver = predict_company_risk(features)
-            else:
-                score, explanation, model_ver = None, None, None
-        except Exception:
-            score, explanation, model_ver = None, None, None
-
-        if score is not None:
-            instance.score = int(score)
-            instance.model_version = model_ver
-            instance.explanation = explanation
-            instance.save(update_fields=['score', 'model_version', 'explanation', 'updated_at'])
-
-            try:
-                PredictionLog.objects.create(
-                    profile=instance.individual if instance.individual_id else None,
-                    credit_request=instance,
-                    score=int(score),
-                    model_version=model_ver,
-                    explanation=explanation,
-                    meta={"updated_via": "credit_request_update"}
-                )
-            except Exception:
-                pass
\ No newline at end of file
+            wait = float(request.query_params.get('wait', 0))
+        except ValueError:
+            return Response({"detail": "wait must be a number of seconds."}, status=status.HTTP_400_BAD_REQUEST)
+        wait = max(0.0, min(wait, getattr(settings, 'CREDIT_REQUEST_STATUS_MAX_WAIT', 2)))
+        interval = getattr(settings, 'CREDIT_REQUEST_STATUS_POLL_INTERVAL', 0.25)
+
+        deadline = time.monotonic() + wait
+        while instance.scoring_status == CreditRequest.SCORING_QUEUED and time.monotonic() < deadline:
+            time.sleep(interval)
+            instance.refresh_from_db(fields=self.status_fields)
+
+        scoring_status = instance.scoring_status or (
+            CreditRequest.SCORING_DONE if instance.score is not None else None
+        )
+        return Response({
+            "id": instance.id,
+            "scoring_status": scoring_status,
+            "score": instance.score,
+            "model_version": instance.model_version,
+            "explanation": instance.explanation,
+            "updated_at": instance.updated_at,
+        })
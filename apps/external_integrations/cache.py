@@ -0,0 +1,130 @@
+'''
+Two-tier read-through cache for external records.
+
+- tier 1: in-process LRU (OrderedDict), bounded by max_size entries, each entry
+  kept for at most local_timeout seconds so other processes' refreshes show up
+- tier 2: Django's cache framework (locmem in dev/tests, Redis in prod)
+
+Values must be JSON/pickle-safe (we store serialized records). The loader
+decides how long a value may live, so entries never outlive the record's
+freshness window. Counters are per process and exposed through stats().
+'''
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, Optional, Tuple
+
+from django.core.cache import caches
+
+
+class ReadThroughCache:
+    def __init__(self, namespace: str, max_size: int = 1024, local_timeout: float = 60, cache_alias: str = "default"):
+        self.namespace = namespace
+        self.max_size = max_size
+        self.local_timeout = local_timeout
+        self.cache_alias = cache_alias
+        self._local: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"local_hits": 0, "shared_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    @property
+    def shared(self):
+        return caches[self.cache_alias]
+
+    def _shared_key(self, key: str) -> str:
+        # hash so arbitrary INNs / parcel ids are valid keys on every backend
+        return f"ext:{self.namespace}:{hashlib.sha1(key.encode()).hexdigest()}"
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += n
+
+    def _get_local(self, key: str):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._local[key]
+                self._counters["expirations"] += 1
+                return None
+            self._local.move_to_end(key)
+            return value
+
+    def _set_local(self, key: str, value: Any, timeout: float) -> None:
+        expires_at = time.monotonic() + min(timeout, self.local_timeout)
+        with self._lock:
+            self._local[key] = (value, expires_at)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_size:
+                self._local.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self._get_local(key)
+        if value is not None:
+            self._count("local_hits")
+            return value
+        entry = self.shared.get(self._shared_key(key))
+        if entry is not None:
+            value, expires_at = entry
+            remaining = expires_at - time.time()
+            if remaining > 0:
+                self._count("shared_hits")
+                self._set_local(key, value, remaining)
+                return value
+        return None
+
+    def set(self, key: str, value: Any, timeout: float) -> None:
+        if timeout <= 0:
+            return
+        # keep the absolute expiry next to the value so the local tier can't extend it
+        self.shared.set(self._shared_key(key), (value, time.time() + timeout), timeout=int(timeout) or 1)
+        self._set_local(key, value, timeout)
+
+    def get_or_load(self, key: str, loader: Callable[[], Tuple[Any, float]], flight=None) -> Tuple[Any, bool]:
+        '''
+        Return (value, hit). On a miss `loader` is called and must return
+        (value, timeout_seconds); the value is cached for that long.
+        With a SingleFlight, concurrent misses for the key share one loader call.
+        '''
+        value = self.get(key)
+        if value is not None:
+            return value, True
+        self._count("misses")
+
+        def load_and_store():
+            value, timeout = loader()
+            self.set(key, value, timeout)
+            return value
+
+        if flight is None:
+            return load_and_store(), False
+        value, shared = flight.do(key, load_and_store, peek=lambda: self.get(key))
+        return value, shared
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+        self.shared.delete_many([self._shared_key(key) for key in keys])
+
+    def clear_local(self) -> None:
+        with self._lock:
+            self._local.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            size = len(self._local)
+        lookups = counters["local_hits"] + counters["shared_hits"] + counters["misses"]
+        hits = counters["local_hits"] + counters["shared_hits"]
+        return {
+            **counters,
+            "local_size": size,
+            "max_size": self.max_size,
+            "hit_rate": round(hits / lookups, 4) if lookups else None,
+        }
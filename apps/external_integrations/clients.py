@@ -2,10 +2,16 @@
 Client layer that simulates calls to external goverment APIs which we dont have access yet
 Replacing the fuctions here withreal HTTP calls
 Keeping it modular makes swapping for real clients trivial
+
+fetch_soliq / fetch_kadastr / fetch_*_many go through the pooled GovApiClient
+(http_client.py). Without EXTERNAL_API_BASE_URL it talks to an in-process
+mock transport backed by the *_mock functions below, so nothing leaves the box.
 '''
 
 import random
 import datetime
+import threading
+from typing import Dict, Iterable
 
 def fetch_soliq_mock(inn: str) ->dict:
     '''
@@ -52,4 +58,53 @@ def fetch_kadastr_mock(parcel_id: str) -> dict:
             "note": "Mock Kadastr record."
         }
     }
-    return data
\ No newline at end of file
+    return data
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    '''
+    Process-wide pooled client, created on first use (so forked workers each
+    open their own connections).
+    '''
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from django.conf import settings
+                from .http_client import GovApiClient, MOCK_BASE_URL, mock_transport
+                import httpx
+
+                base_url = getattr(settings, "EXTERNAL_API_BASE_URL", None)
+                _client = GovApiClient(
+                    base_url or MOCK_BASE_URL,
+                    transport=None if base_url else mock_transport(),
+                    timeout=httpx.Timeout(getattr(settings, "EXTERNAL_API_TIMEOUT", 5.0), connect=2.0),
+                    max_connections=getattr(settings, "EXTERNAL_API_MAX_CONNECTIONS", 20),
+                )
+    return _client
+
+
+def fetch_soliq(inn: str) -> dict:
+    return get_client().get_soliq(inn)
+
+
+def fetch_kadastr(parcel_id: str) -> dict:
+    return get_client().get_kadastr(parcel_id)
+
+
+def fetch_soliq_many(inns: Iterable[str]) -> Dict[str, dict]:
+    '''
+    Batch lookup: {inn: data} for the INNs that could be fetched (duplicates collapsed).
+    '''
+    return get_client().fetch_soliq_many(inns)
+
+
+def fetch_kadastr_many(parcel_ids: Iterable[str]) -> Dict[str, dict]:
+    '''
+    Batch lookup: {parcel_id: data} for the parcels that could be fetched (duplicates collapsed).
+    '''
+    return get_client().fetch_kadastr_many(parcel_ids)
@@ -0,0 +1,289 @@
+'''
+Pooled HTTP clients for the government APIs (Soliq, Kadastr).
+
+- GovApiClient: sync httpx.Client with a keep-alive connection pool; safe to
+  share between threads. fetch_many() runs lookups concurrently on a small
+  thread pool over the same connections.
+- AsyncGovApiClient: the same API on httpx.AsyncClient; fetch_many() uses
+  asyncio.gather bounded by a semaphore.
+
+Both have per-phase timeouts, retries with full-jitter exponential backoff on
+connection errors and retryable statuses, and a circuit breaker that fails
+fast after repeated failures. mock_transport() serves the mock functions from
+clients.py in-process, so everything runs offline.
+'''
+import asyncio
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Optional
+from urllib.parse import quote, unquote
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class ExternalAPIError(Exception):
+    """Lookup against a government API failed after retries."""
+
+
+class CircuitOpenError(ExternalAPIError):
+    """The circuit breaker is open; the call was not attempted."""
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 3
+    backoff_base: float = 0.2
+    backoff_max: float = 5.0
+    retry_statuses: FrozenSet[int] = field(default_factory=lambda: frozenset({429, 500, 502, 503, 504}))
+
+    def delay(self, attempt: int) -> float:
+        # full jitter: uniform(0, min(cap, base * 2^attempt))
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures; open calls
+    fail fast for `reset_timeout` seconds, then one trial call is let through
+    (half-open) and its outcome closes or re-opens the circuit.
+    """
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def before_call(self) -> bool:
+        """Raise CircuitOpenError if the call may not go out; True if it is the half-open trial."""
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                raise CircuitOpenError("circuit open")
+            self._trial_in_flight = True
+            return True
+
+    def abandon_trial(self) -> None:
+        """The trial ended without an outcome (a bug, a cancelled task): let the next call try instead."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+def _path(resource: str, key: str) -> str:
+    return f"/{resource}/{quote(key, safe='')}"
+
+
+class _BaseClient:
+    def __init__(self, base_url: str, timeout: Optional[httpx.Timeout] = None, retry: Optional[RetryPolicy] = None,
+                 breaker: Optional[CircuitBreaker] = None, max_connections: int = 20, max_keepalive: int = 10,
+                 max_concurrency: int = 8):
+        self.base_url = base_url
+        self.timeout = timeout or httpx.Timeout(5.0, connect=2.0)
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self.max_concurrency = max_concurrency
+
+    def _should_retry(self, exc: Optional[Exception], response: Optional[httpx.Response]) -> bool:
+        if exc is not None:
+            return isinstance(exc, httpx.TransportError)
+        return response.status_code in self.retry.retry_statuses
+
+    def _decode(self, path: str, response: httpx.Response) -> Any:
+        # a 2xx body that isn't JSON is an upstream failure like a 5xx, not a crash in the caller
+        try:
+            data = response.json()
+        except ValueError as err:
+            self.breaker.record_failure()
+            raise ExternalAPIError(f"GET {path} returned invalid JSON: {err}") from err
+        self.breaker.record_success()
+        return data
+
+    def _record_outcome(self, response: Optional[httpx.Response]) -> None:
+        # a definitive answer like 404 means the upstream is healthy; don't trip the breaker
+        if response is not None and response.status_code < 500 and response.status_code not in self.retry.retry_statuses:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+
+class GovApiClient(_BaseClient):
+    def __init__(self, base_url: str, transport: Optional[httpx.BaseTransport] = None, **kwargs):
+        super().__init__(base_url, **kwargs)
+        self._client = httpx.Client(base_url=base_url, timeout=self.timeout, limits=self.limits, transport=transport)
+
+    def close(self) -> None:
+        self._client.close()
+
+    def get_json(self, path: str) -> Any:
+        trial = self.breaker.before_call()
+        last_error: Optional[Exception] = None
+        try:
+            for attempt in range(self.retry.max_attempts):
+                exc = response = None
+                try:
+                    response = self._client.get(path)
+                except httpx.HTTPError as err:
+                    exc = err
+                if exc is None and response.status_code < 400:
+                    return self._decode(path, response)
+                last_error = exc or httpx.HTTPStatusError(
+                    f"{response.status_code} for {path}", request=response.request, response=response
+                )
+                if not self._should_retry(exc, response) or attempt == self.retry.max_attempts - 1:
+                    break
+                time.sleep(self.retry.delay(attempt))
+        except BaseException as err:
+            if trial and not isinstance(err, ExternalAPIError):
+                self.breaker.abandon_trial()
+            raise
+        self._record_outcome(response)
+        raise ExternalAPIError(f"GET {path} failed: {last_error}") from last_error
+
+    def get_soliq(self, inn: str) -> dict:
+        return self.get_json(_path("soliq", inn))
+
+    def get_kadastr(self, parcel_id: str) -> dict:
+        return self.get_json(_path("kadastr", parcel_id))
+
+    def fetch_many(self, fetch: Callable[[str], dict], keys: Iterable[str]) -> Dict[str, dict]:
+        """
+        Run fetch(key) concurrently for distinct keys; returns {key: data} for
+        the lookups that succeeded (failures are logged and left out).
+        """
+        keys = list(dict.fromkeys(keys))
+        results: Dict[str, dict] = {}
+        if not keys:
+            return results
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(keys))) as pool:
+            futures = {key: pool.submit(fetch, key) for key in keys}
+            for key, future in futures.items():
+                try:
+                    results[key] = future.result()
+                except ExternalAPIError as exc:
+                    logger.warning("Lookup for %s failed: %s", key, exc)
+        return results
+
+    def fetch_soliq_many(self, inns: Iterable[str]) -> Dict[str, dict]:
+        return self.fetch_many(self.get_soliq, inns)
+
+    def fetch_kadastr_many(self, parcel_ids: Iterable[str]) -> Dict[str, dict]:
+        return self.fetch_many(self.get_kadastr, parcel_ids)
+
+
+class AsyncGovApiClient(_BaseClient):
+    def __init__(self, base_url: str, transport: Optional[httpx.AsyncBaseTransport] = None, **kwargs):
+        super().__init__(base_url, **kwargs)
+        self._client = httpx.AsyncClient(base_url=base_url, timeout=self.timeout, limits=self.limits, transport=transport)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def get_json(self, path: str) -> Any:
+        trial = self.breaker.before_call()
+        last_error: Optional[Exception] = None
+        try:
+            for attempt in range(self.retry.max_attempts):
+                exc = response = None
+                try:
+                    response = await self._client.get(path)
+                except httpx.HTTPError as err:
+                    exc = err
+                if exc is None and response.status_code < 400:
+                    return self._decode(path, response)
+                last_error = exc or httpx.HTTPStatusError(
+                    f"{response.status_code} for {path}", request=response.request, response=response
+                )
+                if not self._should_retry(exc, response) or attempt == self.retry.max_attempts - 1:
+                    break
+                await asyncio.sleep(self.retry.delay(attempt))
+        except BaseException as err:
+            if trial and not isinstance(err, ExternalAPIError):
+                self.breaker.abandon_trial()
+            raise
+        self._record_outcome(response)
+        raise ExternalAPIError(f"GET {path} failed: {last_error}") from last_error
+
+    async def get_soliq(self, inn: str) -> dict:
+        return await self.get_json(_path("soliq", inn))
+
+    async def get_kadastr(self, parcel_id: str) -> dict:
+        return await self.get_json(_path("kadastr", parcel_id))
+
+    async def fetch_many(self, fetch, keys: Iterable[str]) -> Dict[str, dict]:
+        keys = list(dict.fromkeys(keys))
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def one(key):
+            async with semaphore:
+                try:
+                    return key, await fetch(key)
+                except ExternalAPIError as exc:
+                    logger.warning("Lookup for %s failed: %s", key, exc)
+                    return key, None
+
+        pairs = await asyncio.gather(*(one(key) for key in keys))
+        return {key: data for key, data in pairs if data is not None}
+
+    async def fetch_soliq_many(self, inns: Iterable[str]) -> Dict[str, dict]:
+        return await self.fetch_many(self.get_soliq, inns)
+
+    async def fetch_kadastr_many(self, parcel_ids: Iterable[str]) -> Dict[str, dict]:
+        return await self.fetch_many(self.get_kadastr, parcel_ids)
+
+
+MOCK_BASE_URL = "http://gov-api.mock"
+
+
+def mock_transport() -> httpx.MockTransport:
+    """
+    In-process stand-in for the government APIs: serves /soliq/<inn> and
+    /kadastr/<parcel_id> from the mock functions. Works for both clients.
+    """
+    from .clients import fetch_soliq_mock, fetch_kadastr_mock
+
+    handlers = {"soliq": fetch_soliq_mock, "kadastr": fetch_kadastr_mock}
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        parts = request.url.raw_path.decode().split("?")[0].strip("/").split("/")
+        if request.method != "GET" or len(parts) != 2 or parts[0] not in handlers:
+            return httpx.Response(404, json={"detail": "not found"})
+        return httpx.Response(200, json=handlers[parts[0]](unquote(parts[1])))
+
+    return httpx.MockTransport(handle)
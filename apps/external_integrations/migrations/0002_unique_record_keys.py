@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:20
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def remove_duplicate_records(apps, schema_editor):
+    # keep only the newest row per key before the unique constraint goes on
+    for model_name, key in (("SoliqRecord", "inn"), ("KadastrRecord", "parcel_id")):
+        model = apps.get_model("external_integrations", model_name)
+        duplicated = (
+            model.objects.order_by()
+            .values(key)
+            .annotate(n=Count("id"))
+            .filter(n__gt=1)
+            .values_list(key, flat=True)
+        )
+        for value in list(duplicated):
+            rows = model.objects.filter(**{key: value})
+            keep = rows.order_by("-fetched_at", "-id").values_list("id", flat=True).first()
+            rows.exclude(id=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('external_integrations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_records, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='kadastrrecord',
+            name='parcel_id',
+            field=models.CharField(max_length=128, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='soliqrecord',
+            name='inn',
+            field=models.CharField(max_length=64, unique=True),
+        ),
+    ]
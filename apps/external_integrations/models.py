@@ -4,8 +4,9 @@ class SoliqRecord(models.Model):
     '''
     Mocked soliq record for individeuals or any comany identified by inn
     Storing raw json returned plus some indexed fields for easy querying
+    One row per inn; refreshes upsert it in place
     '''
-    inn=models.CharField(max_length=64, db_index=True)
+    inn=models.CharField(max_length=64, unique=True)
     name=models.CharField(max_length=255, null=True, blank=True)
     data=models.JSONField(null=True, blank=True)
     fetched_at=models.DateTimeField(auto_now_add=True)
@@ -22,9 +23,10 @@ class SoliqRecord(models.Model):
 class KadastrRecord(models.Model):
     '''
     Mocked kadastr (land registery) record for parcel id
+    One row per parcel_id; refreshes upsert it in place
     '''
 
-    parcel_id=models.CharField(max_length=128, db_index=True)
+    parcel_id=models.CharField(max_length=128, unique=True)
     owner_name=models.CharField(max_length=255, null=True, blank=True)
     address=models.CharField(max_length=512, null=True, blank=True)
     data=models.JSONField(null=True, blank=True)
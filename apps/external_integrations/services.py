@@ -0,0 +1,125 @@
+'''
+Lookup and persistence helpers for external records.
+
+- get_soliq_record / get_kadastr_record: read-through cached lookups used by
+  the retrieve views. A record older than EXTERNAL_RECORD_MAX_AGE_DAYS is
+  refetched from the client layer; cache entries expire with the record.
+  Concurrent misses for the same key are coalesced into one fetch.
+- upsert_*: records are unique per key, so refreshes upsert: one INSERT ...
+  ON CONFLICT DO UPDATE statement per batch instead of a SELECT plus
+  UPDATE/INSERT per key. Upserted keys are dropped from the cache.
+'''
+from datetime import timedelta
+from typing import Dict, List, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from .cache import ReadThroughCache
+from .clients import fetch_soliq, fetch_kadastr
+from .models import SoliqRecord, KadastrRecord
+from .serializers import SoliqRecordSerializer, KadastrRecordSerializer
+from .singleflight import SingleFlight
+
+
+def _make_cache(namespace: str) -> ReadThroughCache:
+    return ReadThroughCache(
+        namespace,
+        max_size=getattr(settings, "EXTERNAL_CACHE_LOCAL_SIZE", 1024),
+        local_timeout=getattr(settings, "EXTERNAL_CACHE_LOCAL_TIMEOUT", 60),
+    )
+
+
+soliq_cache = _make_cache("soliq")
+kadastr_cache = _make_cache("kadastr")
+
+# concurrent misses for one key (threads and processes) share a single upstream fetch
+soliq_flight = SingleFlight("soliq")
+kadastr_flight = SingleFlight("kadastr")
+
+
+def _max_age() -> timedelta:
+    return timedelta(days=getattr(settings, "EXTERNAL_RECORD_MAX_AGE_DAYS", 30))
+
+
+def _cache_timeout(fetched_at) -> float:
+    # never cache past the record's freshness window
+    remaining = (fetched_at + _max_age() - timezone.now()).total_seconds()
+    return min(remaining, getattr(settings, "EXTERNAL_CACHE_TIMEOUT", 3600))
+
+
+# model field -> key in the upstream payload
+_RECORD_FIELDS = {
+    SoliqRecord: (("name", "registered_name"),),
+    KadastrRecord: (("owner_name", "owner_name"), ("address", "address")),
+}
+
+
+def _lookup(model, serializer_class, key_field: str, key: str, fetch, cache: ReadThroughCache, flight: SingleFlight) -> Tuple[dict, bool]:
+    created = False
+
+    def load():
+        nonlocal created
+        rec = model.objects.filter(**{key_field: key}).first()
+        if rec is None or rec.fetched_at < timezone.now() - _max_age():
+            created = rec is None
+            data = fetch(key)
+            defaults = {field: data.get(source) for field, source in _RECORD_FIELDS[model]}
+            rec, _ = model.objects.update_or_create(
+                **{key_field: key}, defaults={**defaults, "data": data, "fetched_at": timezone.now()}
+            )
+        return dict(serializer_class(rec).data), _cache_timeout(rec.fetched_at)
+
+    payload, _ = cache.get_or_load(key, load, flight)
+    return payload, created
+
+
+def get_soliq_record(inn: str) -> Tuple[dict, bool]:
+    '''
+    Return (serialized SoliqRecord, created) for an INN, from cache, DB or upstream.
+    '''
+    return _lookup(SoliqRecord, SoliqRecordSerializer, "inn", inn, fetch_soliq, soliq_cache, soliq_flight)
+
+
+def get_kadastr_record(parcel_id: str) -> Tuple[dict, bool]:
+    '''
+    Return (serialized KadastrRecord, created) for a parcel ID, from cache, DB or upstream.
+    '''
+    return _lookup(KadastrRecord, KadastrRecordSerializer, "parcel_id", parcel_id, fetch_kadastr, kadastr_cache, kadastr_flight)
+
+
+def upsert_soliq_records(records: Dict[str, dict]) -> List[SoliqRecord]:
+    '''
+    Insert or update SoliqRecord rows from {inn: data}; fetched_at is set to now.
+    '''
+    objs = [SoliqRecord(inn=inn, name=data.get("registered_name"), data=data) for inn, data in records.items()]
+    if not objs:
+        return []
+    saved = SoliqRecord.objects.bulk_create(
+        objs,
+        update_conflicts=True,
+        unique_fields=["inn"],
+        update_fields=["name", "data", "fetched_at"],
+    )
+    soliq_cache.delete_many(records)
+    return saved
+
+
+def upsert_kadastr_records(records: Dict[str, dict]) -> List[KadastrRecord]:
+    '''
+    Insert or update KadastrRecord rows from {parcel_id: data}; fetched_at is set to now.
+    '''
+    objs = [
+        KadastrRecord(parcel_id=parcel_id, owner_name=data.get("owner_name"), address=data.get("address"), data=data)
+        for parcel_id, data in records.items()
+    ]
+    if not objs:
+        return []
+    saved = KadastrRecord.objects.bulk_create(
+        objs,
+        update_conflicts=True,
+        unique_fields=["parcel_id"],
+        update_fields=["owner_name", "address", "data", "fetched_at"],
+    )
+    kadastr_cache.delete_many(records)
+    return saved
@@ -0,0 +1,90 @@
+'''
+Single-flight: coalesce concurrent calls for the same key into one execution.
+
+- within a process, the first thread to miss a key runs the call and the
+  others block on an Event and get the same result (or exception)
+- across processes, the running thread also takes a lock in Django's cache
+  (cache.add is atomic on Redis/Memcached/locmem). A process that finds the
+  lock taken polls `peek` (normally the shared cache) until the holder has
+  published the value, and only runs the call itself if the lock is released
+  without a value or `wait_timeout` passes.
+'''
+import hashlib
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django.core.cache import caches
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    def __init__(self, namespace: str, lock_timeout: float = 30, wait_timeout: float = 10,
+                 poll_interval: float = 0.05, cache_alias: str = "default"):
+        self.namespace = namespace
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.cache_alias = cache_alias
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+    def _lock_key(self, key: str) -> str:
+        return f"sf:{self.namespace}:{hashlib.sha1(key.encode()).hexdigest()}"
+
+    def do(self, key: str, fn: Callable[[], Any], peek: Optional[Callable[[], Any]] = None) -> Tuple[Any, bool]:
+        '''
+        Run fn() once for all concurrent callers of `key`.
+        Returns (value, shared) where shared is True if another caller produced the value.
+        '''
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if not call.event.wait(self.wait_timeout):
+                return fn(), False
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            call.value, shared = self._do_across_processes(key, fn, peek)
+            return call.value, shared
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def _do_across_processes(self, key: str, fn: Callable[[], Any], peek: Optional[Callable[[], Any]]) -> Tuple[Any, bool]:
+        shared_cache = caches[self.cache_alias]
+        lock_key = self._lock_key(key)
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            if shared_cache.add(lock_key, token, timeout=self.lock_timeout):
+                try:
+                    return fn(), False
+                finally:
+                    # only release our own lock; it may have expired and been re-taken
+                    if shared_cache.get(lock_key) == token:
+                        shared_cache.delete(lock_key)
+            if peek is not None:
+                value = peek()
+                if value is not None:
+                    return value, True
+            if time.monotonic() >= deadline:
+                return fn(), False
+            time.sleep(self.poll_interval)
@@ -1,12 +1,32 @@
-from django.test import TestCase
+import asyncio
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+import httpx
 from rest_framework.test import APIClient
 from django.urls import reverse
 
+from .cache import ReadThroughCache
+from .clients import fetch_soliq_mock
+from .http_client import (
+    AsyncGovApiClient, CircuitBreaker, CircuitOpenError, ExternalAPIError, GovApiClient, MOCK_BASE_URL,
+    RetryPolicy, mock_transport,
+)
 from .models import SoliqRecord, KadastrRecord
+from .services import soliq_cache, kadastr_cache, upsert_kadastr_records
+from .singleflight import SingleFlight
 
 class ExternalIntegrationsTests(TestCase):
     def setUp(self):
         self.client = APIClient()
+        cache.clear()
+        soliq_cache.clear_local()
+        kadastr_cache.clear_local()
 
     def test_soliq_fetch_and_store(self):
         inn = "123456789"
@@ -21,4 +41,225 @@ class ExternalIntegrationsTests(TestCase):
         url = reverse('external-kadastr', args=[parcel])
         resp = self.client.get(url)
         self.assertIn(resp.status_code, (200, 201))
-        self.assertTrue(KadastrRecord.objects.filter(parcel_id=parcel).exists())
\ No newline at end of file
+        self.assertTrue(KadastrRecord.objects.filter(parcel_id=parcel).exists())
+
+class ReadThroughCacheTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        for c in (soliq_cache, kadastr_cache):
+            c.clear_local()
+            self.addCleanup(c.clear_local)
+
+    def test_second_lookup_is_served_from_cache(self):
+        url = reverse('external-soliq', args=["555000"])
+        self.assertEqual(self.client.get(url).status_code, 201)
+        before = soliq_cache.stats()
+        with self.assertNumQueries(0):
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data["inn"], "555000")
+        self.assertEqual(soliq_cache.stats()["local_hits"], before["local_hits"] + 1)
+
+        soliq_cache.clear_local()  # another process: shared tier still has it
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        self.assertEqual(soliq_cache.stats()["shared_hits"], before["shared_hits"] + 1)
+
+    def test_stale_record_is_refetched(self):
+        rec = SoliqRecord.objects.create(inn="777", name="stale", data={})
+        SoliqRecord.objects.filter(pk=rec.pk).update(fetched_at=timezone.now() - timedelta(days=60))
+        resp = self.client.get(reverse('external-soliq', args=["777"]))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data["name"], "Entity 777")
+        self.assertEqual(SoliqRecord.objects.count(), 1)
+
+    def test_local_tier_evicts_least_recently_used(self):
+        small = ReadThroughCache("test", max_size=2)
+        for key in ("a", "b", "c"):
+            small.set(key, {"key": key}, 60)
+        self.assertEqual(small.stats()["evictions"], 1)
+        self.assertEqual(small.stats()["local_size"], 2)
+
+    def test_upsert_invalidates_cached_entry(self):
+        parcel = "UZ-CACHE-1"
+        self.client.get(reverse('external-kadastr', args=[parcel]))
+        KadastrRecord.objects.filter(parcel_id=parcel).update(owner_name="changed")
+        upsert_kadastr_records({parcel: {"owner_name": "refreshed", "address": "x"}})
+        resp = self.client.get(reverse('external-kadastr', args=[parcel]))
+        self.assertEqual(resp.data["owner_name"], "refreshed")
+
+    def test_cache_stats_endpoint(self):
+        resp = self.client.get(reverse('external-cache-stats'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn("evictions", resp.data["soliq"])
+        self.assertIn("hit_rate", resp.data["kadastr"])
+
+
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_threads_share_one_call(self):
+        flight = SingleFlight("test-threads")
+        calls = []
+        started = threading.Event()
+
+        def slow_fetch():
+            calls.append(1)
+            started.set()
+            time.sleep(0.2)
+            return {"inn": "42"}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do("42", slow_fetch))) for _ in range(8)]
+        threads[0].start()
+        started.wait(1)
+        for t in threads[1:]:
+            t.start()
+        for t in threads:
+            t.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([value for value, _ in results], [{"inn": "42"}] * 8)
+        self.assertEqual(sum(1 for _, shared in results if shared), 7)
+
+    def test_waits_for_other_process_holding_the_lock(self):
+        flight = SingleFlight("test-procs", wait_timeout=2, poll_interval=0.01)
+        cache.add(flight._lock_key("99"), "other-process", timeout=30)
+        published = {}
+        threading.Timer(0.05, lambda: published.update(value={"inn": "99"})).start()
+
+        fetch = mock.Mock(return_value={"inn": "mine"})
+        value, shared = flight.do("99", fetch, peek=lambda: published.get("value"))
+        self.assertEqual(value, {"inn": "99"})
+        self.assertTrue(shared)
+        fetch.assert_not_called()
+
+    def test_leader_error_propagates_to_waiters(self):
+        flight = SingleFlight("test-errors")
+        gate = threading.Event()
+
+        def failing():
+            gate.wait(1)
+            raise RuntimeError("upstream down")
+
+        errors = []
+
+        def call():
+            try:
+                flight.do("k", failing)
+            except RuntimeError as exc:
+                errors.append(str(exc))
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for t in threads:
+            t.start()
+        time.sleep(0.05)
+        gate.set()
+        for t in threads:
+            t.join(5)
+        self.assertEqual(errors, ["upstream down"] * 3)
+
+
+def _flaky_transport(failures, status=503):
+    calls = []
+
+    def handle(request):
+        calls.append(request.url.path)
+        if len(calls) <= failures:
+            return httpx.Response(status)
+        return httpx.Response(200, json={"path": request.url.path})
+
+    return httpx.MockTransport(handle), calls
+
+
+class GovApiClientTests(SimpleTestCase):
+    no_wait = RetryPolicy(backoff_base=0)
+
+    def test_mock_transport_serves_mock_payloads(self):
+        client = GovApiClient(MOCK_BASE_URL, transport=mock_transport())
+        data = client.get_soliq("123 456")
+        self.assertEqual(data["inn"], "123 456")
+        self.assertEqual(set(data), set(fetch_soliq_mock("123 456")))
+        self.assertEqual(client.get_kadastr("P-1")["parcel_id"], "P-1")
+
+    def test_retries_transient_errors(self):
+        transport, calls = _flaky_transport(failures=2)
+        client = GovApiClient(MOCK_BASE_URL, transport=transport, retry=self.no_wait)
+        self.assertEqual(client.get_json("/soliq/1"), {"path": "/soliq/1"})
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(client.breaker.state, "closed")
+
+    def test_client_errors_are_not_retried_and_do_not_trip_breaker(self):
+        transport, calls = _flaky_transport(failures=10, status=404)
+        client = GovApiClient(MOCK_BASE_URL, transport=transport, retry=self.no_wait,
+                              breaker=CircuitBreaker(failure_threshold=1))
+        with self.assertRaises(ExternalAPIError):
+            client.get_json("/soliq/1")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(client.breaker.state, "closed")
+
+    def test_breaker_opens_then_half_opens(self):
+        transport, calls = _flaky_transport(failures=4)
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        client = GovApiClient(MOCK_BASE_URL, transport=transport, retry=RetryPolicy(max_attempts=1), breaker=breaker)
+        for _ in range(2):
+            with self.assertRaises(ExternalAPIError):
+                client.get_json("/soliq/1")
+        self.assertEqual(breaker.state, "open")
+        with self.assertRaises(CircuitOpenError):
+            client.get_json("/soliq/1")
+        self.assertEqual(len(calls), 2)
+
+        breaker.reset_timeout = 0
+        self.assertEqual(breaker.state, "half-open")
+        with self.assertRaises(ExternalAPIError):
+            client.get_json("/soliq/1")  # trial fails -> open again
+        with self.assertRaises(ExternalAPIError):
+            client.get_json("/soliq/1")
+        self.assertEqual(client.get_json("/soliq/1"), {"path": "/soliq/1"})
+        self.assertEqual(breaker.state, "closed")
+
+    def test_invalid_json_is_an_upstream_error(self):
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, text="<html>maintenance</html>"))
+        client = GovApiClient(MOCK_BASE_URL, transport=transport, retry=self.no_wait,
+                              breaker=CircuitBreaker(failure_threshold=2))
+        with self.assertRaisesRegex(ExternalAPIError, "invalid JSON"):
+            client.get_json("/soliq/1")
+        self.assertEqual(client.breaker.state, "closed")
+        with self.assertRaises(ExternalAPIError):
+            client.get_json("/soliq/1")
+        self.assertEqual(client.breaker.state, "open")
+
+    def test_trial_that_crashes_does_not_keep_the_circuit_open(self):
+        transport, calls = _flaky_transport(failures=1)
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        client = GovApiClient(MOCK_BASE_URL, transport=transport, retry=RetryPolicy(max_attempts=1), breaker=breaker)
+        with self.assertRaises(ExternalAPIError):
+            client.get_json("/soliq/1")
+        self.assertEqual(breaker.state, "half-open")
+        with mock.patch.object(client._client, "get", side_effect=RuntimeError("bug in a hook")):
+            with self.assertRaises(RuntimeError):
+                client.get_json("/soliq/1")
+        self.assertEqual(client.get_json("/soliq/1"), {"path": "/soliq/1"})
+        self.assertEqual(breaker.state, "closed")
+
+    def test_fetch_many_dedupes_and_skips_failures(self):
+        def handle(request):
+            if request.url.path.endswith("/bad"):
+                return httpx.Response(500)
+            return httpx.Response(200, json={"inn": request.url.path.rsplit("/", 1)[-1]})
+
+        client = GovApiClient(MOCK_BASE_URL, transport=httpx.MockTransport(handle), retry=self.no_wait)
+        result = client.fetch_soliq_many(["1", "2", "1", "bad"])
+        self.assertEqual(result, {"1": {"inn": "1"}, "2": {"inn": "2"}})
+
+    def test_async_client_fetch_many(self):
+        async def run():
+            async with AsyncGovApiClient(MOCK_BASE_URL, transport=mock_transport(), max_concurrency=2) as client:
+                return await client.fetch_kadastr_many(["A", "B", "C", "A"])
+
+        result = asyncio.run(run())
+        self.assertEqual(sorted(result), ["A", "B", "C"])
+        self.assertEqual(result["B"]["parcel_id"], "B")
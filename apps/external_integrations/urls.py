@@ -1,7 +1,8 @@
 from django.urls import path
-from .views import SoliqRetrieveView, KadastrRetrieveView
+from .views import SoliqRetrieveView, KadastrRetrieveView, ExternalCacheStatsView
 
 urlpatterns = [
     path('soliq/<str:inn>/', SoliqRetrieveView.as_view(), name='external-soliq'),
     path('kadastr/<str:parcel_id>/', KadastrRetrieveView.as_view(), name='external-kadastr'),
-]
\ No newline at end of file
+    path('cache-stats/', ExternalCacheStatsView.as_view(), name='external-cache-stats'),
+]
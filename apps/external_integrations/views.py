@@ -1,37 +1,22 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.shortcuts import get_object_or_404
 
-from .models import SoliqRecord, KadastrRecord
-from .serializers import SoliqRecordSerializer, KadastrRecordSerializer
-from .clients import fetch_soliq_mock, fetch_kadastr_mock
+from .http_client import ExternalAPIError
+from .services import get_soliq_record, get_kadastr_record, soliq_cache, kadastr_cache
 
 class SoliqRetrieveView(APIView):
     """
     GET /api/external/soliq/<inn>/
-    Returns stored SoliqRecord if exists, otherwise fetches mock data, stores it, and returns it.
+    Returns the SoliqRecord for the inn through the read-through cache. On a miss the DB is
+    checked; a missing or stale record is fetched (mock), stored and returned (201 when created).
     """
     def get(self, request, inn, *args, **kwargs):
-        # try DB first
         try:
-            rec = SoliqRecord.objects.filter(inn=inn).order_by("-fetched_at").first()
-        except Exception:
-            rec = None
-
-        if rec:
-            serializer = SoliqRecordSerializer(rec)
-            return Response(serializer.data)
-
-        # fetch mock
-        data = fetch_soliq_mock(inn)
-        rec = SoliqRecord.objects.create(
-            inn=inn,
-            name=data.get("registered_name"),
-            data=data
-        )
-        serializer = SoliqRecordSerializer(rec)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+            payload, created = get_soliq_record(inn)
+        except ExternalAPIError as exc:
+            return Response({"detail": "Soliq lookup failed: " + str(exc)}, status=status.HTTP_502_BAD_GATEWAY)
+        return Response(payload, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
 
 class KadastrRetrieveView(APIView):
@@ -39,17 +24,17 @@ class KadastrRetrieveView(APIView):
     GET /api/external/kadastr/<parcel_id>/
     """
     def get(self, request, parcel_id, *args, **kwargs):
-        rec = KadastrRecord.objects.filter(parcel_id=parcel_id).order_by("-fetched_at").first()
-        if rec:
-            serializer = KadastrRecordSerializer(rec)
-            return Response(serializer.data)
+        try:
+            payload, created = get_kadastr_record(parcel_id)
+        except ExternalAPIError as exc:
+            return Response({"detail": "Kadastr lookup failed: " + str(exc)}, status=status.HTTP_502_BAD_GATEWAY)
+        return Response(payload, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
-        data = fetch_kadastr_mock(parcel_id)
-        rec = KadastrRecord.objects.create(
-            parcel_id=parcel_id,
-            owner_name=data.get("owner_name"),
-            address=data.get("address"),
-            data=data
-        )
-        serializer = KadastrRecordSerializer(rec)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
\ No newline at end of file
+
+class ExternalCacheStatsView(APIView):
+    """
+    GET /api/external/cache-stats/
+    Hit/miss/eviction counters of this process's external record caches.
+    """
+    def get(self, request, *args, **kwargs):
+        return Response({"soliq": soliq_cache.stats(), "kadastr": kadastr_cache.stats()})
@@ -11,6 +11,6 @@ class IndividualCreditProfileAdmin(admin.ModelAdmin):
 @admin.register(PredictionLog)
 class PredictionLogAdmin(admin.ModelAdmin):
      list_display = ('id', 'profile', 'credit_request', 'score', 'model_version', 'created_at')
-     readonly_fields = ('explanation', 'meta', 'created_at')
+     readonly_fields = ('explanation', 'attributions', 'meta', 'created_at')
      search_fields = ('profile__full_name', 'credit_request__id', 'model_version')
      list_filter = ('model_version',)
\ No newline at end of file
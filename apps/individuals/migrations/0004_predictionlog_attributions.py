@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('individuals', '0003_predictionlog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='predictionlog',
+            name='attributions',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
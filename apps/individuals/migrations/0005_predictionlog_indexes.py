@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_requests', '0005_creditrequest_list_indexes'),
+        ('individuals', '0004_predictionlog_attributions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='predictionlog',
+            name='credit_request',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='prediction_logs', to='credit_requests.creditrequest'),
+        ),
+        migrations.AlterField(
+            model_name='predictionlog',
+            name='profile',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='prediction_logs', to='individuals.individualcreditprofile'),
+        ),
+        migrations.AddIndex(
+            model_name='predictionlog',
+            index=models.Index(fields=['profile', 'created_at'], name='predlog_profile_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='predictionlog',
+            index=models.Index(fields=['credit_request', 'created_at'], name='predlog_request_created_idx'),
+        ),
+    ]
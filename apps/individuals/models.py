@@ -58,6 +58,7 @@ class PredictionLog(models.Model):
         blank=True,
         on_delete=models.CASCADE,
         related_name="prediction_logs",
+        db_index=False,  # covered by the (profile, created_at) index
     )
     credit_request = models.ForeignKey(
         "credit_requests.CreditRequest",
@@ -65,11 +66,14 @@ class PredictionLog(models.Model):
         blank=True,
         on_delete=models.CASCADE,
         related_name="prediction_logs",
+        db_index=False,  # covered by the (credit_request, created_at) index
     )
 
     score = models.IntegerField(null=True, blank=True)
     model_version = models.CharField(max_length=128, null=True, blank=True)
     explanation = models.JSONField(null=True, blank=True)
+    # SHAP top-k drivers for model-scored predictions, filled in lazily (apps/scoring_engine/attributions.py)
+    attributions = models.JSONField(null=True, blank=True)
     meta = models.JSONField(null=True, blank=True)  # optional: store raw features, request metadata, user id, ip, etc.
 
     created_at = models.DateTimeField(auto_now_add=True)
@@ -78,6 +82,11 @@ class PredictionLog(models.Model):
         verbose_name = "Prediction Log"
         verbose_name_plural = "Prediction Logs"
         ordering = ["-created_at"]
+        # a profile's / a request's logs, newest first
+        indexes = [
+            models.Index(fields=["profile", "created_at"], name="predlog_profile_created_idx"),
+            models.Index(fields=["credit_request", "created_at"], name="predlog_request_created_idx"),
+        ]
 
     def __str__(self):
         target = f"profile={self.profile_id}" if self.profile_id else f"credit_request={self.credit_request_id}"
@@ -0,0 +1,174 @@
+"""
+Writing and expiring PredictionLog rows.
+
+prediction_log_writer.write(log) is how the scoring views record a prediction:
+- with PREDICTION_LOG_BUFFER_SIZE <= 1 (the default) the row is inserted right
+  away, in the caller's transaction, so it commits or rolls back with the
+  scored object
+- with a larger buffer the row is queued once the caller's transaction
+  commits, and a background thread inserts the queue with bulk_create when it
+  reaches the buffer size or every PREDICTION_LOG_FLUSH_INTERVAL seconds.
+  Whatever is still queued is flushed at interpreter exit (and on Celery
+  worker shutdown); a hard kill loses at most one buffer. created_at is the
+  flush time, at most one interval late. When the bulk insert fails the rows
+  are inserted one by one: rows that can't be written (unserializable meta,
+  a deleted profile) are logged and dropped, and if the database itself fails
+  the rest is retried with the next flush while the queue stays under
+  PREDICTION_LOG_MAX_BUFFER rows.
+
+delete_logs_before() expires old rows in primary-key order, one short DELETE
+per id range, instead of a single statement over the whole table.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, close_old_connections, transaction
+
+from .models import PredictionLog
+
+logger = logging.getLogger(__name__)
+
+# errors caused by the row itself (unserializable meta, missing profile, ...), not by the database
+_ROW_ERRORS = (TypeError, ValueError, DataError, IntegrityError)
+
+
+class PredictionLogWriter:
+    def __init__(self, buffer_size: Optional[int] = None, flush_interval: Optional[float] = None,
+                 max_buffer: Optional[int] = None):
+        # None = read the PREDICTION_LOG_* setting at call time
+        self._buffer_size = buffer_size
+        self._flush_interval = flush_interval
+        self._max_buffer = max_buffer
+        self._buffer: List[PredictionLog] = []
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._pid = os.getpid()
+
+    @property
+    def buffer_size(self) -> int:
+        return self._buffer_size if self._buffer_size is not None else getattr(settings, "PREDICTION_LOG_BUFFER_SIZE", 0)
+
+    @property
+    def flush_interval(self) -> float:
+        return self._flush_interval if self._flush_interval is not None else getattr(settings, "PREDICTION_LOG_FLUSH_INTERVAL", 1.0)
+
+    @property
+    def max_buffer(self) -> int:
+        return self._max_buffer if self._max_buffer is not None else getattr(settings, "PREDICTION_LOG_MAX_BUFFER", 10000)
+
+    def write(self, log: PredictionLog) -> None:
+        """Record `log`: inserted now when buffering is off, queued after the current transaction commits otherwise."""
+        if self.buffer_size <= 1:
+            log.save()
+            return
+        transaction.on_commit(lambda: self._append(log))
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._buffer)
+
+    def _append(self, log: PredictionLog) -> None:
+        with self._cond:
+            if self._pid != os.getpid():
+                # forked: the parent's rows and flusher thread aren't ours
+                self._buffer, self._thread, self._pid = [], None, os.getpid()
+            self._buffer.append(log)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="prediction-log-writer", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                # idle until something is queued, then give the batch up to flush_interval to fill
+                while not self._buffer and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                deadline = time.monotonic() + self.flush_interval
+                while len(self._buffer) < self.buffer_size and not self._stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            close_old_connections()
+            self.flush()
+
+    def stop(self) -> None:
+        """Stop the flusher thread and write what is still queued."""
+        with self._cond:
+            self._stopping, thread = True, self._thread
+            self._cond.notify()
+        if thread is not None:
+            thread.join()
+        with self._cond:
+            self._stopping, self._thread = False, None
+        self.flush()
+
+    def flush(self) -> int:
+        """Insert everything queued so far with bulk_create. Returns the number of rows written."""
+        with self._cond:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return 0
+        try:
+            with transaction.atomic():
+                PredictionLog.objects.bulk_create(batch, batch_size=1000)
+            return len(batch)
+        except Exception:
+            logger.warning("Failed to write %d prediction logs in bulk; retrying them one by one", len(batch), exc_info=True)
+        # bulk_create is all or nothing: find the rows that can't be written and drop only those
+        written = 0
+        for i, log in enumerate(batch):
+            log.pk = None
+            try:
+                with transaction.atomic():
+                    log.save(force_insert=True)
+            except _ROW_ERRORS:
+                logger.exception("Dropping prediction log that can't be written (profile %s, credit request %s)",
+                                 log.profile_id, log.credit_request_id)
+            except Exception:
+                # not about this row (database down, ...): keep the rest for the next flush
+                self._requeue(batch[i:])
+                return written
+            else:
+                written += 1
+        return written
+
+    def _requeue(self, rows: List[PredictionLog]) -> None:
+        with self._cond:
+            if len(self._buffer) + len(rows) <= self.max_buffer:
+                self._buffer[:0] = rows
+                logger.exception("Failed to write %d prediction logs; retrying with the next flush", len(rows))
+            else:
+                logger.exception("Failed to write %d prediction logs; buffer full, dropping them", len(rows))
+
+
+prediction_log_writer = PredictionLogWriter()
+atexit.register(prediction_log_writer.flush)
+
+
+def delete_logs_before(cutoff: datetime, batch_size: int = 5000, after_id: int = 0) -> Iterator[Tuple[int, int]]:
+    """
+    Delete PredictionLog rows created before `cutoff`. The table is walked in
+    primary-key order from `after_id`, `batch_size` ids at a time; each batch
+    is one DELETE ... WHERE id BETWEEN first AND last AND created_at < cutoff,
+    committed on its own. Ids grow with created_at, so the walk stops at the
+    first batch without expired rows. Yields (deleted, last_id) per batch.
+    """
+    cursor = after_id
+    while True:
+        rows = list(PredictionLog.objects.filter(id__gt=cursor).order_by("id").values_list("id", "created_at")[:batch_size])
+        if not rows or not any(created_at < cutoff for _, created_at in rows):
+            return
+        first, cursor = rows[0][0], rows[-1][0]
+        deleted, _ = PredictionLog.objects.filter(id__gte=first, id__lte=cursor, created_at__lt=cutoff).delete()
+        yield deleted, cursor
@@ -0,0 +1,281 @@
+"""
+Bulk import of IndividualCreditProfile / CompanyCreditProfile rows from CSV,
+NDJSON or Parquet files (see the import_profiles management command).
+
+The file is read in chunks (pandas read_csv / read_json chunksize, pyarrow
+iter_batches), so it can be larger than RAM. Each chunk is:
+- validated column by column with the rules the API serializer applies,
+  derived from the same model fields: required fields, max_length, integer
+  ranges, decimal digits, dates (YYYY-MM-DD), choices, booleans (DRF's
+  true/false spellings), emails (Django's EmailValidator, once per distinct
+  value) and JSON columns, plus the serializer's own validate_<field> rules
+- optionally scored with the batch scorers (or a ScoringPool), before the
+  write, so the INSERT carries score and model_version
+- written with bulk_create in one transaction, with a PredictionLog per
+  scored individual as POST /api/individuals/score/ writes
+
+Invalid rows are skipped and reported with their line number and errors;
+read-only columns (score, status for individuals, ...) and unknown columns
+are ignored, as the serializers ignore them.
+"""
+import json
+import os
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from django.core.exceptions import ValidationError
+from django.core.validators import EmailValidator
+from django.db import connection, models, transaction
+from rest_framework import serializers
+
+from apps.companies.models import CompanyCreditProfile
+from apps.companies.serializers import CompanyCreditProfileSerializer
+from apps.scoring_engine.ml.risk_model import predict_company_risk_batch, predict_individual_risk_batch
+
+from .models import IndividualCreditProfile, PredictionLog
+from .serializers import IndividualCreditProfileSerializer
+
+FORMATS = ("csv", "ndjson", "parquet")
+
+KINDS = {
+    "individual": (IndividualCreditProfileSerializer, predict_individual_risk_batch),
+    "company": (CompanyCreditProfileSerializer, predict_company_risk_batch),
+}
+
+# inputs of the scorers (see credit_requests.scoring.build_features)
+SCORING_FIELDS = {
+    "individual": ("yearly_income", "existing_debt", "requested_amount", "collateral_value",
+                   "credit_history_score", "criminal_history"),
+    "company": ("revenue", "net_income", "assets", "liabilities"),
+}
+
+# the serializers' validate_<field> rules, as (mask of valid values, message)
+EXTRA_CHECKS: Dict[Tuple[str, str], Tuple[Callable[[pd.Series], pd.Series], str]] = {
+    ("company", "revenue"): (lambda values: values >= 0, "Revenue must be non-negative."),
+}
+
+_INTEGER = r"[+-]?\d+"
+_DECIMAL = r"[+-]?(?P<int>\d*)(?:\.(?P<frac>\d*))?"
+_DATE = r"\d{4}-\d{2}-\d{2}"
+
+
+def detect_format(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    fmt = {"jsonl": "ndjson", "json": "ndjson", "pq": "parquet"}.get(ext, ext)
+    if fmt not in FORMATS:
+        raise ValueError(f"Can't tell the format of {path}; pass one of: {', '.join(FORMATS)}")
+    return fmt
+
+
+def read_chunks(path: str, fmt: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Stream `path` as DataFrames of at most `chunk_size` rows."""
+    if fmt == "csv":
+        # everything as text, empty cells as missing: typing is the validator's job
+        yield from pd.read_csv(path, chunksize=chunk_size, dtype=str, keep_default_na=False, na_values=[""])
+    elif fmt == "ndjson":
+        yield from pd.read_json(path, lines=True, chunksize=chunk_size, dtype=False, convert_dates=False)
+    elif fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        raise ValueError(f"Unknown format {fmt!r}")
+
+
+def writable_fields(kind: str) -> List[models.Field]:
+    """Model fields the serializer accepts as input."""
+    serializer_class = KINDS[kind][0]
+    read_only = set(serializer_class.Meta.read_only_fields)
+    return [
+        field for field in serializer_class.Meta.model._meta.concrete_fields
+        if field.editable and not field.primary_key and field.name not in read_only
+    ]
+
+
+def _where(values: pd.Series, mask: pd.Series, other: Any) -> pd.Series:
+    """`values` where `mask`, else `other`, as Python objects (Series.where would turn None into NaN)."""
+    return pd.Series(np.where(mask.to_numpy(dtype=bool), values.to_numpy(dtype=object), other), dtype=object)
+
+
+def _text(values: pd.Series) -> pd.Series:
+    return _where(values, values.notna(), None).map(lambda v: v if v is None else str(v).strip())
+
+
+class _ChunkValidator:
+    def __init__(self, kind: str, frame: pd.DataFrame):
+        self.kind = kind
+        self.frame = frame
+        self.errors: Dict[int, List[str]] = {}
+        self.values: Dict[str, pd.Series] = {}
+
+    def fail(self, field: str, mask: pd.Series, message: str) -> None:
+        for position in np.flatnonzero(mask.to_numpy(dtype=bool)):
+            self.errors.setdefault(int(position), []).append(f"{field}: {message}")
+
+    def run(self) -> None:
+        for field in writable_fields(self.kind):
+            raw = self.frame[field.name] if field.name in self.frame else pd.Series([None] * len(self.frame), dtype=object)
+            text = _text(raw.reset_index(drop=True))
+            present = text.notna() & (text != "")
+            required = not field.blank and not field.has_default()
+            if required:
+                self.fail(field.name, ~present, "This field is required.")
+            value = self._typed(field, text, present)
+            if field.choices:
+                allowed = {choice for choice, _ in field.choices}
+                self.fail(field.name, present & ~value.isin(allowed), f"must be one of: {', '.join(sorted(allowed))}.")
+            check = EXTRA_CHECKS.get((self.kind, field.name))
+            if check is not None:
+                numeric = pd.to_numeric(value.where(present), errors="coerce")
+                self.fail(field.name, present & numeric.notna() & ~check[0](numeric).fillna(True), check[1])
+            self.values[field.name] = value
+
+    def _typed(self, field: models.Field, text: pd.Series, present: pd.Series) -> pd.Series:
+        missing_value = field.get_default() if field.has_default() else None
+        if isinstance(field, models.BooleanField):
+            true_values = {str(v) for v in serializers.BooleanField.TRUE_VALUES}
+            false_values = {str(v) for v in serializers.BooleanField.FALSE_VALUES}
+            is_true, is_false = text.isin(true_values), text.isin(false_values)
+            self.fail(field.name, present & ~is_true & ~is_false, "Must be a valid boolean.")
+            return pd.Series(np.where(is_true, True, np.where(is_false, False, missing_value)), dtype=object)
+
+        if isinstance(field, (models.IntegerField, models.BigIntegerField)):
+            # DRF IntegerField: int(str(value) minus a trailing ".000")
+            digits = text.where(present, "").str.replace(r"\.0*$", "", regex=True)
+            ok = digits.str.fullmatch(_INTEGER)
+            self.fail(field.name, present & ~ok, "A valid integer is required.")
+            low, high = connection.ops.integer_field_range(field.get_internal_type())
+            number = digits.where(ok & present).map(lambda v: int(v) if isinstance(v, str) else None)
+            out_of_range = number.map(lambda v: v is not None and ((low is not None and v < low) or (high is not None and v > high)))
+            self.fail(field.name, out_of_range, f"Ensure this value is between {low} and {high}.")
+            return _where(number, ok & present, missing_value)
+
+        if isinstance(field, models.DecimalField):
+            parts = text.where(present, "").str.extract(f"^{_DECIMAL}$")
+            ok = present & parts["int"].notna() & (parts["int"].fillna("") + parts["frac"].fillna("") != "")
+            self.fail(field.name, present & ~ok, "A valid number is required.")
+            int_digits = parts["int"].fillna("").str.lstrip("0").str.len()
+            frac_digits = parts["frac"].fillna("").str.rstrip("0").str.len()
+            too_many = ok & (int_digits > field.max_digits - field.decimal_places)
+            self.fail(field.name, too_many, f"Ensure that there are no more than {field.max_digits - field.decimal_places} digits before the decimal point.")
+            too_precise = ok & (frac_digits > field.decimal_places)
+            self.fail(field.name, too_precise, f"Ensure that there are no more than {field.decimal_places} decimal places.")
+            return _where(text, ok, missing_value)
+
+        if isinstance(field, models.DateField):
+            dates = pd.to_datetime(text.where(present & text.str.fullmatch(_DATE).fillna(False)), format="%Y-%m-%d", errors="coerce")
+            ok = dates.notna()
+            self.fail(field.name, present & ~ok, "Date has wrong format. Use one of these formats instead: YYYY-MM-DD.")
+            return pd.Series([d.date() if good else missing_value for d, good in zip(dates, ok)], dtype=object)
+
+        if isinstance(field, models.JSONField):
+            raw = self.frame[field.name].reset_index(drop=True) if field.name in self.frame else text
+            parsed, bad = [], []
+            for value, has in zip(raw, present):
+                if not has:
+                    parsed.append(None)
+                    bad.append(False)
+                elif isinstance(value, str):
+                    try:
+                        parsed.append(json.loads(value))
+                        bad.append(False)
+                    except ValueError:
+                        parsed.append(None)
+                        bad.append(True)
+                else:
+                    parsed.append(value.tolist() if hasattr(value, "tolist") else value)
+                    bad.append(False)
+            self.fail(field.name, pd.Series(bad), "Value must be valid JSON.")
+            return pd.Series(parsed, dtype=object)
+
+        # text columns
+        if field.max_length:
+            self.fail(field.name, present & (text.str.len() > field.max_length),
+                      f"Ensure this field has no more than {field.max_length} characters.")
+        if isinstance(field, models.EmailField):
+            validator = EmailValidator()
+            invalid = set()
+            for email in text[present].unique():
+                try:
+                    validator(email)
+                except ValidationError:
+                    invalid.add(email)
+            self.fail(field.name, present & text.isin(invalid), "Enter a valid email address.")
+        if missing_value is None and not field.null:
+            missing_value = ""
+        return _where(text, present, missing_value)
+
+    def rows(self) -> Tuple[List[Dict[str, Any]], Dict[int, List[str]]]:
+        """(field values of each valid row, errors by chunk position)."""
+        valid = [i for i in range(len(self.frame)) if i not in self.errors]
+        columns = {name: values.tolist() for name, values in self.values.items()}
+        return [{name: column[i] for name, column in columns.items()} for i in valid], self.errors
+
+
+def validate_chunk(kind: str, frame: pd.DataFrame) -> Tuple[List[Dict[str, Any]], Dict[int, List[str]]]:
+    validator = _ChunkValidator(kind, frame)
+    validator.run()
+    return validator.rows()
+
+
+def import_chunk(kind: str, rows: List[Dict[str, Any]], score: bool = False, explain="full", pool=None,
+                 source: Optional[str] = None) -> int:
+    """Create profiles for validated `rows` (scored first if `score`) in one transaction. Returns rows created."""
+    if not rows:
+        return 0
+    serializer_class, batch_scorer = KINDS[kind]
+    model = serializer_class.Meta.model
+    profiles = [model(**row) for row in rows]
+    results = features = None
+    if score:
+        features = [{name: row.get(name) for name in SCORING_FIELDS[kind]} for row in rows]
+        results = pool.score(kind, features, explain=explain) if pool is not None else batch_scorer(features, explain=explain)
+        for profile, (value, _, model_version) in zip(profiles, results):
+            profile.score = int(value) if value is not None else None
+            profile.model_version = model_version
+    with transaction.atomic():
+        model.objects.bulk_create(profiles, batch_size=1000)
+        if results is not None and model is IndividualCreditProfile:
+            PredictionLog.objects.bulk_create([
+                PredictionLog(
+                    profile=profile, score=profile.score, model_version=model_version, explanation=explanation,
+                    meta={"updated_via": "import_profiles", "source_file": source, "raw_features": record},
+                )
+                for profile, (_, explanation, model_version), record in zip(profiles, results, features)
+            ], batch_size=1000)
+    return len(profiles)
+
+
+def import_profiles(path: str, kind: str, fmt: Optional[str] = None, chunk_size: int = 10000, score: bool = False,
+                    explain="full", pool=None, dry_run: bool = False,
+                    on_chunk: Optional[Callable[[Dict[str, Any]], None]] = None,
+                    on_reject: Optional[Callable[[int, List[str]], None]] = None) -> Dict[str, Any]:
+    """
+    Import `path` chunk by chunk. `on_chunk` gets the running totals after
+    every chunk, `on_reject` each rejected row's line number (1 = first data
+    row) and errors. Returns read/imported/rejected counts and rows/sec.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of: {', '.join(KINDS)}")
+    fmt = fmt or detect_format(path)
+    started = time.monotonic()
+    totals = {"read": 0, "imported": 0, "rejected": 0, "chunks": 0, "rows_per_sec": None}
+    for frame in read_chunks(path, fmt, chunk_size):
+        rows, errors = validate_chunk(kind, frame)
+        if on_reject is not None:
+            for position in sorted(errors):
+                on_reject(totals["read"] + position + 1, errors[position])
+        if not dry_run:
+            totals["imported"] += import_chunk(kind, rows, score=score, explain=explain, pool=pool,
+                                               source=os.path.basename(path))
+        totals["read"] += len(frame)
+        totals["rejected"] += len(errors)
+        totals["chunks"] += 1
+        elapsed = time.monotonic() - started
+        totals["rows_per_sec"] = round(totals["read"] / elapsed, 1) if elapsed > 0 else None
+        if on_chunk is not None:
+            on_chunk(dict(totals))
+    return totals
@@ -1,8 +1,15 @@
-from django.test import TestCase
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.db import OperationalError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
 from rest_framework.test import APIClient
 from django.urls import reverse
 from .models import PredictionLog
 from .models import IndividualCreditProfile
+from .prediction_logs import PredictionLogWriter, delete_logs_before, prediction_log_writer
 
 class PredictionLogTests(TestCase):
     def setUp(self):
@@ -23,4 +30,102 @@ class PredictionLogTests(TestCase):
         self.assertEqual(resp.status_code, 200)
 
         # Ensure individual was created
-       
\ No newline at end of file
+       
+
+    def test_score_and_log_written_in_one_transaction(self):
+        payload = {
+            "full_name": "Query Count",
+            "yearly_income": 1000000,
+            "existing_debt": 100000,
+            "collateral_value": 200000,
+            "requested_amount": 150000,
+            "credit_history_score": 640,
+            "criminal_history": False
+        }
+        # SAVEPOINT, INSERT profile (score included), INSERT log, RELEASE
+        with self.assertNumQueries(4):
+            resp = self.client.post(self.url, payload, format='json')
+        self.assertEqual(resp.status_code, 200)
+        profile = IndividualCreditProfile.objects.get(id=resp.data['id'])
+        self.assertEqual(profile.score, resp.data['score'])
+        self.assertEqual(PredictionLog.objects.get(profile=profile).score, profile.score)
+
+    def test_dates_and_decimals_are_logged_as_json(self):
+        payload = {"full_name": "Typed Input", "yearly_income": 1000000, "birth_date": "1990-01-02", "salary": "1234.50"}
+        resp = self.client.post(self.url, payload, format='json')
+        self.assertEqual(resp.status_code, 200)
+        raw = PredictionLog.objects.get(profile_id=resp.data['id']).meta["raw_features"]
+        self.assertEqual((raw["birth_date"], raw["salary"], raw["yearly_income"]), ("1990-01-02", "1234.50", 1000000))
+
+    @override_settings(PREDICTION_LOG_BUFFER_SIZE=100, PREDICTION_LOG_FLUSH_INTERVAL=3600)
+    def test_buffered_log_is_queued_after_commit(self):
+        payload = {"full_name": "Buffered", "yearly_income": 1000000, "requested_amount": 150000}
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(self.url, payload, format='json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(PredictionLog.objects.exists())
+        self.assertEqual(prediction_log_writer.pending(), 1)
+        self.assertEqual(prediction_log_writer.flush(), 1)
+        self.assertEqual(PredictionLog.objects.get().profile_id, resp.data['id'])
+
+    def test_failed_flush_keeps_rows_for_the_next_one(self):
+        writer = PredictionLogWriter(buffer_size=100, flush_interval=3600)
+        with self.captureOnCommitCallbacks(execute=True):
+            writer.write(PredictionLog(score=1))
+            writer.write(PredictionLog(score=2))
+        with mock.patch.object(PredictionLog.objects, 'bulk_create', side_effect=OperationalError("db down")), \
+                mock.patch.object(PredictionLog, 'save', side_effect=OperationalError("db down")):
+            self.assertEqual(writer.flush(), 0)
+        self.assertEqual(writer.pending(), 2)
+        self.assertEqual(writer.flush(), 2)
+        self.assertEqual(sorted(PredictionLog.objects.values_list('score', flat=True)), [1, 2])
+
+    def test_bad_row_is_dropped_without_losing_the_batch(self):
+        writer = PredictionLogWriter(buffer_size=100, flush_interval=3600)
+        with self.captureOnCommitCallbacks(execute=True):
+            writer.write(PredictionLog(score=1))
+            writer.write(PredictionLog(score=2, meta={"unserializable": object()}))
+            writer.write(PredictionLog(score=3))
+        with self.assertLogs('apps.individuals.prediction_logs', 'ERROR'):
+            self.assertEqual(writer.flush(), 2)
+        self.assertEqual(writer.pending(), 0)
+        self.assertEqual(sorted(PredictionLog.objects.values_list('score', flat=True)), [1, 3])
+
+
+class PredictionLogWriterThreadTests(TransactionTestCase):
+    def _wait_for(self, count):
+        deadline = time.monotonic() + 5
+        while PredictionLog.objects.count() < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return PredictionLog.objects.count()
+
+    def test_flushes_when_the_buffer_fills(self):
+        writer = PredictionLogWriter(buffer_size=5, flush_interval=3600)
+        self.addCleanup(writer.stop)
+        for i in range(5):
+            writer.write(PredictionLog(score=i))
+        self.assertEqual(self._wait_for(5), 5)
+        self.assertEqual(writer.pending(), 0)
+
+    def test_flushes_on_the_interval(self):
+        writer = PredictionLogWriter(buffer_size=100, flush_interval=0.05)
+        self.addCleanup(writer.stop)
+        writer.write(PredictionLog(score=7))
+        self.assertEqual(self._wait_for(1), 1)
+        # an idle flusher wakes up for the next row too
+        writer.write(PredictionLog(score=8))
+        self.assertEqual(self._wait_for(2), 2)
+
+
+class DeleteLogsBeforeTests(TestCase):
+    def test_deletes_expired_rows_in_id_batches(self):
+        now = timezone.now()
+        logs = PredictionLog.objects.bulk_create([PredictionLog(score=i) for i in range(10)])
+        for i, log in enumerate(logs):
+            PredictionLog.objects.filter(pk=log.pk).update(created_at=now - timedelta(days=100 - i if i < 7 else 1))
+
+        batches = list(delete_logs_before(now - timedelta(days=90), batch_size=3))
+        self.assertEqual(batches, [(3, logs[2].id), (3, logs[5].id), (1, logs[8].id)])
+        self.assertEqual(list(PredictionLog.objects.order_by('id').values_list('id', flat=True)), [log.id for log in logs[7:]])
+        self.assertEqual(list(delete_logs_before(now - timedelta(days=90), batch_size=3)), [])
+
@@ -1,23 +1,46 @@
-from django.db import OperationalError
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import OperationalError, transaction
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
 from .serializers import IndividualCreditProfileSerializer
 from .models import IndividualCreditProfile, PredictionLog
+from .prediction_logs import prediction_log_writer
 from apps.scoring_engine.ml.risk_model import predict_individual_risk
 
 class IndividualCreditView(APIView):
     """
     POST /api/individuals/score/
-    Validates, saves application, runs scoring, updates the instance with score & model_version, returns result.
+    Validates, runs scoring, saves the application with score & model_version plus its audit log, returns result.
     """
     def post(self, request, *args, **kwargs):
         serializer = IndividualCreditProfileSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
+        # Score from the validated input before touching the DB, then write the
+        # profile (score included) and its audit log in one transaction.
+        features = serializer.validated_data
+        score, explanation, model_version = predict_individual_risk(features)
+        score = int(score) if score is not None else None
+
         try:
-            application = serializer.save()
+            with transaction.atomic():
+                application = serializer.save(score=score, model_version=model_version)
+                prediction_log_writer.write(PredictionLog(
+                    profile=application,
+                    score=score,
+                    model_version=model_version,
+                    explanation=explanation,
+                    meta={
+                        "request_ip": request.META.get("REMOTE_ADDR"),
+                        "user_agent": request.META.get("HTTP_USER_AGENT"),
+                        # validated_data holds dates and Decimals; store their JSON form
+                        "raw_features": json.loads(json.dumps(features, cls=DjangoJSONEncoder)),
+                    }
+                ))
         except OperationalError as exc:
             # DB might not be migrated yet
             return Response(
@@ -25,37 +48,6 @@ class IndividualCreditView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-        # Build features dict for scoring - prefer validated_data
-        features = serializer.validated_data
-        score, explanation, model_version = predict_individual_risk(features)
-
-        # Save score and model_version without re-validating everything
-        try:
-            application.score = int(score) if score is not None else None
-            application.model_version = model_version
-            application.explanation = explanation
-            application.save(update_fields=['score', 'model_version', 'explanation', 'updated_at'])
-        except Exception:
-            # non-fatal for endpoint: we still return the score even if DB update fails
-            pass
-
-        # Create an audit log entry
-        try:
-            PredictionLog.objects.create(
-                profile=application,
-                score=int(score) if score is not None else None,
-                model_version=model_version,
-                explanation=explanation,
-                meta={
-                    "request_ip": request.META.get("REMOTE_ADDR"),
-                    "user_agent": request.META.get("HTTP_USER_AGENT"),
-                    "raw_features": features
-                }
-            )
-        except Exception:
-            # logging failure must not break API response
-            pass
-
         return Response({
             "id": application.id,
             "score": score,
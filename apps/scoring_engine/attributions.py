@@ -0,0 +1,82 @@
+"""
+SHAP attributions for PredictionLog rows, computed after the prediction.
+
+Model-scored log rows keep the model inputs in meta["raw_features"] (and
+meta["applicant_type"] for companies). attach_attributions() groups pending
+rows by kind and model version, runs one SHAP batch per group and stores the
+top-k drivers in PredictionLog.attributions with one bulk_update, so a row
+is explained at most once. Rows of the active model that can't be explained
+(no or unparseable raw_features, a model SHAP can't explain, shap not
+installed) get UNAVAILABLE, so they aren't read again; rows whose model is no
+longer active stay null.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from apps.individuals.models import PredictionLog
+from apps.scoring_engine.ml.risk_model import current_model_version, model_attributions
+
+MODEL_VERSION_PREFIX = "joblib:"
+
+# stored for model-scored rows that can't be explained
+UNAVAILABLE: List[Dict[str, Any]] = []
+
+
+def attribution_meta(kind: str, features: Dict[str, Any], model_version: str, meta: Optional[Dict[str, Any]] = None):
+    """
+    meta for a PredictionLog row: model-scored predictions also record their
+    inputs so attributions can be computed later. Rule-scored ones are left
+    as they are, since their explanation is already complete.
+    """
+    if not model_version or not model_version.startswith(MODEL_VERSION_PREFIX):
+        return meta
+    return {**(meta or {}), "applicant_type": kind, "raw_features": features}
+
+
+def pending(log: PredictionLog) -> bool:
+    return log.attributions is None and bool(log.model_version) and log.model_version.startswith(MODEL_VERSION_PREFIX)
+
+
+def _kind(log: PredictionLog) -> str:
+    return log.meta.get("applicant_type", "individual") if isinstance(log.meta, dict) else "individual"
+
+
+def attach_attributions(logs: Iterable[PredictionLog], top_k: Optional[int] = None) -> int:
+    """
+    Compute and save attributions for the pending rows among `logs`, marking
+    the ones the active model can't explain UNAVAILABLE. Returns how many were explained.
+    """
+    groups: Dict[Tuple[str, str], List[PredictionLog]] = {}
+    unavailable = []
+    for log in logs:
+        if not pending(log):
+            continue
+        if isinstance(log.meta, dict) and isinstance(log.meta.get("raw_features"), dict):
+            groups.setdefault((_kind(log), log.model_version), []).append(log)
+        elif log.model_version == current_model_version(_kind(log)):
+            unavailable.append(log)
+
+    explained = []
+    for (kind, model_version), group in groups.items():
+        drivers = model_attributions(kind, [log.meta["raw_features"] for log in group], model_version, top_k)
+        if drivers is None:
+            if model_version == current_model_version(kind):
+                unavailable.extend(group)  # active, but not explainable
+            continue
+        for log, items in zip(group, drivers):
+            if items is not None:
+                log.attributions = items
+                explained.append(log)
+            else:
+                unavailable.append(log)
+    for log in unavailable:
+        log.attributions = list(UNAVAILABLE)
+    if explained or unavailable:
+        PredictionLog.objects.bulk_update(explained + unavailable, ["attributions"])
+    return len(explained)
+
+
+def get_attributions(log: PredictionLog) -> Optional[List[Dict[str, Any]]]:
+    """Stored attributions for `log`, computing them on first access. None or UNAVAILABLE if there are none."""
+    if log.attributions is None:
+        attach_attributions([log])
+    return log.attributions
@@ -0,0 +1,93 @@
+"""
+Per-feature SHAP attributions for model-scored predictions.
+
+Scoring never runs SHAP: a model-scored prediction carries the one-line
+"scored by ML model" explanation and its attributions are filled in later,
+in batches (see apps/scoring_engine/attributions.py).
+
+- one shap.TreeExplainer per kind and model version, built on first use and
+  replaced when a new model version shows up
+- shap is imported on first use; without it, or for models TreeExplainer
+  doesn't support, explain() returns None
+- only the top_k features by |SHAP value| are kept. impact is the SHAP value
+  in the model's raw output units (log-odds for gradient boosting), signed
+  towards a higher score
+"""
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Names of the columns produced by risk_model._map_*_features_to_vector
+FEATURE_NAMES = {
+    "individual": [
+        "yearly_income", "existing_debt", "requested_amount", "collateral_value",
+        "credit_history_score", "criminal_history", "debt_to_income", "collateral_to_requested",
+    ],
+    "company": ["revenue", "net_income", "assets", "liabilities", "profit_margin", "leverage"],
+}
+
+
+def _positive_class(values: Any) -> np.ndarray:
+    # binary classifiers: (n, f) for margin models, (n, f, 2) or [neg, pos] for forests
+    if isinstance(values, list):
+        values = values[-1]
+    values = np.asarray(values, dtype=float)
+    return values[..., -1] if values.ndim == 3 else values
+
+
+def top_drivers(names: List[str], x: np.ndarray, phi: np.ndarray, top_k: int) -> List[Dict[str, Any]]:
+    """The top_k non-zero attributions of one row, largest |impact| first."""
+    drivers = []
+    for i in np.argsort(-np.abs(phi), kind="stable")[:top_k].tolist():
+        impact = float(phi[i])
+        if impact == 0:
+            break
+        direction = "raises" if impact > 0 else "lowers"
+        drivers.append({"feature": names[i], "impact": round(impact, 4), "reason": f"{names[i]}={x[i]:g} {direction} the score"})
+    return drivers
+
+
+class TreeExplainers:
+    def __init__(self):
+        self._explainers: Dict[str, Tuple[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, kind: str, model: Any, version: str) -> Optional[Any]:
+        """The explainer for `model` (None if it can't be explained), built once per version."""
+        with self._lock:
+            cached = self._explainers.get(kind)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            explainer = self._build(model, version)
+            self._explainers[kind] = (version, explainer)
+            return explainer
+
+    @staticmethod
+    def _build(model: Any, version: str) -> Optional[Any]:
+        try:
+            import shap
+        except ImportError:
+            logger.warning("shap is not installed; model %s gets no attributions", version)
+            return None
+        try:
+            return shap.TreeExplainer(model)
+        except Exception as exc:
+            logger.info("No TreeExplainer for model %s: %s", version, exc)
+            return None
+
+    def explain(self, kind: str, model: Any, version: str, X: np.ndarray, top_k: int) -> Optional[List[List[Dict[str, Any]]]]:
+        """Top-k drivers for every row of X, or None when the model can't be explained."""
+        explainer = self.get(kind, model, version)
+        if explainer is None:
+            return None
+        phi = _positive_class(explainer.shap_values(X))
+        names = FEATURE_NAMES[kind]
+        return [top_drivers(names, x, row, top_k) for x, row in zip(X, phi)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._explainers.clear()
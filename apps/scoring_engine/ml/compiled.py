@@ -0,0 +1,449 @@
+"""
+Compiled inference for fitted models.
+
+Tree ensembles and linear models are exported once into flat NumPy arrays, so
+a prediction is a handful of array operations instead of an estimator call
+with its input validation and dispatch (hundreds of microseconds per row).
+
+compile_model(model) returns an object with the estimator's predict_proba
+(binary classifiers) or predict (regressors), or None when the model isn't
+supported, in which case callers keep using the estimator itself:
+
+- sklearn: LogisticRegression (binary), LinearRegression / Ridge / Lasso /
+  ElasticNet, DecisionTree*, RandomForest*, ExtraTrees*,
+  GradientBoosting* (binary log_loss / squared_error, default init)
+- xgboost: XGBClassifier (binary:logistic) and XGBRegressor
+  (reg:squarederror), gbtree booster, numeric splits
+- lightgbm: LGBMClassifier (binary) and LGBMRegressor (regression),
+  numeric splits
+
+Predictions are the estimator's own, bit for bit: trees see the same input
+dtype (float32 for sklearn and xgboost, float64 for lightgbm) and comparison
+(<= or <), tree outputs are added in the estimator's order and precision
+(np.cumsum is sequential), and the link functions use the same exp
+(scipy's expit for sklearn, the C library exp for xgboost/lightgbm).
+
+Inputs are validated as the estimator validates them, so a row the estimator
+rejects (and the scorer then scores with the rules) is rejected here too:
+sklearn models refuse inf, values that overflow float32 for the float32 ones,
+and NaN unless the estimator supports missing values; xgboost and lightgbm
+take anything.
+
+This pays off for single rows, where the estimators' per-call overhead
+dominates; for large batches their compiled loops are faster, so the batch
+scorers keep calling the estimator (see benchmarks/bench_inference.py).
+
+Nodes of all trees live in shared arrays and all (row, tree) paths advance
+together, one level per step; once most paths have reached a leaf the rest
+are stepped on their own.
+"""
+import json
+import logging
+import math
+import threading
+from typing import Any, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# how a node routes NaN (and, for lightgbm "Zero", zero) inputs
+MISSING_DEFAULT = 0    # NaN follows the node's default direction (sklearn, xgboost, lightgbm "NaN")
+MISSING_AS_ZERO = 1    # NaN is read as 0.0 (lightgbm "None")
+MISSING_ZERO = 2       # NaN is read as 0.0, and 0.0 follows the default direction (lightgbm "Zero")
+_LGB_MISSING = {"NaN": MISSING_DEFAULT, "None": MISSING_AS_ZERO, "Zero": MISSING_ZERO}
+_LGB_ZERO_THRESHOLD = 1e-35
+
+
+class TreeEnsemble:
+    """
+    Flattened trees. Each tree is a dict of equal-length node lists: feature,
+    threshold, left, right (-1 for leaves, local indices), value (a number,
+    or a list of numbers, per node), default_left and optionally missing
+    (MISSING_* per node).
+    """
+    def __init__(self, trees: List[dict], strict: bool, input_dtype, value_dtype=np.float64):
+        self.input_dtype = input_dtype
+        self.strict = strict  # x < threshold (xgboost) instead of x <= threshold
+        feature, threshold, left, right, value, default_left, missing, roots = [], [], [], [], [], [], [], []
+        for tree in trees:
+            offset = len(feature)
+            roots.append(offset)
+            n = len(tree["feature"])
+            for i in range(n):
+                leaf = tree["left"][i] < 0
+                feature.append(0 if leaf else tree["feature"][i])
+                threshold.append(0.0 if leaf else tree["threshold"][i])
+                left.append(offset + i if leaf else offset + tree["left"][i])
+                right.append(offset + i if leaf else offset + tree["right"][i])
+                value.append(tree["value"][i])
+                default_left.append(bool(tree["default_left"][i]))
+                missing.append(tree.get("missing", [MISSING_DEFAULT] * n)[i])
+
+        self.feature = np.array(feature, dtype=np.intp)
+        # xgboost compares in float32; everything else in double
+        self.threshold = np.array(threshold, dtype=np.float32 if strict else np.float64)
+        self.left = np.array(left, dtype=np.intp)
+        self.right = np.array(right, dtype=np.intp)
+        self.value = np.array(value, dtype=value_dtype)
+        self.default_left = np.array(default_left, dtype=bool)
+        self.missing = np.array(missing, dtype=np.int8)
+        self.roots = np.array(roots, dtype=np.intp)
+        self.is_leaf = self.left == np.arange(len(self.left))
+        self.children = np.column_stack([self.left, self.right]).reshape(-1)  # [2 * node + went_right]
+        self.zero_missing = bool((self.missing == MISSING_ZERO).any())
+        self.nan_as_zero = bool((self.missing != MISSING_DEFAULT).any())
+
+    def __len__(self):
+        return len(self.roots)
+
+    def leaf_values(self, X: np.ndarray) -> np.ndarray:
+        """(n_rows, n_trees) leaf value of every tree for every row, (n_rows, n_trees, k) for list values."""
+        X = np.asarray(X, dtype=self.input_dtype)
+        n_rows, n_trees = X.shape[0], len(self.roots)
+        check_missing = self.zero_missing or bool(np.isnan(X).any())
+        # flat (row, tree) paths; a path's input value is X_flat[row_offset + feature]
+        X_flat = X.reshape(-1)
+        offsets = np.repeat(np.arange(n_rows) * X.shape[1], n_trees) if n_rows > 1 else None
+        node = np.tile(self.roots, n_rows) if n_rows > 1 else self.roots.copy()
+        # all paths step together (leaves point to themselves); once most have
+        # reached a leaf, only the remaining ones are carried on
+        active = None
+        while True:
+            current = node if active is None else node.take(active)
+            index = self.feature.take(current)
+            if offsets is not None:
+                index += offsets if active is None else offsets.take(active)
+            x = X_flat.take(index)
+            if check_missing:
+                go_left = self._route_missing(x, current)
+            else:
+                threshold = self.threshold.take(current)
+                go_left = x < threshold if self.strict else x <= threshold
+            current = self.children.take(2 * current + ~go_left)
+            inner = ~self.is_leaf.take(current)
+            if active is None:
+                node = current
+                remaining = np.count_nonzero(inner)
+                if remaining * 2 < len(node):
+                    active = np.flatnonzero(inner)
+            else:
+                node[active] = current
+                active = active[inner]
+                remaining = active.size
+            if not remaining:
+                return self.value.take(node, axis=0).reshape(n_rows, n_trees, *self.value.shape[1:])
+
+    def _route_missing(self, x: np.ndarray, node: np.ndarray) -> np.ndarray:
+        missing = self.missing[node]
+        nan = np.isnan(x)
+        if self.nan_as_zero:
+            x = np.where(nan & (missing != MISSING_DEFAULT), 0.0, x)
+        threshold = self.threshold[node]
+        go_left = x < threshold if self.strict else x <= threshold
+        use_default = nan & (missing == MISSING_DEFAULT)
+        if self.zero_missing:
+            use_default |= (missing == MISSING_ZERO) & (np.abs(x) <= _LGB_ZERO_THRESHOLD)
+        return np.where(use_default, self.default_left[node], go_left)
+
+
+def _sum_in_order(start, leaf_values: np.ndarray) -> np.ndarray:
+    # start + tree_1 + tree_2 + ..., one addition at a time like the estimators do
+    n = leaf_values.shape[0]
+    columns = np.empty((n, leaf_values.shape[1] + 1), dtype=leaf_values.dtype)
+    columns[:, 0] = start
+    columns[:, 1:] = leaf_values
+    return np.cumsum(columns, axis=1)[:, -1]
+
+
+def _libm_exp(values: np.ndarray) -> np.ndarray:
+    # numpy's vectorized exp can differ from the C library's by an ulp
+    return np.fromiter(map(math.exp, values.tolist()), dtype=np.float64, count=len(values))
+
+
+class InputCheck:
+    """sklearn's check_array(X, dtype, ensure_all_finite) for 2-d numeric input: raises ValueError like it."""
+    def __init__(self, dtype, allow_nan: bool = False):
+        self.dtype = dtype
+        self.allow_nan = allow_nan
+
+    def __call__(self, X) -> np.ndarray:
+        with np.errstate(over="ignore"):  # overflowing values become inf and are rejected below
+            X = np.asarray(X, dtype=self.dtype)
+        if X.dtype.kind == "f" and not np.isfinite(X).all():
+            # values too large for float32 are inf after the cast, as in check_array
+            if np.isinf(X).any() or not self.allow_nan:
+                raise ValueError(f"Input contains NaN, infinity or a value too large for {X.dtype!r}.")
+        return X
+
+
+def _no_check(X):
+    return X
+
+
+class CompiledClassifier:
+    """
+    Binary classifier: positive-class probability from a raw score, or with
+    link "proba", raw gives both columns as they are.
+    """
+    def __init__(self, raw, link: str, check=_no_check):
+        self.raw = raw  # X -> raw score per row
+        self.link = link
+        self.check = check  # the estimator's input validation
+
+    def predict_proba(self, X) -> np.ndarray:
+        raw = self.raw(self.check(X))
+        if self.link == "proba":
+            return raw
+        if self.link == "expit":  # sklearn models only, and sklearn brings scipy
+            from scipy.special import expit
+
+            p = expit(raw)
+        elif self.link == "sigmoid32":  # xgboost: 1 / (1 + expf(-x)) in float32
+            p = np.float32(1.0) / (np.float32(1.0) + _libm_exp(-raw.astype(np.float64)).astype(np.float32))
+        elif self.link.startswith("sigmoid:"):  # lightgbm: 1 / (1 + exp(-sigmoid * x))
+            p = 1.0 / (1.0 + _libm_exp(-float(self.link.split(":")[1]) * raw))
+        else:
+            p = raw
+        return np.column_stack([1 - p, p])
+
+
+class CompiledRegressor:
+    def __init__(self, raw, check=_no_check):
+        self.raw = raw
+        self.check = check
+
+    def predict(self, X) -> np.ndarray:
+        return self.raw(self.check(X))
+
+
+# ---------------- sklearn ----------------
+
+def _sklearn_tree(tree, value) -> dict:
+    return {
+        "feature": tree.feature.tolist(),
+        "threshold": tree.threshold.tolist(),
+        "left": tree.children_left.tolist(),
+        "right": tree.children_right.tolist(),
+        "value": value,
+        "default_left": getattr(tree, "missing_go_to_left", np.zeros(tree.node_count, dtype=bool)).tolist(),
+    }
+
+
+def _class_fractions(tree) -> List[List[float]]:
+    # DecisionTreeClassifier.predict_proba: value rows normalized by their sum
+    value = tree.value[:, 0, :2]
+    normalizer = value.sum(axis=1)
+    normalizer[normalizer == 0.0] = 1.0
+    return (value / normalizer[:, None]).tolist()
+
+
+def _compile_sklearn(model) -> Optional[Any]:
+    name = type(model).__name__
+    classes = getattr(model, "classes_", None)
+    if classes is not None and len(classes) != 2:
+        return None
+
+    check = InputCheck(np.float64)
+    if name == "LogisticRegression":
+        coef_T, intercept = model.coef_.T, model.intercept_
+        return CompiledClassifier(lambda X: (X @ coef_T + intercept).reshape(-1), "expit", check)
+    if name in ("LinearRegression", "Ridge", "Lasso", "ElasticNet") and np.ndim(model.coef_) == 1:
+        coef, intercept = model.coef_, model.intercept_
+        return CompiledRegressor(lambda X: X @ coef + intercept, check)
+
+    if name in ("DecisionTreeClassifier", "DecisionTreeRegressor"):
+        estimators = [model]
+    elif name in ("RandomForestClassifier", "RandomForestRegressor", "ExtraTreesClassifier", "ExtraTreesRegressor"):
+        estimators = list(model.estimators_)
+    elif name in ("GradientBoostingClassifier", "GradientBoostingRegressor"):
+        return _compile_sklearn_gb(model, name)
+    else:
+        return None
+
+    # trees take NaN when the estimator supports missing values (forests ask their first tree)
+    support_missing = getattr(estimators[0], "_support_missing_values", None)
+    check = InputCheck(np.float32, allow_nan=bool(support_missing and support_missing(np.zeros((1, 1)))))
+    if name.endswith("Classifier"):
+        ensemble = TreeEnsemble([_sklearn_tree(e.tree_, _class_fractions(e.tree_)) for e in estimators], False, np.float32)
+        n = len(estimators)
+
+        def proba(X):
+            # both columns are averaged, as the forest does, rather than 1 - p
+            fractions = ensemble.leaf_values(X)
+            return np.column_stack([_sum_in_order(0.0, fractions[:, :, c]) / n for c in (0, 1)])
+
+        return CompiledClassifier(proba, "proba", check)
+    ensemble = TreeEnsemble([_sklearn_tree(e.tree_, e.tree_.value[:, 0, 0].tolist()) for e in estimators], False, np.float32)
+    n = len(estimators)
+    return CompiledRegressor(lambda X: _sum_in_order(0.0, ensemble.leaf_values(X)) / n, check)
+
+
+def _compile_sklearn_gb(model, name: str) -> Optional[Any]:
+    if model.estimators_.shape[1] != 1:
+        return None
+    if name == "GradientBoostingClassifier" and model.loss != "log_loss":
+        return None
+    if name == "GradientBoostingRegressor" and model.loss != "squared_error":
+        return None
+    if model.init not in (None, "zero"):
+        return None  # custom init estimators may depend on X
+    init = float(model._raw_predict_init(np.zeros((1, model.n_features_in_)))[0, 0])
+    scale = model.learning_rate
+    trees = []
+    for estimator in model.estimators_[:, 0]:
+        tree = estimator.tree_
+        # predict_stages adds scale * value for every stage
+        trees.append(_sklearn_tree(tree, (scale * tree.value[:, 0, 0]).tolist()))
+    ensemble = TreeEnsemble(trees, False, np.float32)
+    raw = lambda X: _sum_in_order(init, ensemble.leaf_values(X))  # noqa: E731
+    check = InputCheck(np.float32)  # no missing-value support: NaN is rejected
+    if name == "GradientBoostingClassifier":
+        return CompiledClassifier(raw, "expit", check)
+    return CompiledRegressor(raw, check)
+
+
+# ---------------- xgboost ----------------
+
+def _compile_xgboost(model) -> Optional[Any]:
+    name = type(model).__name__
+    missing = getattr(model, "missing", np.nan)
+    if missing is not None and not (isinstance(missing, float) and math.isnan(missing)):
+        return None
+    booster = model.get_booster()
+    learner = json.loads(booster.save_raw("json"))["learner"]
+    objective = learner["objective"]["name"]
+    gbm = learner["gradient_booster"]
+    if gbm["name"] != "gbtree" or int(learner["learner_model_param"].get("num_class", "0")) > 1:
+        return None
+    if (name, objective) not in (("XGBClassifier", "binary:logistic"), ("XGBRegressor", "reg:squarederror")):
+        return None
+
+    trees_json = gbm["model"]["trees"]
+    best = getattr(model, "best_iteration", None) if hasattr(model, "_Booster") else None
+    if best is not None:
+        per_round = int(gbm["model"]["gbtree_model_param"].get("num_parallel_tree", "1"))
+        trees_json = trees_json[:(best + 1) * per_round]
+    trees = []
+    for tree in trees_json:
+        if any(tree.get("split_type", [])):
+            return None  # categorical splits
+        trees.append({
+            "feature": tree["split_indices"],
+            "threshold": tree["split_conditions"],
+            "left": tree["left_children"],
+            "right": tree["right_children"],
+            "value": tree["split_conditions"],  # leaf value for leaves
+            "default_left": tree["default_left"],
+        })
+    ensemble = TreeEnsemble(trees, True, np.float32, value_dtype=np.float32)
+
+    base_score = np.float32(float(learner["learner_model_param"]["base_score"].strip("[]")))
+    if objective == "binary:logistic":
+        base_margin = np.float32(-np.log(np.float32(1.0) / base_score - np.float32(1.0)))
+        return CompiledClassifier(lambda X: _sum_in_order(base_margin, ensemble.leaf_values(X)), "sigmoid32")
+    return CompiledRegressor(lambda X: _sum_in_order(base_score, ensemble.leaf_values(X)))
+
+
+# ---------------- lightgbm ----------------
+
+def _lgb_tree(structure: dict) -> Optional[dict]:
+    tree = {"feature": [], "threshold": [], "left": [], "right": [], "value": [], "default_left": [], "missing": []}
+
+    def add(node) -> int:
+        index = len(tree["feature"])
+        for key in tree:
+            tree[key].append(None)
+        if "leaf_value" in node:
+            tree["feature"][index], tree["threshold"][index] = 0, 0.0
+            tree["left"][index] = tree["right"][index] = -1
+            tree["value"][index], tree["default_left"][index] = node["leaf_value"], False
+            tree["missing"][index] = MISSING_DEFAULT
+            return index
+        if node["decision_type"] != "<=":
+            raise ValueError("categorical split")
+        tree["feature"][index], tree["threshold"][index] = node["split_feature"], node["threshold"]
+        tree["value"][index], tree["default_left"][index] = 0.0, node["default_left"]
+        tree["missing"][index] = _LGB_MISSING[node["missing_type"]]
+        tree["left"][index] = add(node["left_child"])
+        tree["right"][index] = add(node["right_child"])
+        return index
+
+    try:
+        add(structure)
+    except (KeyError, ValueError):
+        return None
+    return tree
+
+
+def _compile_lightgbm(model) -> Optional[Any]:
+    name = type(model).__name__
+    booster = model.booster_
+    dump = booster.dump_model(num_iteration=getattr(model, "best_iteration_", None) or None)
+    objective = dump.get("objective", "")
+    if dump.get("num_tree_per_iteration", 1) != 1 or dump.get("average_output"):
+        return None
+    if name == "LGBMClassifier" and objective.startswith("binary"):
+        params = dict(p.split(":", 1) for p in objective.split()[1:] if ":" in p)
+        link = "sigmoid:" + params.get("sigmoid", "1")
+    elif name == "LGBMRegressor" and objective.split()[0] in ("regression", "regression_l2"):
+        link = None
+    else:
+        return None
+
+    trees = [_lgb_tree(info["tree_structure"]) for info in dump["tree_info"]]
+    if any(tree is None for tree in trees):
+        return None
+    ensemble = TreeEnsemble(trees, False, np.float64)
+    raw = lambda X: _sum_in_order(0.0, ensemble.leaf_values(X))  # noqa: E731
+    return CompiledClassifier(raw, link) if link else CompiledRegressor(raw)
+
+
+def compile_model(model) -> Optional[Any]:
+    """Compiled form of a fitted model, or None if it isn't supported."""
+    module = type(model).__module__.split(".")[0]
+    if module == "sklearn":
+        return _compile_sklearn(model)
+    if module == "xgboost":
+        return _compile_xgboost(model)
+    if module == "lightgbm":
+        return _compile_lightgbm(model)
+    return None
+
+
+class CompiledModels:
+    """
+    compile_model() results per kind and model version, compiled on first use
+    and replaced when the version changes. Models that can't be compiled are
+    returned as they are.
+    """
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def get(self, kind: str, model: Any, version: str) -> Any:
+        if not self.enabled or model is None:
+            return model
+        cached = self._compiled.get(kind)
+        if cached is None or cached[0] != version:
+            with self._lock:
+                cached = self._compiled.get(kind)
+                if cached is None or cached[0] != version:
+                    cached = self._compiled[kind] = (version, self._compile(model, version))
+        return cached[1] if cached[1] is not None else model
+
+    @staticmethod
+    def _compile(model: Any, version: str) -> Optional[Any]:
+        try:
+            compiled = compile_model(model)
+        except Exception:
+            logger.exception("Compiling model %s failed; using the estimator", version)
+            return None
+        if compiled is None:
+            logger.info("Model %s (%s) has no compiled form; using the estimator", version, type(model).__name__)
+        return compiled
+
+    def clear(self) -> None:
+        with self._lock:
+            self._compiled.clear()
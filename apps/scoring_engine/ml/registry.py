@@ -0,0 +1,181 @@
+"""
+Model registry for the joblib artifacts under ml/models/.
+
+Each registry tracks one model name. The active artifact is the highest
+versioned file `<name>-<version>.joblib` (e.g. individual_model-3.joblib),
+or the plain `<name>.joblib` when no versioned file exists.
+
+- get() returns (model, version). At most every `check_interval` seconds it
+  stats the artifact (mtime/size only - no file read) and reloads on change.
+- A new model is fully loaded before it replaces the old one with a single
+  reference assignment, so in-flight predictions keep using the model they
+  already hold. Deploy artifacts by writing to a temp file and renaming.
+- A failed load is logged once per artifact change and the previously
+  active model stays in place.
+- version is "<filename>@<sha256 prefix>" and ends up in model_version.
+- Nothing is loaded at import time. The first get() loads the model, or
+  warm_up() does it on a background thread; is_ready() reports whether the
+  initial load has finished. joblib (and the sklearn/xgboost/lightgbm
+  modules a pickle pulls in) is only imported when an artifact is loaded.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_SUFFIX = ".joblib"
+
+
+class LoadedModel(NamedTuple):
+    model: Any
+    version: str
+    signature: Optional[Tuple[str, int, int]]  # (path, mtime_ns, size) of the artifact it was loaded from
+
+
+def _signature(path: Optional[str]) -> Optional[Tuple[str, int, int]]:
+    if path is None:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (path, st.st_mtime_ns, st.st_size)
+
+
+def _file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _version_key(version: str):
+    # natural sort so "10" > "9" and "1.10" > "1.9"
+    return [(0, int(part), "") if part.isdigit() else (1, 0, part) for part in re.split(r"[.\-_]", version)]
+
+
+class ModelRegistry:
+    def __init__(self, name: str, model_dir: str, check_interval: float = 5.0):
+        self.name = name
+        self.model_dir = model_dir
+        self.check_interval = check_interval
+        self._versioned = re.compile(r"^%s-(?P<version>.+)%s$" % (re.escape(name), re.escape(ARTIFACT_SUFFIX)))
+        self._active: Optional[LoadedModel] = None
+        self._last_check: Optional[float] = None
+        self._failed_signature: Optional[Tuple[str, int, int]] = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def resolve_artifact(self) -> Optional[str]:
+        """Path of the artifact that should be active, or None if there is none."""
+        try:
+            entries = os.listdir(self.model_dir)
+        except OSError:
+            return None
+        versioned = {}
+        for filename in entries:
+            m = self._versioned.match(filename)
+            if m:
+                versioned[m.group("version")] = filename
+        if versioned:
+            return os.path.join(self.model_dir, versioned[max(versioned, key=_version_key)])
+        plain = os.path.join(self.model_dir, self.name + ARTIFACT_SUFFIX)
+        return plain if os.path.exists(plain) else None
+
+    def get(self) -> Tuple[Any, Optional[str]]:
+        """Return (model, version) of the active model, or (None, None) if there is none."""
+        last = self._last_check
+        if last is None or time.monotonic() - last >= self.check_interval:
+            # Block only when nothing is loaded yet; otherwise keep serving the
+            # current model while another thread does the reload.
+            self.refresh(blocking=self._active is None)
+        active = self._active
+        if active is None:
+            return None, None
+        return active.model, active.version
+
+    @property
+    def version(self) -> Optional[str]:
+        """Version of the active model without triggering a load."""
+        active = self._active
+        return active.version if active is not None else None
+
+    def is_ready(self) -> bool:
+        """True once the initial load has run (whether or not an artifact was found)."""
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def warm_up(self, background: bool = True) -> Optional[threading.Thread]:
+        """Load the model now, on a daemon thread by default, so the first prediction doesn't pay for it."""
+        if self.is_ready():
+            return None
+        if not background:
+            self.refresh()
+            return None
+        thread = threading.Thread(target=self.refresh, name=f"warm-up-{self.name}", daemon=True)
+        thread.start()
+        return thread
+
+    def refresh(self, force: bool = False, blocking: bool = True) -> bool:
+        """Reload the model if its artifact changed. Returns True if the active model was swapped."""
+        if not self._lock.acquire(blocking=blocking):
+            return False
+        try:
+            self._last_check = time.monotonic()
+            path = self.resolve_artifact()
+            signature = _signature(path)
+            active = self._active
+            if not force and (active.signature if active is not None else None) == signature:
+                return False
+            if not force and signature is not None and signature == self._failed_signature:
+                return False
+            if signature is None:
+                logger.info("Model artifact for %s removed; falling back to rules", self.name)
+                self._active = None
+                return True
+            loaded = self._load(path, signature)
+            if loaded is None:
+                self._failed_signature = signature
+                return False
+            self._active = loaded
+            logger.info("Activated model %s", loaded.version)
+            return True
+        finally:
+            self._ready.set()
+            self._lock.release()
+
+    def activate(self, model: Any, version: str) -> None:
+        """Swap in an already loaded model (e.g. for tests or programmatic deploys)."""
+        self._active = LoadedModel(model, version, _signature(self.resolve_artifact()))
+        self._last_check = time.monotonic()
+        self._ready.set()
+
+    def reset(self) -> None:
+        """Forget the active model; the next get() loads from disk again."""
+        with self._lock:
+            self._active = None
+            self._last_check = None
+            self._failed_signature = None
+            self._ready.clear()
+
+    def _load(self, path: str, signature: Tuple[str, int, int]) -> Optional[LoadedModel]:
+        try:
+            import joblib
+        except Exception:
+            logger.warning("joblib is not installed; cannot load %s", path)
+            return None
+        try:
+            digest = _file_digest(path)
+            model = joblib.load(path)
+        except Exception:
+            logger.exception("Failed to load model artifact %s; keeping the current model", path)
+            return None
+        return LoadedModel(model, f"{os.path.basename(path)}@{digest[:12]}", signature)
@@ -1,35 +1,118 @@
 """
 Scoring engine with:
-- optional joblib model loader (if model files exist)
-- deterministic rule-based fallbacks for both individuals and companies
+- optional joblib models (if model files exist), hot reloaded through registry.ModelRegistry
+- deterministic rule-based fallbacks for both individuals and companies, evaluated
+  from the versioned rule tables in rule_sets/ (see rules.py)
 Exports:
 - predict_individual_risk(features) -> (score:int, explanation:list, model_version:str)
 - predict_company_risk(features)    -> (score:int, explanation:list, model_version:str)
+- predict_individual_risk_batch(records) -> [(score, explanation, model_version), ...]
+- predict_company_risk_batch(records)    -> [(score, explanation, model_version), ...]
+  all four take explain="full" | "top_k" | False (see explain_mode); with False the
+  explanation is None and is never built, "top_k" keeps the top_k largest |impact| entries
+- warm_up_models() / models_ready() for background loading and readiness checks
+- score_cache: memoizes single-record predictions per model version; score_cache.stats() has the hit rate
+- compiled_models: single-record predictions run on a compiled copy of the model (compiled.py)
+- current_model_version(kind) / feature_fingerprint(kind, features, model_version)
+  to detect when a stored score is still up to date
+- rule_sets / use_rule_version(version) to pick the rule set (rule/v1, rule/v2, ...)
+- model_attributions(kind, records, model_version) -> top-k SHAP drivers per record,
+  computed off the scoring path (see attributions.py)
 """
+import hashlib
+import json
 import os
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, Iterable, List, Optional, Sequence, Tuple, Union
 
-MODEL_DIR = os.path.join(os.path.dirname(__file__), "models")
-INDIVIDUAL_MODEL_PATH = os.path.join(MODEL_DIR, "individual_model.joblib")
-COMPANY_MODEL_PATH = os.path.join(MODEL_DIR, "company_model.joblib")
+import numpy as np
 
-try:
-    import joblib
-except Exception:
-    joblib = None
+from .attributions import TreeExplainers
+from .compiled import CompiledModels
+from .registry import ModelRegistry
+from .rules import RuleSet, RuleSets
+from .score_cache import ScoreCache
 
-def _load_model(path):
-    if joblib is None:
+MODEL_DIR = os.environ.get("SCORING_MODEL_DIR") or os.path.join(os.path.dirname(__file__), "models")
+# Seconds between cheap mtime checks for a new model artifact
+MODEL_CHECK_INTERVAL = float(os.environ.get("SCORING_MODEL_CHECK_INTERVAL", "5"))
+
+individual_models = ModelRegistry("individual_model", MODEL_DIR, MODEL_CHECK_INTERVAL)
+company_models = ModelRegistry("company_model", MODEL_DIR, MODEL_CHECK_INTERVAL)
+
+# Rule set used when no model is loaded; SCORING_RULE_DIR points at extra/edited rule configs
+rule_sets = RuleSets(
+    active=os.environ.get("SCORING_RULE_VERSION", "rule/v1"),
+    rule_dir=os.environ.get("SCORING_RULE_DIR") or None,
+)
+
+# Memoized single-record scores (see score_cache.py); SCORING_CACHE_SIZE=0 turns it off,
+# SCORING_CACHE_SHARED=1 adds Django's cache as a second tier shared between workers
+score_cache = ScoreCache(
+    max_size=int(os.environ.get("SCORING_CACHE_SIZE", "10000")),
+    shared=os.environ.get("SCORING_CACHE_SHARED", "").lower() in ("1", "true", "yes"),
+    shared_timeout=int(os.environ.get("SCORING_CACHE_TIMEOUT", "3600")),
+)
+
+# Single-record predictions go through a compiled copy of the model (see compiled.py);
+# SCORING_INFERENCE_BACKEND=estimator calls the estimator directly
+compiled_models = CompiledModels(enabled=os.environ.get("SCORING_INFERENCE_BACKEND", "compiled").lower() != "estimator")
+
+# SHAP explainers for the active models, built on first model_attributions() call
+tree_explainers = TreeExplainers()
+
+# Explanation entries kept by explain="top_k" unless the caller passes top_k
+DEFAULT_TOP_K = int(os.environ.get("SCORING_EXPLAIN_TOP_K", "3"))
+
+EXPLAIN_FULL = "full"
+EXPLAIN_TOP_K = "top_k"
+_EXPLAIN_OFF = ("", "0", "false", "no", "none", "off")
+
+def explain_mode(value: Any) -> Union[str, bool]:
+    """
+    Normalize an explain argument (or query parameter) to "full", "top_k" or False.
+    None / True mean "full"; False and "none"/"false"/"0"/"off" mean no explanation.
+    Raises ValueError for anything else.
+    """
+    if value is None or value is True:
+        return EXPLAIN_FULL
+    if value is False:
+        return False
+    text = str(value).strip().lower()
+    if text in _EXPLAIN_OFF:
+        return False
+    if text in (EXPLAIN_FULL, "true", "1"):
+        return EXPLAIN_FULL
+    if text in (EXPLAIN_TOP_K, "topk"):
+        return EXPLAIN_TOP_K
+    raise ValueError(f"explain must be one of full, top_k, none (got {value!r})")
+
+def _top_k_for(explain: Union[str, bool], top_k: Optional[int]) -> Optional[int]:
+    """Number of explanation entries to keep, None for all."""
+    if explain != EXPLAIN_TOP_K:
         return None
-    if os.path.exists(path):
-        try:
-            return joblib.load(path)
-        except Exception:
-            return None
-    return None
+    return DEFAULT_TOP_K if top_k is None else top_k
+
+def _finish(result: Tuple[int, Any, str], explain: Union[str, bool], top_k: Optional[int]) -> Tuple[int, Any, str]:
+    # applied to cached (full) model results; largest |impact| first, ties keep rule order
+    score, explanation, model_ver = result
+    if not explain:
+        return score, None, model_ver
+    k = _top_k_for(explain, top_k)
+    if k is not None and explanation is not None:
+        return score, sorted(explanation, key=lambda item: -abs(item["impact"]))[:k], model_ver
+    return result
+
+def use_rule_version(version: str) -> RuleSet:
+    """Make `version` the rule set for fallback scoring (raises if it doesn't exist or doesn't compile)."""
+    return rule_sets.activate(version)
+
+def warm_up_models(background: bool = True) -> None:
+    """Start loading both models (call once per worker after boot); predictions wait for an in-progress load."""
+    individual_models.warm_up(background)
+    company_models.warm_up(background)
 
-_individual_model = _load_model(INDIVIDUAL_MODEL_PATH)
-_company_model = _load_model(COMPANY_MODEL_PATH)
+def models_ready() -> bool:
+    return individual_models.is_ready() and company_models.is_ready()
 
 def _clamp_score(v):
     return max(0, min(100, int(round(v))))
@@ -51,68 +134,9 @@ def _map_individual_features_to_vector(features: Dict[str, Any]) -> List[float]:
     col_req = _safe_div(collateral, requested) or 0.0
     return [income, debt, requested, collateral, credit_score, criminal, dti, col_req]
 
-def _explain_rule_based_individual(features: Dict[str, Any]) -> Tuple[int, List[Dict[str, Any]]]:
-    base = 50.0
-    explanations: List[Dict[str, Any]] = []
-    income = float(features.get("yearly_income") or 0.0)
-    debt = float(features.get("existing_debt") or 0.0)
-    requested = float(features.get("requested_amount") or 0.0)
-    collateral = float(features.get("collateral_value") or 0.0)
-    credit_score = features.get("credit_history_score")
-    criminal = features.get("criminal_history", False)
-
-    dti = _safe_div(debt, income)
-    if dti is not None:
-        if dti < 0.2:
-            impact, reason = +12, f"dti={dti:.2f} very low"
-        elif dti < 0.5:
-            impact, reason = +3, f"dti={dti:.2f} moderate"
-        elif dti < 1.0:
-            impact, reason = -10, f"dti={dti:.2f} high"
-        else:
-            impact, reason = -25, f"dti={dti:.2f} very high"
-        base += impact
-        explanations.append({"feature": "debt_to_income", "impact": impact, "reason": reason})
-    else:
-        explanations.append({"feature": "debt_to_income", "impact": 0, "reason": "income or debt missing"})
-
-    col_req = _safe_div(collateral, requested)
-    if col_req is not None and requested > 0:
-        if col_req >= 1.0:
-            impact, reason = +10, f"collateral covers request (ratio={col_req:.2f})"
-        elif col_req >= 0.5:
-            impact, reason = +4, f"partial collateral (ratio={col_req:.2f})"
-        else:
-            impact, reason = -5, f"low collateral (ratio={col_req:.2f})"
-        base += impact
-        explanations.append({"feature": "collateral_to_requested", "impact": impact, "reason": reason})
-    else:
-        explanations.append({"feature": "collateral_to_requested", "impact": 0, "reason": "requested or collateral missing"})
-
-    if credit_score is not None:
-        try:
-            cs = int(credit_score)
-        except Exception:
-            cs = None
-        if cs is not None:
-            if cs >= 700:
-                impact, reason = +10, f"credit_score={cs} excellent"
-            elif cs >= 500:
-                impact, reason = +2, f"credit_score={cs} fair"
-            else:
-                impact, reason = -12, f"credit_score={cs} poor"
-            base += impact
-            explanations.append({"feature": "credit_history_score", "impact": impact, "reason": reason})
-
-    if criminal:
-        base -= 40
-        explanations.append({"feature": "criminal_history", "impact": -40, "reason": "criminal history present"})
-
-    return _clamp_score(base), explanations
-
-def predict_individual_risk(features: Dict[str, Any]) -> Tuple[int, List[Dict[str, Any]], str]:
+def _normalize_individual_features(features: Dict[str, Any]) -> Dict[str, Any]:
     # Normalize input keys and defaults
-    data = {
+    return {
         "yearly_income": features.get("yearly_income") if isinstance(features, dict) else None,
         "existing_debt": features.get("existing_debt") if isinstance(features, dict) else None,
         "requested_amount": features.get("requested_amount") if isinstance(features, dict) else None,
@@ -121,24 +145,46 @@ def predict_individual_risk(features: Dict[str, Any]) -> Tuple[int, List[Dict[st
         "criminal_history": features.get("criminal_history", False) if isinstance(features, dict) else False,
     }
 
-    if _individual_model is not None:
+def predict_individual_risk(features: Dict[str, Any], explain: Union[str, bool] = EXPLAIN_FULL,
+                         top_k: Optional[int] = None) -> Tuple[int, Optional[List[Dict[str, Any]]], str]:
+    explain = explain_mode(explain)
+    data = _normalize_individual_features(features)
+
+    model, version = individual_models.get()
+    try:
+        X = _map_individual_features_to_vector(data)
+    except (TypeError, ValueError):
+        X = None  # unparseable input: rules only
+    model = compiled_models.get("individual", model, version)
+    # the rules are cheaper than a cache lookup; only model inference is memoized
+    if model is None or X is None or not score_cache.enabled:
+        return _finish(_score_individual(data, X, model, version, bool(explain)), explain, top_k)
+    # cached entries always carry the full explanation; the mode is applied on the way out
+    key = score_cache.key("individual", version, X, list(data.values()))
+    return _finish(score_cache.get_or_compute(key, lambda: _score_individual(data, X, model, version)), explain, top_k)
+
+def _model_result(score: int, version: str, explain: bool) -> Tuple[int, Optional[List[Dict[str, Any]]], str]:
+    return score, _model_explanation() if explain else None, f"joblib:{version}"
+
+def _score_individual(data: Dict[str, Any], X, model, version, explain: bool = True) -> Tuple[int, Optional[List[Dict[str, Any]]], str]:
+    if model is not None and X is not None:
         try:
-            X = _map_individual_features_to_vector(data)
-            if hasattr(_individual_model, "predict_proba"):
-                prob = _individual_model.predict_proba([X])[0][1]
-                return _clamp_score(prob * 100), [{"feature": "model", "impact": 0, "reason": "scored by ML model"}], f"joblib:{os.path.basename(INDIVIDUAL_MODEL_PATH)}"
-            elif hasattr(_individual_model, "predict"):
-                p = _individual_model.predict([X])[0]
+            if hasattr(model, "predict_proba"):
+                prob = model.predict_proba([X])[0][1]
+                return _model_result(_clamp_score(prob * 100), version, explain)
+            elif hasattr(model, "predict"):
+                p = model.predict([X])[0]
                 try:
                     prob = float(p)
-                    return _clamp_score(prob * 100), [{"feature": "model", "impact": 0, "reason": "scored by ML model"}], f"joblib:{os.path.basename(INDIVIDUAL_MODEL_PATH)}"
+                    return _model_result(_clamp_score(prob * 100), version, explain)
                 except Exception:
-                    return _clamp_score(p), [{"feature": "model", "impact": 0, "reason": "scored by ML model"}], f"joblib:{os.path.basename(INDIVIDUAL_MODEL_PATH)}"
+                    return _model_result(_clamp_score(p), version, explain)
         except Exception:
             pass
 
-    score, explanation = _explain_rule_based_individual(data)
-    return score, explanation, "rule/v1"
+    rules = rule_sets.active
+    score, explanation = rules.score_one("individual", data, explain=explain)
+    return score, explanation, rules.version
 
 # ---------------- company ----------------
 
@@ -152,66 +198,201 @@ def _map_company_features_to_vector(features: Dict[str, Any]) -> List[float]:
     leverage = _safe_div(liabilities, equity) or 0.0
     return [revenue, net_income, assets, liabilities, profit_margin, leverage]
 
-def _explain_rule_based_company(features: Dict[str, Any]) -> Tuple[int, List[Dict[str, Any]]]:
-    base = 50.0
-    explanations: List[Dict[str, Any]] = []
-    revenue = float(features.get("revenue") or 0.0)
-    net_income = float(features.get("net_income") or 0.0)
-    assets = float(features.get("assets") or 0.0)
-    liabilities = float(features.get("liabilities") or 0.0)
-
-    if revenue > 0:
-        prof = net_income / revenue
-        if prof > 0.1:
-            impact, reason = +15, f"profitability={prof:.2f} good"
-        elif prof > 0:
-            impact, reason = +5, f"profitability={prof:.2f} low positive"
-        else:
-            impact, reason = -15, f"profitability={prof:.2f} negative"
-        base += impact
-        explanations.append({"feature": "profitability", "impact": impact, "reason": reason})
-    else:
-        explanations.append({"feature": "profitability", "impact": 0, "reason": "revenue missing or zero"})
-
-    equity = max(0.0, assets - liabilities)
-    if equity > 0:
-        leverage = liabilities / equity if equity else float("inf")
-        if leverage < 1:
-            impact, reason = +10, f"leverage={leverage:.2f} low"
-        elif leverage < 2:
-            impact, reason = 0, f"leverage={leverage:.2f} moderate"
-        else:
-            impact, reason = -15, f"leverage={leverage:.2f} high"
-        base += impact
-        explanations.append({"feature": "leverage", "impact": impact, "reason": reason})
-    else:
-        explanations.append({"feature": "leverage", "impact": 0, "reason": "assets or liabilities missing"})
-
-    return _clamp_score(base), explanations
-
-def predict_company_risk(features: Dict[str, Any]) -> Tuple[int, List[Dict[str, Any]], str]:
-    data = {
+def _normalize_company_features(features: Dict[str, Any]) -> Dict[str, Any]:
+    return {
         "revenue": features.get("revenue") if isinstance(features, dict) else None,
         "net_income": features.get("net_income") if isinstance(features, dict) else None,
         "assets": features.get("assets") if isinstance(features, dict) else None,
         "liabilities": features.get("liabilities") if isinstance(features, dict) else None,
     }
 
-    if _company_model is not None:
+def predict_company_risk(features: Dict[str, Any], explain: Union[str, bool] = EXPLAIN_FULL,
+                      top_k: Optional[int] = None) -> Tuple[int, Optional[List[Dict[str, Any]]], str]:
+    explain = explain_mode(explain)
+    data = _normalize_company_features(features)
+
+    model, version = company_models.get()
+    try:
+        X = _map_company_features_to_vector(data)
+    except (TypeError, ValueError):
+        X = None  # unparseable input: rules only
+    model = compiled_models.get("company", model, version)
+    # the rules are cheaper than a cache lookup; only model inference is memoized
+    if model is None or X is None or not score_cache.enabled:
+        return _finish(_score_company(data, X, model, version, bool(explain)), explain, top_k)
+    # cached entries always carry the full explanation; the mode is applied on the way out
+    key = score_cache.key("company", version, X, list(data.values()))
+    return _finish(score_cache.get_or_compute(key, lambda: _score_company(data, X, model, version)), explain, top_k)
+
+def _score_company(data: Dict[str, Any], X, model, version, explain: bool = True) -> Tuple[int, Optional[List[Dict[str, Any]]], str]:
+    if model is not None and X is not None:
         try:
-            X = _map_company_features_to_vector(data)
-            if hasattr(_company_model, "predict_proba"):
-                prob = _company_model.predict_proba([X])[0][1]
-                return _clamp_score(prob * 100), [{"feature": "model", "impact": 0, "reason": "scored by ML model"}], f"joblib:{os.path.basename(COMPANY_MODEL_PATH)}"
-            elif hasattr(_company_model, "predict"):
-                p = _company_model.predict([X])[0]
+            if hasattr(model, "predict_proba"):
+                prob = model.predict_proba([X])[0][1]
+                return _model_result(_clamp_score(prob * 100), version, explain)
+            elif hasattr(model, "predict"):
+                p = model.predict([X])[0]
                 try:
                     prob = float(p)
-                    return _clamp_score(prob * 100), [{"feature": "model", "impact": 0, "reason": "scored by ML model"}], f"joblib:{os.path.basename(COMPANY_MODEL_PATH)}"
+                    return _model_result(_clamp_score(prob * 100), version, explain)
                 except Exception:
-                    return _clamp_score(p), [{"feature": "model", "impact": 0, "reason": "scored by ML model"}], f"joblib:{os.path.basename(COMPANY_MODEL_PATH)}"
+                    return _model_result(_clamp_score(p), version, explain)
         except Exception:
             pass
 
-    score, explanation = _explain_rule_based_company(data)
-    return score, explanation, "rule/v1"
\ No newline at end of file
+    rules = rule_sets.active
+    score, explanation = rules.score_one("company", data, explain=explain)
+    return score, explanation, rules.version
+
+# ---------------- batch ----------------
+#
+# The batch scorers take a sequence of feature dicts (or a pandas DataFrame),
+# map each row on its own, call the model once on the rows that map and
+# evaluate the rule tables over whole arrays (rules.RuleSet.score_batch) for
+# the rest. Each element of the result is identical to what the single-record
+# function returns for the same input.
+
+def _as_records(records: Any) -> List[Any]:
+    if hasattr(records, "to_dict") and hasattr(records, "columns"):
+        return records.to_dict("records")
+    return list(records)
+
+def _model_explanation() -> List[Dict[str, Any]]:
+    return [{"feature": "model", "impact": 0, "reason": "scored by ML model"}]
+
+def _model_batch_scores(model, X: np.ndarray):
+    """Return a list of clamped scores for X, or None if the model can't score it."""
+    if hasattr(model, "predict_proba"):
+        probs = np.asarray(model.predict_proba(X))[:, 1]
+        return [_clamp_score(prob * 100) for prob in probs]
+    if hasattr(model, "predict"):
+        scores = []
+        for p in model.predict(X):
+            try:
+                prob = float(p)
+                scores.append(_clamp_score(prob * 100))
+            except Exception:
+                scores.append(_clamp_score(p))
+        return scores
+    return None
+
+def _model_scores(model, vectors: List[List[float]]) -> List[Optional[int]]:
+    """Score the vectors in one call; if the model rejects the matrix, score them one by one (None = rules)."""
+    try:
+        scores = _model_batch_scores(model, np.array(vectors, dtype=float))
+        if scores is not None:
+            return scores
+    except Exception:
+        pass
+    scores = []
+    for X in vectors:
+        try:
+            score = _model_batch_scores(model, np.array([X], dtype=float))
+        except Exception:
+            score = None
+        scores.append(score[0] if score else None)
+    return scores
+
+def _score_batch(kind: str, rows: List[Dict[str, Any]], registry, vectorize, explain: Union[str, bool],
+                 top_k: Optional[int]) -> List[Tuple[int, Optional[List[Dict[str, Any]]], str]]:
+    results: List[Any] = [None] * len(rows)
+    model, version = registry.get()
+    if model is not None:
+        mapped, vectors = [], []
+        for i, row in enumerate(rows):
+            try:
+                vectors.append(vectorize(row))
+            except (TypeError, ValueError):
+                continue  # unparseable input: rules only
+            mapped.append(i)
+        if mapped:
+            model_ver = f"joblib:{version}"
+            for i, score in zip(mapped, _model_scores(model, vectors)):
+                if score is not None:
+                    results[i] = (score, _model_explanation() if explain else None, model_ver)
+
+    fallback = [i for i, result in enumerate(results) if result is None]
+    if fallback:
+        rules = rule_sets.active
+        scores, explanations = rules.score_batch(kind, [rows[i] for i in fallback], explain=bool(explain),
+                                                 top_k=_top_k_for(explain, top_k))
+        for n, i in enumerate(fallback):
+            results[i] = (scores[n], explanations[n] if explanations is not None else None, rules.version)
+    return results
+
+def predict_individual_risk_batch(records: Iterable[Dict[str, Any]], explain: Union[str, bool] = EXPLAIN_FULL,
+                               top_k: Optional[int] = None) -> List[Tuple[int, Optional[List[Dict[str, Any]]], str]]:
+    explain = explain_mode(explain)
+    rows = [_normalize_individual_features(r) for r in _as_records(records)]
+    return _score_batch("individual", rows, individual_models, _map_individual_features_to_vector, explain, top_k)
+
+def predict_company_risk_batch(records: Iterable[Dict[str, Any]], explain: Union[str, bool] = EXPLAIN_FULL,
+                            top_k: Optional[int] = None) -> List[Tuple[int, Optional[List[Dict[str, Any]]], str]]:
+    explain = explain_mode(explain)
+    rows = [_normalize_company_features(r) for r in _as_records(records)]
+    return _score_batch("company", rows, company_models, _map_company_features_to_vector, explain, top_k)
+
+_NORMALIZERS = {
+    "individual": _normalize_individual_features,
+    "company": _normalize_company_features,
+}
+_REGISTRIES = {
+    "individual": individual_models,
+    "company": company_models,
+}
+
+_VECTORIZERS = {
+    "individual": _map_individual_features_to_vector,
+    "company": _map_company_features_to_vector,
+}
+
+def model_attributions(kind: str, records: Sequence[Dict[str, Any]], model_version: str,
+                       top_k: Optional[int] = None) -> Optional[List[List[Dict[str, Any]]]]:
+    """
+    SHAP top-k drivers for records scored by `model_version`, in one batch
+    (None for records the model can't take). None when that model is no
+    longer the active one or can't be explained (rule-scored predictions
+    already carry their explanation).
+    """
+    model, version = _REGISTRIES[kind].get()
+    if model is None or model_version != f"joblib:{version}":
+        return None
+    normalize, vectorize = _NORMALIZERS[kind], _VECTORIZERS[kind]
+    vectors = []
+    for record in records:
+        try:
+            vectors.append(vectorize(normalize(record)))
+        except (TypeError, ValueError):
+            vectors.append(None)  # unparseable input was scored by the rules, not this model
+    valid = [v for v in vectors if v is not None]
+    if not valid:
+        return [None] * len(vectors)
+    drivers = tree_explainers.explain(kind, model, version, np.array(valid, dtype=float), DEFAULT_TOP_K if top_k is None else top_k)
+    if drivers is None:
+        return None
+    drivers = iter(drivers)
+    return [None if v is None else next(drivers) for v in vectors]
+
+def current_model_version(kind: str) -> str:
+    """model_version a prediction for `kind` ("individual" / "company") would carry right now."""
+    model, version = _REGISTRIES[kind].get()
+    return f"joblib:{version}" if model is not None else rule_sets.active.version
+
+def _canonical(value: Any) -> Any:
+    if value is None or isinstance(value, bool):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+def feature_fingerprint(kind: str, features: Dict[str, Any], model_version: str) -> str:
+    """
+    Stable sha256 of the normalized features plus the model version. Only the
+    inputs the scorer actually reads are hashed, and numbers are compared by
+    value (100 == 100.0), so the fingerprint changes exactly when a rescore
+    could give a different result.
+    """
+    data = {k: _canonical(v) for k, v in _NORMALIZERS[kind](features).items()}
+    payload = json.dumps([kind, model_version, data], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
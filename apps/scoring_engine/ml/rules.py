@@ -0,0 +1,340 @@
+"""
+Declarative rule tables for the rule-based fallback scorer.
+
+A rule set is a JSON file under rule_sets/ (or SCORING_RULE_DIR) named after
+its version, e.g. rule/v1 -> rule_v1.json. For each applicant kind it holds a
+base score and an ordered list of tables:
+
+    {"feature": "debt_to_income",          # name in the explanation
+     "input": "debt_to_income",            # derived input, see INPUTS below
+     "op": "<",                            # <, <=, >= or >
+     "thresholds": [0.2, 0.5, 1.0],
+     "impacts": [12, 3, -10, -25],         # one per bin, last = none matched
+     "reasons": ["dti={value:.2f} very low", ...],   # null = no explanation entry
+     "missing": "income or debt missing"}  # input missing: 0 impact + this reason (null = omit)
+
+A table reads like an if/elif ladder: the first threshold the value satisfies
+picks the bin, NaN and values that satisfy none fall through to the last one.
+Thresholds are ascending for < / <= and descending for >= / >, as they would
+be written in the ladder.
+
+Tables are compiled once: bins for whole arrays come from numpy.searchsorted,
+single records use bisect on the same thresholds, and reason strings are only
+formatted when an explanation is asked for.
+"""
+import bisect
+import json
+import os
+import string
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+RULE_SET_DIR = os.path.join(os.path.dirname(__file__), "rule_sets")
+
+_OPS = ("<", "<=", ">=", ">")
+
+
+def _num(value: Any) -> float:
+    return float(value or 0.0)
+
+
+def _int_or_none(value: Any):
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except Exception:
+        return None
+
+
+def _ratio(num: np.ndarray, den: np.ndarray, present: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(present, num / np.where(present, den, 1.0), 0.0)
+
+
+def _renderer(template: Optional[str]) -> Optional[Callable[[Any], str]]:
+    """Compile a reason template into value -> str: a bound str.format with `value` as the positional field."""
+    if template is None:
+        return None
+    compiled = []
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        compiled.append(literal.replace("{", "{{").replace("}", "}}"))
+        if field is not None:
+            if field != "value":
+                raise ValueError(f"reason template {template!r}: only {{value}} is available")
+            compiled.append("{0" + ("!" + conversion if conversion else "") + (":" + spec if spec else "") + "}")
+    return "".join(compiled).format
+
+
+def _column(rows: Sequence[Dict[str, Any]], name: str) -> np.ndarray:
+    return np.array([float(r.get(name) or 0.0) for r in rows], dtype=float)
+
+
+# ---- derived inputs ----
+# Each input has a scalar form, row -> (value, display) or None when missing,
+# and an array form, rows -> (values, present, display list).
+
+def _dti_one(r):
+    income = _num(r.get("yearly_income"))
+    if not income:
+        return None
+    dti = _num(r.get("existing_debt")) / income
+    return dti, dti
+
+def _dti_many(rows):
+    income, debt = _column(rows, "yearly_income"), _column(rows, "existing_debt")
+    present = income != 0
+    values = _ratio(debt, income, present)
+    return values, present, values.tolist()
+
+def _collateral_one(r):
+    requested = _num(r.get("requested_amount"))
+    if not requested > 0:
+        return None
+    ratio = _num(r.get("collateral_value")) / requested
+    return ratio, ratio
+
+def _collateral_many(rows):
+    requested, collateral = _column(rows, "requested_amount"), _column(rows, "collateral_value")
+    present = requested > 0
+    values = _ratio(collateral, requested, present)
+    return values, present, values.tolist()
+
+def _credit_score_one(r):
+    cs = _int_or_none(r.get("credit_history_score"))
+    return None if cs is None else (float(cs), cs)
+
+def _credit_score_many(rows):
+    display = [_int_or_none(r.get("credit_history_score")) for r in rows]
+    present = np.array([cs is not None for cs in display], dtype=bool)
+    values = np.array([cs if cs is not None else 0 for cs in display], dtype=float)
+    return values, present, display
+
+def _criminal_one(r):
+    flag = 1.0 if r.get("criminal_history", False) else 0.0
+    return flag, flag
+
+def _criminal_many(rows):
+    values = np.array([1.0 if r.get("criminal_history", False) else 0.0 for r in rows], dtype=float)
+    return values, np.ones(len(rows), dtype=bool), values.tolist()
+
+def _profitability_one(r):
+    revenue = _num(r.get("revenue"))
+    if not revenue > 0:
+        return None
+    prof = _num(r.get("net_income")) / revenue
+    return prof, prof
+
+def _profitability_many(rows):
+    revenue, net_income = _column(rows, "revenue"), _column(rows, "net_income")
+    present = revenue > 0
+    values = _ratio(net_income, revenue, present)
+    return values, present, values.tolist()
+
+def _leverage_one(r):
+    liabilities = _num(r.get("liabilities"))
+    equity = max(0.0, _num(r.get("assets")) - liabilities)
+    if not equity > 0:
+        return None
+    leverage = liabilities / equity
+    return leverage, leverage
+
+def _leverage_many(rows):
+    assets, liabilities = _column(rows, "assets"), _column(rows, "liabilities")
+    with np.errstate(invalid="ignore"):  # inf - inf
+        equity = np.maximum(0.0, assets - liabilities)
+    present = equity > 0
+    values = _ratio(liabilities, equity, present)
+    return values, present, values.tolist()
+
+
+INPUTS: Dict[str, Tuple[Callable, Callable]] = {
+    "debt_to_income": (_dti_one, _dti_many),
+    "collateral_to_requested": (_collateral_one, _collateral_many),
+    "credit_history_score": (_credit_score_one, _credit_score_many),
+    "criminal_history": (_criminal_one, _criminal_many),
+    "profitability": (_profitability_one, _profitability_many),
+    "leverage": (_leverage_one, _leverage_many),
+}
+
+
+class RuleTable:
+    def __init__(self, spec: Dict[str, Any]):
+        self.feature = spec["feature"]
+        self.input = spec.get("input", self.feature)
+        self.op = spec["op"]
+        thresholds = [float(t) for t in spec["thresholds"]]
+        self.impacts = [int(i) for i in spec["impacts"]]
+        self.reasons = list(spec["reasons"])
+        self.missing = spec.get("missing")
+
+        if self.input not in INPUTS:
+            raise ValueError(f"{self.feature}: unknown input {self.input!r}")
+        if self.op not in _OPS:
+            raise ValueError(f"{self.feature}: op must be one of {_OPS}")
+        if not len(self.impacts) == len(self.reasons) == len(thresholds) + 1:
+            raise ValueError(f"{self.feature}: need one impact and one reason per bin (len(thresholds) + 1)")
+        ascending = self.op in ("<", "<=")
+        ordered = thresholds if ascending else thresholds[::-1]
+        if any(a >= b for a, b in zip(ordered, ordered[1:])):
+            raise ValueError(f"{self.feature}: thresholds must be strictly {'ascending' if ascending else 'descending'}")
+
+        self._one, self._many = INPUTS[self.input]
+        self._edges = ordered  # always ascending
+        self._edges_arr = np.array(ordered, dtype=float)
+        self._impacts_arr = np.array(self.impacts)
+        # searchsorted side that counts the thresholds the value satisfies (or fails, for < / <=)
+        self._side = "right" if self.op in ("<", ">=") else "left"
+        self._bisect = bisect.bisect_right if self._side == "right" else bisect.bisect_left
+        self._descending = self.op in (">=", ">")
+        self._render = [_renderer(r) for r in self.reasons]
+        self._has_reason = np.array([r is not None for r in self.reasons])
+
+    def bins(self, values: np.ndarray) -> np.ndarray:
+        n = len(self._edges)
+        idx = np.searchsorted(self._edges_arr, values, side=self._side)
+        if self._descending:
+            idx = n - idx
+        return np.where(np.isnan(values), n, idx)
+
+    def bin(self, value: float) -> int:
+        n = len(self._edges)
+        if value != value:  # NaN satisfies no threshold
+            return n
+        idx = self._bisect(self._edges, value)
+        return n - idx if self._descending else idx
+
+    def entry_ranks(self, present: np.ndarray, idx: np.ndarray, impacts: np.ndarray) -> np.ndarray:
+        """|impact| of each row's explanation entry, -1 where the row has none (for top-k selection)."""
+        has_reason = self._has_reason[idx]
+        has_entry = np.where(present, has_reason, self.missing is not None)
+        return np.where(has_entry, np.where(present, np.abs(impacts), 0), -1)
+
+    def explain_column(self, present: List[bool], idx: List[int], display: List[Any]) -> List[Optional[Dict[str, Any]]]:
+        """Explanation entry (or None) for every row of a batch."""
+        feature, impacts, render, missing = self.feature, self.impacts, self._render, self.missing
+        out = []
+        append = out.append
+        for p, i, d in zip(present, idx, display):
+            if p:
+                r = render[i]
+                append(None if r is None else {"feature": feature, "impact": impacts[i], "reason": r(d)})
+            else:
+                append(None if missing is None else {"feature": feature, "impact": 0, "reason": missing})
+        return out
+
+
+class RuleSet:
+    def __init__(self, version: str, spec: Dict[str, Any]):
+        self.version = version
+        self.kinds: Dict[str, Tuple[float, List[RuleTable]]] = {}
+        for kind in ("individual", "company"):
+            if kind in spec:
+                self.kinds[kind] = (float(spec[kind].get("base", 50)), [RuleTable(t) for t in spec[kind]["rules"]])
+
+    def _tables(self, kind: str) -> Tuple[float, List[RuleTable]]:
+        try:
+            return self.kinds[kind]
+        except KeyError:
+            raise ValueError(f"rule set {self.version} has no {kind!r} rules") from None
+
+    def score_one(self, kind: str, row: Dict[str, Any], explain: bool = True) -> Tuple[int, Optional[List[Dict[str, Any]]]]:
+        base, tables = self._tables(kind)
+        explanation = [] if explain else None
+        for table in tables:
+            found = table._one(row)
+            if found is None:
+                if explain and table.missing is not None:
+                    explanation.append({"feature": table.feature, "impact": 0, "reason": table.missing})
+                continue
+            value, display = found
+            idx = table.bin(value)
+            base += table.impacts[idx]
+            if explain and table._render[idx] is not None:
+                explanation.append({"feature": table.feature, "impact": table.impacts[idx], "reason": table._render[idx](display)})
+        return max(0, min(100, int(round(base)))), explanation
+
+    def score_batch(self, kind: str, rows: Sequence[Dict[str, Any]], explain: bool = True,
+                    top_k: Optional[int] = None) -> Tuple[List[int], Optional[List[List[Dict[str, Any]]]]]:
+        """
+        Score all rows at once. With top_k, each explanation keeps the top_k
+        entries with the largest |impact| (ties in table order); the ranking
+        is done in numpy rather than by sorting every row's list.
+        """
+        base, tables = self._tables(kind)
+        total = np.full(len(rows), base)
+        evaluated = []
+        ranks = []
+        for table in tables:
+            values, present, display = table._many(rows)
+            idx = table.bins(values)
+            impacts = table._impacts_arr[idx]
+            total += np.where(present, impacts, 0)
+            evaluated.append((table, present.tolist(), idx.tolist(), display))
+            if explain and top_k is not None:
+                ranks.append(table.entry_ranks(present, idx, impacts))
+        scores = np.clip(np.rint(total), 0, 100).astype(int).tolist()
+        if not explain:
+            return scores, None
+
+        columns = [table.explain_column(present, idx, display) for table, present, idx, display in evaluated]
+        if top_k is None:
+            return scores, [[item for item in items if item is not None] for items in zip(*columns)]
+
+        # per row: table indices by descending |impact| (stable), cut at top_k and at the first missing entry
+        ranks = np.array(ranks)
+        order = np.argsort(-ranks, axis=0, kind="stable")[:top_k]
+        counts = (np.take_along_axis(ranks, order, axis=0) >= 0).sum(axis=0).tolist()
+        return scores, [
+            [items[t] for t in picked[:count]]
+            for items, picked, count in zip(zip(*columns), order.T.tolist(), counts)
+        ]
+
+
+def rule_set_path(version: str, rule_dir: Optional[str] = None) -> str:
+    return os.path.join(rule_dir or RULE_SET_DIR, version.replace("/", "_") + ".json")
+
+
+def load_rule_set(version: str, rule_dir: Optional[str] = None) -> RuleSet:
+    """Read and compile a rule set; raises FileNotFoundError / ValueError for unknown or invalid versions."""
+    with open(rule_set_path(version, rule_dir)) as fh:
+        spec = json.load(fh)
+    if spec.get("version", version) != version:
+        raise ValueError(f"{rule_set_path(version, rule_dir)} declares version {spec['version']!r}, expected {version!r}")
+    return RuleSet(version, spec)
+
+
+class RuleSets:
+    """Compiled rule sets by version, plus the active one used by the scorers."""
+    def __init__(self, active: str, rule_dir: Optional[str] = None):
+        self.rule_dir = rule_dir
+        self._compiled: Dict[str, RuleSet] = {}
+        self._lock = threading.Lock()
+        self._active_version = active
+
+    def get(self, version: Optional[str] = None) -> RuleSet:
+        version = version or self._active_version
+        compiled = self._compiled.get(version)
+        if compiled is None:
+            with self._lock:
+                compiled = self._compiled.get(version)
+                if compiled is None:
+                    compiled = self._compiled[version] = load_rule_set(version, self.rule_dir)
+        return compiled
+
+    @property
+    def active(self) -> RuleSet:
+        return self.get()
+
+    def activate(self, version: str) -> RuleSet:
+        """Switch the active version (compiled first, so a bad config never becomes active)."""
+        compiled = self.get(version)
+        self._active_version = version
+        return compiled
+
+    def reload(self) -> None:
+        """Forget compiled tables so edited config files are read again."""
+        with self._lock:
+            self._compiled.clear()
@@ -0,0 +1,123 @@
+"""
+Memoization for the single-record scorers.
+
+Keys are (kind, model version, quantized feature vector, input types). The
+vector is what _map_*_features_to_vector produces, rounded to `decimals`
+places; the input types (and any string inputs verbatim) keep apart inputs
+that map to the same vector but score differently under the rules
+(None vs 0, "650.5" vs 650.5).
+
+- in-process LRU bounded by `max_size` entries; max_size=0 disables caching
+- optional second tier in Django's cache (`shared=True`) so identical
+  profiles scored by another worker are reused; Django is only imported then
+- the model version is part of every key, and the local tier is dropped as
+  soon as a new version is seen, so a model change invalidates it without
+  any explicit call. Shared entries for old versions are never read again
+  and expire after `shared_timeout` seconds.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Sequence, Tuple
+
+
+class ScoreCache:
+    def __init__(self, max_size: int = 10000, decimals: int = 6, shared: bool = False,
+                 shared_timeout: int = 3600, cache_alias: str = "default"):
+        self.max_size = max_size
+        self.decimals = decimals
+        self.shared = shared
+        self.shared_timeout = shared_timeout
+        self.cache_alias = cache_alias
+        self._local: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._counters = {"local_hits": 0, "shared_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def key(self, kind: str, version: Optional[str], vector: Sequence[float], raw: Sequence[Any]) -> Tuple:
+        quantized = tuple(round(float(v), self.decimals) for v in vector)
+        # strings are kept verbatim: the rules parse them differently from numbers ("" vs "0")
+        shape = tuple(v if isinstance(v, str) else type(v).__name__ for v in raw)
+        return (kind, version, quantized, shape)
+
+    def _shared_cache(self):
+        from django.core.cache import caches
+        return caches[self.cache_alias]
+
+    @staticmethod
+    def _shared_key(key: Tuple) -> str:
+        return "score:%s:%s" % (key[0], hashlib.sha1(repr(key).encode()).hexdigest())
+
+    def _check_version(self, kind: str, version: Optional[str]) -> None:
+        # called with the lock held
+        if kind in self._versions and self._versions[kind] != version:
+            self._local.clear()
+            self._counters["invalidations"] += 1
+        self._versions[kind] = version
+
+    def get_or_compute(self, key: Tuple, compute: Callable[[], Tuple[int, list, str]]) -> Tuple[int, list, str]:
+        """Return the cached (score, explanation, model_version) for key, computing and storing it on a miss."""
+        if not self.enabled:
+            return compute()
+        with self._lock:
+            self._check_version(key[0], key[1])
+            hit = self._local.get(key)
+            if hit is not None:
+                self._local.move_to_end(key)
+                self._counters["local_hits"] += 1
+        if hit is not None:
+            return _copy(hit)
+
+        if self.shared:
+            hit = self._shared_cache().get(self._shared_key(key))
+            if hit is not None:
+                self._store_local(key, hit)
+                with self._lock:
+                    self._counters["shared_hits"] += 1
+                return _copy(hit)
+
+        with self._lock:
+            self._counters["misses"] += 1
+        result = compute()
+        self._store_local(key, result)
+        if self.shared:
+            self._shared_cache().set(self._shared_key(key), result, timeout=self.shared_timeout)
+        return _copy(result)
+
+    def _store_local(self, key: Tuple, value: Any) -> None:
+        with self._lock:
+            if self._versions.get(key[0]) != key[1]:
+                return  # the model changed while we were computing
+            self._local[key] = value
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_size:
+                self._local.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._local.clear()
+            self._versions.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            size = len(self._local)
+        hits = counters["local_hits"] + counters["shared_hits"]
+        lookups = hits + counters["misses"]
+        return {
+            **counters,
+            "size": size,
+            "max_size": self.max_size,
+            "hit_rate": round(hits / lookups, 4) if lookups else None,
+        }
+
+
+def _copy(result: Tuple[int, list, str]) -> Tuple[int, list, str]:
+    # callers may mutate the explanation; never hand out the cached list itself
+    score, explanation, model_version = result
+    return score, [dict(item) for item in explanation], model_version
@@ -0,0 +1,116 @@
+"""
+Process pool for CPU-bound batch scoring.
+
+predict_*_batch runs in the calling process, so a large backlog is scored on
+one core. ScoringPool spreads chunks of feature records over worker processes
+and returns the results in input order:
+
+    with ScoringPool(workers=4) as pool:
+        results = pool.score("individual", records, explain="top_k")
+
+- the active models are loaded in the parent before the workers start. With
+  the fork start method (the default on Linux) workers share them
+  copy-on-write; otherwise each worker loads them once in its initializer
+- workers only score: they never touch the database or the caches
+- workers ignore SIGINT, so Ctrl-C reaches the caller; leaving the with block
+  (or shutdown()) waits for submitted chunks, and on an exception the chunks
+  that haven't started are cancelled
+- workers=0 scores in the calling process, so callers keep one code path
+"""
+import logging
+import math
+import multiprocessing
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+from django.conf import settings
+
+from apps.scoring_engine.ml.risk_model import (
+    predict_company_risk_batch, predict_individual_risk_batch, warm_up_models,
+)
+
+logger = logging.getLogger(__name__)
+
+_BATCH_SCORERS = {
+    "individual": predict_individual_risk_batch,
+    "company": predict_company_risk_batch,
+}
+
+
+def default_workers() -> int:
+    """settings.SCORING_POOL_WORKERS, or one worker per CPU."""
+    return getattr(settings, "SCORING_POOL_WORKERS", None) or os.cpu_count() or 1
+
+
+def _init_worker() -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # no-op after fork: the parent loaded the models before starting us
+    warm_up_models(background=False)
+
+
+def _score_chunk(kind: str, records: List[Dict[str, Any]], explain: Union[str, bool], top_k: Optional[int]):
+    return _BATCH_SCORERS[kind](records, explain=explain, top_k=top_k)
+
+
+class ScoringPool:
+    def __init__(self, workers: Optional[int] = None, start_method: Optional[str] = None):
+        self.workers = default_workers() if workers is None else workers
+        if start_method is None and "fork" in multiprocessing.get_all_start_methods():
+            start_method = "fork"
+        self.start_method = start_method
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # load in the parent so forked workers inherit the models instead of loading their own
+            warm_up_models(background=False)
+            context = multiprocessing.get_context(self.start_method)
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=context, initializer=_init_worker)
+            logger.info("Started scoring pool with %d %s workers", self.workers, context.get_start_method())
+        return self._executor
+
+    def imap(self, kind: str, chunks: Iterable[Sequence[Dict[str, Any]]], explain: Union[str, bool] = "full",
+             top_k: Optional[int] = None) -> Iterator[List[Any]]:
+        """Score each chunk with predict_<kind>_risk_batch; yields the chunks' results in order."""
+        if kind not in _BATCH_SCORERS:
+            raise ValueError(f"unknown kind {kind!r}")
+        if not self.workers:
+            for chunk in chunks:
+                yield _score_chunk(kind, list(chunk), explain, top_k)
+            return
+        pool = self._pool()
+        futures = [pool.submit(_score_chunk, kind, list(chunk), explain, top_k) for chunk in chunks]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def score(self, kind: str, records: Sequence[Dict[str, Any]], explain: Union[str, bool] = "full",
+              top_k: Optional[int] = None, chunk_size: Optional[int] = None) -> List[Any]:
+        """
+        Score `records` across the workers, one chunk per worker unless
+        `chunk_size` is given. Returns (score, explanation, model_version)
+        per record, in input order.
+        """
+        records = list(records)
+        if not records:
+            return []
+        if chunk_size is None:
+            chunk_size = math.ceil(len(records) / max(self.workers, 1))
+        chunks = [records[i:i + chunk_size] for i in range(0, len(records), chunk_size)]
+        return [result for scored in self.imap(kind, chunks, explain, top_k) for result in scored]
+
+    def shutdown(self, wait: bool = True, cancel_pending: bool = False) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=cancel_pending)
+            self._executor = None
+
+    def __enter__(self) -> "ScoringPool":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.shutdown(cancel_pending=exc_type is not None)
@@ -0,0 +1,812 @@
+import json
+import os
+import random
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+import joblib
+import numpy as np
+
+from apps.individuals.models import IndividualCreditProfile, PredictionLog
+from apps.scoring_engine.attributions import attach_attributions
+from apps.scoring_engine.ml import risk_model
+from apps.scoring_engine.ml.compiled import CompiledModels, compile_model
+from apps.scoring_engine.ml.registry import ModelRegistry
+from apps.scoring_engine.ml.rules import RuleSets, load_rule_set
+from apps.scoring_engine.ml.score_cache import ScoreCache
+from apps.scoring_engine.pool import ScoringPool
+from apps.scoring_engine.ml.risk_model import (
+    predict_individual_risk,
+    predict_company_risk,
+    predict_individual_risk_batch,
+    predict_company_risk_batch,
+)
+
+
+def _random_individual(rng):
+    return {
+        "yearly_income": rng.choice([None, 0, rng.randint(1, 5_000_000)]),
+        "existing_debt": rng.choice([None, 0, rng.randint(1, 5_000_000)]),
+        "requested_amount": rng.choice([None, 0, rng.randint(1, 5_000_000)]),
+        "collateral_value": rng.choice([None, 0, rng.randint(1, 5_000_000)]),
+        "credit_history_score": rng.choice([None, "n/a", "650", rng.randint(0, 900)]),
+        "criminal_history": rng.random() < 0.1,
+    }
+
+
+def _random_company(rng):
+    return {
+        "revenue": rng.choice([None, 0, rng.randint(1, 500_000_000)]),
+        "net_income": rng.choice([None, 0, rng.randint(-50_000_000, 50_000_000)]),
+        "assets": rng.choice([None, 0, rng.randint(1, 500_000_000)]),
+        "liabilities": rng.choice([None, 0, rng.randint(1, 500_000_000)]),
+    }
+
+
+class _ConstantProbaModel:
+    def __init__(self, prob=0.7):
+        self.prob = prob
+
+    def predict_proba(self, X):
+        return [[1 - self.prob, self.prob] for _ in X]
+
+
+class _FailingModel:
+    def predict_proba(self, X):
+        raise ValueError("broken model")
+
+
+class BatchScoringTests(SimpleTestCase):
+    def test_individual_batch_matches_single(self):
+        rng = random.Random(7)
+        records = [_random_individual(rng) for _ in range(500)] + [{}, None]
+        batch = predict_individual_risk_batch(records)
+        self.assertEqual(batch, [predict_individual_risk(r) for r in records])
+
+    def test_company_batch_matches_single(self):
+        rng = random.Random(11)
+        records = [_random_company(rng) for _ in range(500)] + [{}]
+        batch = predict_company_risk_batch(records)
+        self.assertEqual(batch, [predict_company_risk(r) for r in records])
+
+    def test_batch_accepts_dataframe(self):
+        import pandas as pd
+
+        records = [
+            {"yearly_income": 1000000, "existing_debt": 100000, "requested_amount": 200000,
+             "collateral_value": 200000, "credit_history_score": 650, "criminal_history": False},
+            {"yearly_income": 500000, "existing_debt": 800000, "requested_amount": 100000,
+             "collateral_value": 10000, "credit_history_score": 400, "criminal_history": True},
+        ]
+        batch = predict_individual_risk_batch(pd.DataFrame(records))
+        self.assertEqual(batch, [predict_individual_risk(r) for r in records])
+
+    def test_empty_batch(self):
+        self.assertEqual(predict_individual_risk_batch([]), [])
+        self.assertEqual(predict_company_risk_batch([]), [])
+
+    def test_model_batch_matches_single(self):
+        risk_model.company_models.activate(_ConstantProbaModel(), "company_model.joblib@test")
+        try:
+            records = [_random_company(random.Random(i)) for i in range(5)]
+            batch = predict_company_risk_batch(records)
+            self.assertEqual(batch, [predict_company_risk(r) for r in records])
+            self.assertEqual(batch[0][:2], (70, [{"feature": "model", "impact": 0, "reason": "scored by ML model"}]))
+            self.assertEqual(batch[0][2], "joblib:company_model.joblib@test")
+        finally:
+            risk_model.company_models.reset()
+
+    def test_mixed_batch_scores_each_row_like_the_single_path(self):
+        from sklearn.linear_model import LogisticRegression
+
+        rng = np.random.default_rng(3)
+        X = rng.uniform(0, 1000, size=(200, 8))
+        model = LogisticRegression(max_iter=1000).fit(X, (X[:, 0] > 500).astype(int))
+        risk_model.individual_models.activate(model, "individual_model.joblib@mixed")
+        self.addCleanup(risk_model.individual_models.reset)
+        self.addCleanup(risk_model.score_cache.clear)
+        self.addCleanup(risk_model.compiled_models.clear)
+
+        good = [_random_individual(random.Random(i)) for i in range(40)]
+        good = [dict(r, credit_history_score=650) for r in good]
+        # unmappable rows and rows the model rejects go to the rules; the rest stay on the model
+        records = list(good)
+        records[3] = dict(good[3], credit_history_score="n/a")
+        records[17] = dict(good[17], yearly_income="inf")
+        records[25] = None
+        batch = predict_individual_risk_batch(records)
+        self.assertEqual(batch, [predict_individual_risk(r) for r in records])
+        versions = [version for _, _, version in batch]
+        self.assertTrue(all(versions[i].startswith("rule/") for i in (3, 17)))
+        self.assertEqual(sum(v == "joblib:individual_model.joblib@mixed" for v in versions), 38)
+        self.assertEqual(predict_individual_risk_batch(records, explain="none"),
+                         [predict_individual_risk(r, explain="none") for r in records])
+
+
+class ScoringPoolTests(SimpleTestCase):
+    def test_results_match_in_process_batch_in_order(self):
+        rng = random.Random(21)
+        individuals = [_random_individual(rng) for _ in range(300)] + [{}, None]
+        companies = [_random_company(rng) for _ in range(50)]
+        with ScoringPool(workers=2) as pool:
+            self.assertEqual(pool.score("individual", individuals, explain="top_k"),
+                             predict_individual_risk_batch(individuals, explain="top_k"))
+            self.assertEqual(pool.score("company", companies, chunk_size=7), predict_company_risk_batch(companies))
+            self.assertEqual(pool.score("company", []), [])
+            chunks = [companies[:5], companies[5:6], companies[6:20]]
+            self.assertEqual(list(pool.imap("company", chunks, explain=False)),
+                             [predict_company_risk_batch(chunk, explain=False) for chunk in chunks])
+
+    def test_workers_use_the_parents_model(self):
+        risk_model.individual_models.activate(_tree_model(8), "individual_model.joblib@pool")
+        self.addCleanup(risk_model.individual_models.reset)
+        rng = random.Random(4)
+        records = [{"yearly_income": rng.randint(0, 10**6), "existing_debt": rng.randint(0, 10**6)} for _ in range(40)]
+        with ScoringPool(workers=2) as pool:
+            scored = pool.score("individual", records)
+        self.assertEqual(scored, predict_individual_risk_batch(records))
+        self.assertEqual({version for _, _, version in scored}, {"joblib:individual_model.joblib@pool"})
+
+    def test_zero_workers_scores_in_process(self):
+        records = [_random_company(random.Random(3))]
+        pool = ScoringPool(workers=0)
+        self.assertEqual(pool.score("company", records), predict_company_risk_batch(records))
+        self.assertIsNone(pool._executor)
+        with self.assertRaises(ValueError):
+            pool.score("household", records)
+
+
+class ExplainModeTests(SimpleTestCase):
+    def test_explain_mode_parsing(self):
+        for value, expected in [(None, "full"), (True, "full"), ("full", "full"), ("TOP_K", "top_k"),
+                                (False, False), ("none", False), ("false", False), ("0", False)]:
+            self.assertEqual(risk_model.explain_mode(value), expected, value)
+        with self.assertRaises(ValueError):
+            risk_model.explain_mode("verbose")
+
+    def test_single_modes(self):
+        rng = random.Random(5)
+        for record in [_random_individual(rng) for _ in range(200)]:
+            score, full, version = predict_individual_risk(record)
+            self.assertEqual(predict_individual_risk(record, explain=False), (score, None, version))
+            expected = sorted(full, key=lambda item: -abs(item["impact"]))[:2]
+            self.assertEqual(predict_individual_risk(record, explain="top_k", top_k=2), (score, expected, version))
+
+    def test_batch_modes_match_single(self):
+        rng = random.Random(9)
+        records = [_random_company(rng) for _ in range(300)]
+        for explain in ("full", "top_k", False):
+            self.assertEqual(
+                predict_company_risk_batch(records, explain=explain),
+                [predict_company_risk(r, explain=explain) for r in records],
+            )
+
+    def test_model_path_modes(self):
+        risk_model.individual_models.activate(_ConstantProbaModel(), "individual_model.joblib@explain")
+        self.addCleanup(risk_model.individual_models.reset)
+        self.addCleanup(risk_model.score_cache.clear)
+        record = _random_individual(random.Random(1))
+        self.assertEqual(predict_individual_risk(record, explain=False), (70, None, "joblib:individual_model.joblib@explain"))
+        # a cached entry still carries the explanation for callers that want it
+        self.assertEqual(len(predict_individual_risk(record)[1]), 1)
+        self.assertEqual(predict_individual_risk_batch([record], explain="none"), [(70, None, "joblib:individual_model.joblib@explain")])
+
+    def test_endpoint_modes(self):
+        client = APIClient()
+        record = {"yearly_income": 1000000, "existing_debt": 900000, "requested_amount": 200000,
+                  "collateral_value": 10000, "credit_history_score": 400, "criminal_history": True}
+        resp = client.post(reverse('predict-individual') + "?explain=none", record, format='json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn("explanation", resp.json())
+        resp = client.post(reverse('predict-individual') + "?explain=top_k&top_k=1", record, format='json')
+        self.assertEqual(resp.json()["explanation"], predict_individual_risk(record, explain="top_k", top_k=1)[1])
+        for query in ("?explain=verbose", "?explain=top_k&top_k=0", "?top_k=x"):
+            self.assertEqual(client.post(reverse('predict-individual') + query, record, format='json').status_code, 400)
+
+
+def _tree_model(n_features):
+    from sklearn.ensemble import GradientBoostingClassifier
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(300, n_features)) * 1e5
+    y = (X[:, 0] - X[:, 1] > 0).astype(int)
+    return GradientBoostingClassifier(n_estimators=20, random_state=0).fit(X, y)
+
+
+class AttributionTests(TestCase):
+    VERSION = "individual_model.joblib@shap"
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.model = _tree_model(8)
+
+    def setUp(self):
+        risk_model.individual_models.activate(self.model, self.VERSION)
+        self.addCleanup(risk_model.individual_models.reset)
+        self.addCleanup(risk_model.score_cache.clear)
+        self.addCleanup(risk_model.tree_explainers.clear)
+        self.profile = IndividualCreditProfile.objects.create(
+            full_name="Shap Person", yearly_income=900000, existing_debt=100000,
+            collateral_value=50000, credit_history_score=700,
+        )
+
+    def test_top_k_drivers(self):
+        rng = random.Random(2)
+        records = [{"yearly_income": rng.randint(0, 10**6), "existing_debt": rng.randint(0, 10**6),
+                    "credit_history_score": rng.randint(300, 850)} for _ in range(20)]
+        records.append({"credit_history_score": "n/a"})
+        drivers = risk_model.model_attributions("individual", records, "joblib:" + self.VERSION, top_k=2)
+        self.assertEqual(len(drivers), 21)
+        self.assertIsNone(drivers[-1])
+        for items in drivers[:-1]:
+            self.assertLessEqual(len(items), 2)
+            impacts = [abs(item["impact"]) for item in items]
+            self.assertEqual(impacts, sorted(impacts, reverse=True))
+        # the label depends on income and debt only
+        self.assertIn(drivers[0][0]["feature"], ("yearly_income", "existing_debt"))
+
+    def test_unavailable_for_other_versions_and_non_tree_models(self):
+        self.assertIsNone(risk_model.model_attributions("individual", [{}], "joblib:older"))
+        self.assertIsNone(risk_model.model_attributions("individual", [{}], "rule/v1"))
+        risk_model.individual_models.activate(_ConstantProbaModel(), "constant")
+        self.assertIsNone(risk_model.model_attributions("individual", [{}], "joblib:constant"))
+
+    def test_explainer_built_once_per_version(self):
+        version = "joblib:" + self.VERSION
+        risk_model.model_attributions("individual", [{}], version)
+        explainer = risk_model.tree_explainers.get("individual", self.model, self.VERSION)
+        risk_model.model_attributions("individual", [{}], version)
+        self.assertIs(risk_model.tree_explainers.get("individual", self.model, self.VERSION), explainer)
+
+    def test_credit_request_log_is_explained_once_on_demand(self):
+        client = APIClient()
+        resp = client.post(reverse('creditrequest-list-create'), {
+            "applicant_type": "individual", "individual": self.profile.id, "requested_amount": 200000,
+        }, format='json')
+        self.assertEqual(resp.status_code, 201)
+        log = PredictionLog.objects.get(credit_request_id=resp.data["id"])
+        self.assertIsNone(log.attributions)
+        self.assertEqual(log.meta["raw_features"]["yearly_income"], 900000)
+
+        url = reverse('prediction-attributions', args=[log.id])
+        first = client.get(url).json()["attributions"]
+        self.assertTrue(first)
+        self.assertEqual(PredictionLog.objects.get(pk=log.id).attributions, first)
+        with self.assertNumQueries(1):
+            self.assertEqual(client.get(url).json()["attributions"], first)
+
+    def test_rule_scored_logs_are_left_alone(self):
+        risk_model.individual_models.reset()
+        log = PredictionLog.objects.create(profile=self.profile, score=50, model_version="rule/v1",
+                                           explanation=[], meta={"raw_features": {"yearly_income": 1}})
+        self.assertEqual(attach_attributions([log]), 0)
+        resp = APIClient().get(reverse('prediction-attributions', args=[log.id]))
+        self.assertIsNone(resp.json()["attributions"])
+
+
+class CompiledModelTests(SimpleTestCase):
+    """Compiled models must reproduce the estimators' outputs exactly, bit for bit."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        rng = np.random.default_rng(0)
+        cls.X = rng.normal(size=(600, 8)) * 1e5
+        cls.y = (cls.X[:, 0] - cls.X[:, 1] + rng.normal(size=600) * 1e5 > 0).astype(int)
+        cls.y_reg = cls.X[:, 0] * 0.3 + rng.normal(size=600)
+        # missing values and exact zeros exercise the default-direction routing
+        cls.X_missing = cls.X.copy()
+        cls.X_missing[::20, 3] = np.nan
+        cls.X_missing[::15, 2] = 0
+
+    def _classifiers(self):
+        from sklearn.ensemble import ExtraTreesClassifier, GradientBoostingClassifier, RandomForestClassifier
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.tree import DecisionTreeClassifier
+
+        models = [
+            (LogisticRegression(max_iter=1000), self.X),
+            (DecisionTreeClassifier(max_depth=6, random_state=0), self.X_missing),
+            (RandomForestClassifier(20, max_depth=6, random_state=0), self.X_missing),
+            (ExtraTreesClassifier(10, random_state=0), self.X_missing),
+            (GradientBoostingClassifier(n_estimators=30, random_state=0), self.X),
+        ]
+        try:
+            import xgboost
+            models.append((xgboost.XGBClassifier(n_estimators=30, max_depth=4), self.X_missing))
+        except ImportError:
+            pass
+        try:
+            import lightgbm
+            models.append((lightgbm.LGBMClassifier(n_estimators=30, verbose=-1), self.X_missing))
+        except ImportError:
+            pass
+        return models
+
+    def _regressors(self):
+        from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+        from sklearn.linear_model import LinearRegression, Ridge
+
+        models = [
+            (LinearRegression(), self.X),
+            (Ridge(), self.X),
+            (RandomForestRegressor(10, max_depth=5, random_state=0), self.X_missing),
+            (GradientBoostingRegressor(n_estimators=20, random_state=0), self.X),
+        ]
+        try:
+            import xgboost
+            models.append((xgboost.XGBRegressor(n_estimators=20), self.X_missing))
+        except ImportError:
+            pass
+        try:
+            import lightgbm
+            models.append((lightgbm.LGBMRegressor(n_estimators=20, verbose=-1), self.X_missing))
+        except ImportError:
+            pass
+        return models
+
+    def test_classifier_parity(self):
+        for model, X in self._classifiers():
+            with self.subTest(model=type(model).__name__):
+                model.fit(X, self.y)
+                compiled = compile_model(model)
+                self.assertIsNotNone(compiled)
+                np.testing.assert_array_equal(compiled.predict_proba(X), model.predict_proba(X))
+                for row in X[:20]:
+                    self.assertEqual(compiled.predict_proba([row])[0][1], model.predict_proba([row])[0][1])
+
+    def test_regressor_parity(self):
+        for model, X in self._regressors():
+            with self.subTest(model=type(model).__name__):
+                model.fit(X, self.y_reg)
+                compiled = compile_model(model)
+                self.assertIsNotNone(compiled)
+                np.testing.assert_array_equal(compiled.predict(X), model.predict(X))
+
+    def test_unsupported_models_are_not_compiled(self):
+        from sklearn.ensemble import GradientBoostingClassifier
+        from sklearn.neighbors import KNeighborsClassifier
+
+        self.assertIsNone(compile_model(_ConstantProbaModel()))
+        self.assertIsNone(compile_model(KNeighborsClassifier().fit(self.X, self.y)))
+        exponential = GradientBoostingClassifier(loss="exponential", n_estimators=5).fit(self.X, self.y)
+        self.assertIsNone(compile_model(exponential))
+
+        models = CompiledModels()
+        model = _ConstantProbaModel()
+        self.assertIs(models.get("individual", model, "v1"), model)
+        tree = _tree_model(8)
+        self.assertIs(CompiledModels(enabled=False).get("individual", tree, "v1"), tree)
+        self.assertIsNot(models.get("individual", tree, "v2"), tree)
+
+    def test_risk_model_scores_match_the_estimator(self):
+        model = _tree_model(8)
+        rng = random.Random(5)
+        records = [_random_individual(rng) for _ in range(200)]
+        # inputs the estimator rejects (NaN, inf, float32 overflow) must fall back to the rules here too
+        records += [dict(records[0], yearly_income=value) for value in ("inf", "nan", 1e300, -1e39)]
+        risk_model.individual_models.activate(model, "compiled")
+        self.addCleanup(risk_model.individual_models.reset)
+        self.addCleanup(risk_model.score_cache.clear)
+        self.addCleanup(risk_model.compiled_models.clear)
+        compiled = [predict_individual_risk(r) for r in records]
+        self.assertIsNot(risk_model.compiled_models.get("individual", model, "compiled"), model)
+
+        risk_model.score_cache.clear()
+        risk_model.compiled_models.enabled = False
+        self.addCleanup(setattr, risk_model.compiled_models, "enabled", True)
+        native = [predict_individual_risk(r) for r in records]
+        self.assertEqual(compiled, native)
+        self.assertTrue(all(version.startswith("rule/") for _, _, version in compiled[-4:]))
+        # and the batch scorer agrees with the single-record path
+        self.assertEqual([predict_individual_risk_batch([r])[0] for r in records[-4:]], compiled[-4:])
+
+
+class ScoreCacheTests(SimpleTestCase):
+    features = {"yearly_income": 1000000, "existing_debt": 100000, "requested_amount": 200000,
+                "collateral_value": 200000, "credit_history_score": 650, "criminal_history": False}
+
+    def setUp(self):
+        risk_model.score_cache.clear()
+        self.addCleanup(risk_model.score_cache.clear)
+
+    def _activate(self, model, version):
+        risk_model.individual_models.activate(model, version)
+        self.addCleanup(risk_model.individual_models.reset)
+
+    def test_repeated_profile_is_served_from_cache(self):
+        self._activate(_ConstantProbaModel(0.4), "individual_model.joblib@cache-test")
+        before = risk_model.score_cache.stats()
+        first = predict_individual_risk(self.features)
+        first[1].append({"feature": "mutated"})  # callers can't corrupt the cached entry
+        second = predict_individual_risk(dict(self.features))
+        stats = risk_model.score_cache.stats()
+        self.assertEqual(stats["misses"], before["misses"] + 1)
+        self.assertEqual(stats["local_hits"], before["local_hits"] + 1)
+        self.assertEqual(second, (40, [{"feature": "model", "impact": 0, "reason": "scored by ML model"}],
+                                  "joblib:individual_model.joblib@cache-test"))
+
+    def test_rule_fallbacks_with_same_vector_are_kept_apart(self):
+        self._activate(_FailingModel(), "individual_model.joblib@failing")
+        rng = random.Random(3)
+        records = [_random_individual(rng) for _ in range(300)]
+        records += [dict(self.features, credit_history_score=v) for v in (None, 0, "0", "", "650", 650.0)]
+        cached = [predict_individual_risk(r) for r in records] + [predict_individual_risk(r) for r in records]
+        self.assertGreater(risk_model.score_cache.stats()["local_hits"], 0)
+        uncached = [risk_model._score_individual(risk_model._normalize_individual_features(r), None, None, None)
+                    for r in records] * 2
+        self.assertEqual(cached, uncached)
+
+    def test_model_change_invalidates(self):
+        self._activate(_ConstantProbaModel(0.3), "individual_model-1.joblib@a")
+        self.assertEqual(predict_individual_risk(self.features)[0], 30)
+        invalidations = risk_model.score_cache.stats()["invalidations"]
+        risk_model.individual_models.activate(_ConstantProbaModel(0.8), "individual_model-2.joblib@b")
+        score, _, version = predict_individual_risk(self.features)
+        self.assertEqual((score, version), (80, "joblib:individual_model-2.joblib@b"))
+        self.assertEqual(risk_model.score_cache.stats()["invalidations"], invalidations + 1)
+        self.assertEqual(risk_model.score_cache.stats()["size"], 1)
+
+    def test_lru_bound_and_shared_tier(self):
+        cache = ScoreCache(max_size=2, shared=True)
+        for i in range(3):
+            cache.get_or_compute(cache.key("k", "v1", [i], [i]), lambda i=i: (i, [], "v1"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual(cache.stats()["size"], 2)
+
+        other = ScoreCache(max_size=2, shared=True)  # another worker process
+        self.assertEqual(other.get_or_compute(other.key("k", "v1", [0], [0]), lambda: (-1, [], "v1"))[0], 0)
+        self.assertEqual(other.stats()["shared_hits"], 1)
+        self.assertEqual(ScoreCache(max_size=0).get_or_compute(("k",), lambda: (5, [], "v")), (5, [], "v"))
+
+
+# The hand-written rule/v1 ladders the rule tables replaced, kept verbatim as the reference.
+def _legacy_v1_individual(features):
+    base = 50.0
+    explanations = []
+    income = float(features.get("yearly_income") or 0.0)
+    debt = float(features.get("existing_debt") or 0.0)
+    requested = float(features.get("requested_amount") or 0.0)
+    collateral = float(features.get("collateral_value") or 0.0)
+    credit_score = features.get("credit_history_score")
+    criminal = features.get("criminal_history", False)
+
+    dti = risk_model._safe_div(debt, income)
+    if dti is not None:
+        if dti < 0.2:
+            impact, reason = +12, f"dti={dti:.2f} very low"
+        elif dti < 0.5:
+            impact, reason = +3, f"dti={dti:.2f} moderate"
+        elif dti < 1.0:
+            impact, reason = -10, f"dti={dti:.2f} high"
+        else:
+            impact, reason = -25, f"dti={dti:.2f} very high"
+        base += impact
+        explanations.append({"feature": "debt_to_income", "impact": impact, "reason": reason})
+    else:
+        explanations.append({"feature": "debt_to_income", "impact": 0, "reason": "income or debt missing"})
+
+    col_req = risk_model._safe_div(collateral, requested)
+    if col_req is not None and requested > 0:
+        if col_req >= 1.0:
+            impact, reason = +10, f"collateral covers request (ratio={col_req:.2f})"
+        elif col_req >= 0.5:
+            impact, reason = +4, f"partial collateral (ratio={col_req:.2f})"
+        else:
+            impact, reason = -5, f"low collateral (ratio={col_req:.2f})"
+        base += impact
+        explanations.append({"feature": "collateral_to_requested", "impact": impact, "reason": reason})
+    else:
+        explanations.append({"feature": "collateral_to_requested", "impact": 0, "reason": "requested or collateral missing"})
+
+    if credit_score is not None:
+        try:
+            cs = int(credit_score)
+        except Exception:
+            cs = None
+        if cs is not None:
+            if cs >= 700:
+                impact, reason = +10, f"credit_score={cs} excellent"
+            elif cs >= 500:
+                impact, reason = +2, f"credit_score={cs} fair"
+            else:
+                impact, reason = -12, f"credit_score={cs} poor"
+            base += impact
+            explanations.append({"feature": "credit_history_score", "impact": impact, "reason": reason})
+
+    if criminal:
+        base -= 40
+        explanations.append({"feature": "criminal_history", "impact": -40, "reason": "criminal history present"})
+
+    return risk_model._clamp_score(base), explanations
+
+def _legacy_v1_company(features):
+    base = 50.0
+    explanations = []
+    revenue = float(features.get("revenue") or 0.0)
+    net_income = float(features.get("net_income") or 0.0)
+    assets = float(features.get("assets") or 0.0)
+    liabilities = float(features.get("liabilities") or 0.0)
+
+    if revenue > 0:
+        prof = net_income / revenue
+        if prof > 0.1:
+            impact, reason = +15, f"profitability={prof:.2f} good"
+        elif prof > 0:
+            impact, reason = +5, f"profitability={prof:.2f} low positive"
+        else:
+            impact, reason = -15, f"profitability={prof:.2f} negative"
+        base += impact
+        explanations.append({"feature": "profitability", "impact": impact, "reason": reason})
+    else:
+        explanations.append({"feature": "profitability", "impact": 0, "reason": "revenue missing or zero"})
+
+    equity = max(0.0, assets - liabilities)
+    if equity > 0:
+        leverage = liabilities / equity if equity else float("inf")
+        if leverage < 1:
+            impact, reason = +10, f"leverage={leverage:.2f} low"
+        elif leverage < 2:
+            impact, reason = 0, f"leverage={leverage:.2f} moderate"
+        else:
+            impact, reason = -15, f"leverage={leverage:.2f} high"
+        base += impact
+        explanations.append({"feature": "leverage", "impact": impact, "reason": reason})
+    else:
+        explanations.append({"feature": "leverage", "impact": 0, "reason": "assets or liabilities missing"})
+
+    return risk_model._clamp_score(base), explanations
+
+
+_EDGE_VALUES = [None, 0, -1, 0.5, 1, 2, 500, 700, 699.99, "650", "n/a", "", float("nan"), float("inf"), -float("inf")]
+
+
+class RuleTableTests(SimpleTestCase):
+    def _records(self, keys, seed):
+        rng = random.Random(seed)
+        records = []
+        for _ in range(2000):
+            records.append({k: rng.choice(_EDGE_VALUES + [rng.randint(-10, 10) * 10 ** rng.randint(0, 6),
+                                                          rng.uniform(-2, 2)]) for k in keys})
+        return records
+
+    def _individual_records(self):
+        records = [r for r in self._records(
+            ["yearly_income", "existing_debt", "requested_amount", "collateral_value", "credit_history_score"], 5)
+            if not any(isinstance(r[k], str) for k in ("yearly_income", "existing_debt", "requested_amount", "collateral_value"))]
+        for r in records:
+            r["criminal_history"] = random.Random(r["credit_history_score"].__class__.__name__).random() < 0.3
+        # exact thresholds: dti 0.2/0.5/1.0, collateral 0.5/1.0, credit score 500/700
+        for dti in (0.2, 0.5, 1.0):
+            records.append({"yearly_income": 10, "existing_debt": 10 * dti, "requested_amount": 0})
+        for ratio in (0.5, 1.0):
+            records.append({"requested_amount": 100, "collateral_value": 100 * ratio})
+        records += [{"credit_history_score": cs} for cs in (499, 500, 699, 700, True)] + [{}]
+        return [risk_model._normalize_individual_features(r) for r in records]
+
+    def _company_records(self):
+        records = [r for r in self._records(["revenue", "net_income", "assets", "liabilities"], 9)
+                   if not any(isinstance(v, str) for v in r.values())]
+        records += [{"revenue": 100, "net_income": n} for n in (0, 10, 10.0001, -1)]
+        records += [{"assets": 3, "liabilities": 1}, {"assets": 3, "liabilities": 2}, {"assets": 2, "liabilities": 2}]
+        return [risk_model._normalize_company_features(r) for r in records]
+
+    def test_v1_tables_reproduce_the_original_rules(self):
+        v1 = load_rule_set("rule/v1")
+        for kind, rows, legacy in (("individual", self._individual_records(), _legacy_v1_individual),
+                                   ("company", self._company_records(), _legacy_v1_company)):
+            expected = [legacy(r) for r in rows]
+            self.assertEqual([v1.score_one(kind, r) for r in rows], expected)
+            scores, explanations = v1.score_batch(kind, rows)
+            self.assertEqual(list(zip(scores, explanations)), expected)
+            self.assertEqual(v1.score_batch(kind, rows, explain=False), (scores, None))
+
+    def test_batch_emits_no_numpy_warnings(self):
+        import warnings
+
+        rows = [risk_model._normalize_company_features(r)
+                for r in ({"assets": float("inf"), "liabilities": float("inf")}, {"revenue": 0, "net_income": 1})]
+        v1 = load_rule_set("rule/v1")
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", RuntimeWarning)
+            scores, _ = v1.score_batch("company", rows)
+        self.assertEqual(scores, [v1.score_one("company", r)[0] for r in rows])
+
+    def test_new_version_is_selectable(self):
+        rule_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, rule_dir)
+        with open(os.path.join(rule_dir, "rule_v2.json"), "w") as fh:
+            json.dump({"version": "rule/v2", "company": {"base": 40, "rules": [
+                {"feature": "leverage", "op": "<=", "thresholds": [1.5], "impacts": [20, -20],
+                 "reasons": ["leverage={value:.1f} ok", "leverage={value:.1f} too high"], "missing": None},
+            ]}}, fh)
+        sets = RuleSets("rule/v2", rule_dir=rule_dir)
+        self.assertEqual(sets.active.score_one("company", {"assets": 5, "liabilities": 4}),
+                         (20, [{"feature": "leverage", "impact": -20, "reason": "leverage=4.0 too high"}]))
+        self.assertEqual(sets.active.score_one("company", {"assets": 5, "liabilities": 3})[0], 60)  # <= is inclusive
+        self.assertEqual(sets.active.score_batch("company", [{"assets": 5, "liabilities": 2}, {}]),
+                         ([60, 40], [[{"feature": "leverage", "impact": 20, "reason": "leverage=0.7 ok"}], []]))
+        with self.assertRaises(FileNotFoundError):
+            sets.activate("rule/v3")
+        self.assertEqual(sets.active.version, "rule/v2")
+
+        original = risk_model.rule_sets
+        risk_model.rule_sets = sets
+        self.addCleanup(setattr, risk_model, "rule_sets", original)
+        self.assertEqual(predict_company_risk({"assets": 5, "liabilities": 2})[2], "rule/v2")
+        self.assertEqual(risk_model.current_model_version("company"), "rule/v2")
+
+    def test_invalid_tables_are_rejected(self):
+        from apps.scoring_engine.ml.rules import RuleTable
+
+        good = {"feature": "leverage", "op": "<", "thresholds": [1, 2], "impacts": [1, 2, 3], "reasons": ["a", "b", "c"]}
+        RuleTable(good)
+        for bad in ({"thresholds": [2, 1]}, {"op": "=="}, {"impacts": [1, 2]}, {"input": "nope"},
+                    {"reasons": ["{amount}", "b", "c"]}):
+            with self.assertRaises(ValueError):
+                RuleTable(dict(good, **bad))
+
+class ModelRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.model_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.model_dir)
+        self.registry = ModelRegistry("individual_model", self.model_dir, check_interval=0)
+
+    def _deploy(self, filename, model):
+        tmp = os.path.join(self.model_dir, filename + ".tmp")
+        joblib.dump(model, tmp)
+        os.replace(tmp, os.path.join(self.model_dir, filename))
+
+    def test_no_artifact_returns_none(self):
+        self.assertEqual(self.registry.get(), (None, None))
+
+    def test_hot_reload_on_changed_artifact(self):
+        self._deploy("individual_model.joblib", _ConstantProbaModel(0.2))
+        first, first_version = self.registry.get()
+        self.assertEqual(first.prob, 0.2)
+        self.assertTrue(first_version.startswith("individual_model.joblib@"))
+
+        self._deploy("individual_model.joblib", _ConstantProbaModel(0.9))
+        second, second_version = self.registry.get()
+        self.assertEqual(second.prob, 0.9)
+        self.assertNotEqual(first_version, second_version)
+        # the reference a caller already holds is untouched by the swap
+        self.assertEqual(first.prob, 0.2)
+
+    def test_highest_versioned_artifact_wins(self):
+        self._deploy("individual_model.joblib", _ConstantProbaModel(0.1))
+        self._deploy("individual_model-9.joblib", _ConstantProbaModel(0.9))
+        self._deploy("individual_model-10.joblib", _ConstantProbaModel(0.5))
+        model, version = self.registry.get()
+        self.assertEqual(model.prob, 0.5)
+        self.assertTrue(version.startswith("individual_model-10.joblib@"))
+
+    def test_broken_artifact_keeps_current_model(self):
+        self._deploy("individual_model-1.joblib", _ConstantProbaModel(0.4))
+        self.registry.get()
+        with open(os.path.join(self.model_dir, "individual_model-2.joblib"), "wb") as fh:
+            fh.write(b"not a pickle")
+        with self.assertLogs("apps.scoring_engine.ml.registry", level="ERROR"):
+            model, version = self.registry.get()
+        self.assertEqual(model.prob, 0.4)
+        self.assertTrue(version.startswith("individual_model-1.joblib@"))
+
+    def test_background_warm_up_sets_ready(self):
+        self._deploy("individual_model.joblib", _ConstantProbaModel(0.4))
+        self.assertFalse(self.registry.is_ready())
+        self.assertIsNone(self.registry.version)
+        thread = self.registry.warm_up()
+        thread.join(5)
+        self.assertTrue(self.registry.is_ready())
+        self.assertTrue(self.registry.version.startswith("individual_model.joblib@"))
+        self.assertIsNone(self.registry.warm_up())
+
+    def test_removed_artifact_falls_back(self):
+        self._deploy("individual_model.joblib", _ConstantProbaModel(0.4))
+        self.assertIsNotNone(self.registry.get()[0])
+        os.remove(os.path.join(self.model_dir, "individual_model.joblib"))
+        self.assertEqual(self.registry.get(), (None, None))
+
+
+class BulkScoringEndpointTests(SimpleTestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def _read_lines(self, resp):
+        body = b"".join(resp.streaming_content).decode()
+        return [json.loads(line) for line in body.splitlines()]
+
+    @override_settings(SCORING_BULK_CHUNK_SIZE=3)
+    def test_bulk_individual_json_array(self):
+        rng = random.Random(3)
+        records = [_random_individual(rng) for _ in range(10)]
+        resp = self.client.post(reverse('predict-individual-bulk'), records, format='json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Content-Type"], "application/x-ndjson")
+        lines = self._read_lines(resp)
+        self.assertEqual([line["index"] for line in lines], list(range(10)))
+        for line, record in zip(lines, records):
+            score, explanation, model_ver = predict_individual_risk(record)
+            self.assertEqual((line["score"], line["explanation"], line["model_version"]), (score, explanation, model_ver))
+
+    def test_bulk_company_ndjson(self):
+        records = [_random_company(random.Random(i)) for i in range(4)]
+        body = "\n".join(json.dumps(r) for r in records[:2]) + "\nnot json\n\n" + "\n".join(json.dumps(r) for r in records[2:])
+        resp = self.client.post(reverse('predict-company-bulk'), body, content_type="application/x-ndjson")
+        self.assertEqual(resp.status_code, 200)
+        lines = self._read_lines(resp)
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(lines[2], {"index": 2, "error": "invalid JSON"})
+        self.assertEqual(lines[4]["score"], predict_company_risk(records[3])[0])
+
+    @override_settings(SCORING_BULK_CHUNK_SIZE=3)
+    def test_bulk_bad_record_is_reported_without_ending_the_stream(self):
+        rng = random.Random(4)
+        records = [_random_individual(rng) for _ in range(7)]
+        records[4] = dict(records[4], yearly_income="abc", existing_debt=5)
+        with self.assertLogs("apps.scoring_engine.views", level="WARNING"):
+            resp = self.client.post(reverse('predict-individual-bulk'), records, format='json')
+            lines = self._read_lines(resp)
+        self.assertEqual([line["index"] for line in lines], list(range(7)))
+        self.assertEqual(lines[4], {"index": 4, "error": "could not score record: could not convert string to float: 'abc'"})
+        for i in (0, 1, 2, 3, 5, 6):
+            self.assertEqual(lines[i]["score"], predict_individual_risk(records[i])[0])
+
+    def test_bulk_without_explanation(self):
+        records = [_random_company(random.Random(i)) for i in range(3)]
+        resp = self.client.post(reverse('predict-company-bulk') + "?explain=none", records, format='json')
+        lines = self._read_lines(resp)
+        self.assertEqual([set(line) for line in lines], [{"index", "score", "model_version"}] * 3)
+        self.assertEqual([line["score"] for line in lines], [predict_company_risk(r)[0] for r in records])
+
+    def test_bulk_rejects_unknown_explain_mode(self):
+        resp = self.client.post(reverse('predict-company-bulk') + "?explain=maybe", [{}], format='json')
+        self.assertEqual(resp.status_code, 400)
+
+    @override_settings(SCORING_BULK_MAX_RECORDS=2)
+    def test_bulk_rejects_oversized_array(self):
+        resp = self.client.post(reverse('predict-individual-bulk'), [{}, {}, {}], format='json')
+        self.assertEqual(resp.status_code, 413)
+
+    def test_bulk_rejects_non_array(self):
+        resp = self.client.post(reverse('predict-individual-bulk'), {"yearly_income": 1}, format='json')
+        self.assertEqual(resp.status_code, 400)
+        resp = self.client.post(reverse('predict-individual-bulk'), '[{"yearly_income": 1},]', content_type='application/json')
+        self.assertEqual(resp.status_code, 400)
+
+    @override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=1024 * 1024)
+    def test_bulk_json_array_larger_than_the_upload_limit(self):
+        rng = random.Random(9)
+        records = [_random_individual(rng) for _ in range(25000)]
+        body = json.dumps(records)
+        self.assertGreater(len(body), 1024 * 1024)
+        resp = self.client.post(reverse('predict-individual-bulk') + "?explain=none", body, content_type='application/json')
+        self.assertEqual(resp.status_code, 200)
+        lines = self._read_lines(resp)
+        self.assertEqual([line["index"] for line in lines], list(range(len(records))))
+        self.assertEqual([line["score"] for line in lines[:500]], [predict_individual_risk(r)[0] for r in records[:500]])
+
+
+class ReadinessEndpointTests(SimpleTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.addCleanup(risk_model.individual_models.reset)
+        self.addCleanup(risk_model.company_models.reset)
+
+    def test_not_ready_until_warmed(self):
+        risk_model.individual_models.reset()
+        risk_model.company_models.reset()
+        self.assertEqual(self.client.get(reverse('scoring-ready')).status_code, 503)
+        health = self.client.get(reverse('scoring-health'))
+        self.assertEqual(health.status_code, 200)
+        self.assertFalse(health.data["models_ready"])
+
+        risk_model.warm_up_models(background=False)
+        resp = self.client.get(reverse('scoring-ready'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.data["ready"])
@@ -1,7 +1,20 @@
 from django.urls import path
-from .views import PredictIndividualView, PredictCompanyView
+from .views import (
+    PredictIndividualView,
+    PredictCompanyView,
+    BulkPredictIndividualView,
+    BulkPredictCompanyView,
+    PredictionAttributionsView,
+    HealthView,
+    ReadinessView,
+)
 
 urlpatterns = [
     path('individual/', PredictIndividualView.as_view(), name='predict-individual'),
     path('company/', PredictCompanyView.as_view(), name='predict-company'),
+    path('individual/bulk/', BulkPredictIndividualView.as_view(), name='predict-individual-bulk'),
+    path('company/bulk/', BulkPredictCompanyView.as_view(), name='predict-company-bulk'),
+    path('logs/<int:pk>/attributions/', PredictionAttributionsView.as_view(), name='prediction-attributions'),
+    path('health/', HealthView.as_view(), name='scoring-health'),
+    path('ready/', ReadinessView.as_view(), name='scoring-ready'),
 ]
@@ -1,21 +1,293 @@
+import codecs
+import json
+import logging
+from itertools import islice
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
-from .ml.risk_model import predict_individual_risk, predict_company_risk
+from .ml.risk_model import (
+    predict_individual_risk,
+    predict_company_risk,
+    predict_individual_risk_batch,
+    predict_company_risk_batch,
+    individual_models,
+    company_models,
+    models_ready,
+    score_cache,
+    explain_mode,
+)
 
+from .attributions import get_attributions
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+logger = logging.getLogger(__name__)
+
+
+def _explain_params(request):
+    """
+    (explain, top_k) from ?explain=full|top_k|none and ?top_k=<n>.
+    Raises ValueError for values the scorers don't accept.
+    """
+    explain = explain_mode(request.query_params.get("explain"))
+    top_k = request.query_params.get("top_k")
+    if top_k is None:
+        return explain, None
+    if not top_k.isdigit() or int(top_k) < 1:
+        raise ValueError("top_k must be a positive integer")
+    return explain, int(top_k)
+
+
+def _result(score, explanation, model_ver, explain) -> dict:
+    # with explain off the key is left out rather than sent as null
+    item = {"score": int(score) if score is not None else None}
+    if explain:
+        item["explanation"] = explanation
+    item["model_version"] = model_ver
+    return item
+
+
+class PredictView(APIView):
+    """
+    Base view for single-record scoring. ?explain=top_k (with optional
+    ?top_k=<n>) returns only the main drivers, ?explain=none skips the
+    explanation altogether.
+    """
+    scorer = None
 
-class PredictIndividualView(APIView):
-    """POST /api/score/individual/ - accepts JSON features and returns score + explanation"""
     def post(self, request, *args, **kwargs):
+        try:
+            explain, top_k = _explain_params(request)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
         features = request.data if isinstance(request.data, dict) else {}
-        score, explanation, model_ver = predict_individual_risk(features)
-        return Response({"score": int(score) if score is not None else None, "explanation": explanation, "model_version": model_ver})
+        score, explanation, model_ver = self.scorer(features, explain=explain, top_k=top_k)
+        return Response(_result(score, explanation, model_ver, explain))
 
 
-class PredictCompanyView(APIView):
+class PredictIndividualView(PredictView):
+    """POST /api/score/individual/ - accepts JSON features and returns score + explanation"""
+    scorer = staticmethod(predict_individual_risk)
+
+
+class PredictCompanyView(PredictView):
     """POST /api/score/company/ - accepts JSON features and returns score + explanation"""
+    scorer = staticmethod(predict_company_risk)
+
+
+def _iter_ndjson(stream):
+    """Yield (index, record, error) for each non-blank line of an NDJSON stream."""
+    if stream is None:
+        return
+    index = 0
+    for line in iter(stream.readline, b""):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield index, json.loads(line), None
+        except ValueError:
+            yield index, None, "invalid JSON"
+        index += 1
+
+
+def _iter_json_array(stream, read_size=64 * 1024):
+    """
+    Yield the elements of a JSON array read from a stream in read_size pieces,
+    so the raw body is never buffered whole (nor capped by DATA_UPLOAD_MAX_MEMORY_SIZE).
+    Raises ValueError if the body is not a well-formed JSON array.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    buf, pos, eof = "", 0, stream is None
+    expect = "["  # then "value_or_end", "value" or "separator"
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n":
+            pos += 1
+        if pos == len(buf) or expect in ("value", "value_or_end") and buf[pos] != "]":
+            if pos == len(buf) and eof:
+                if expect == "done":
+                    return
+                if expect == "[":
+                    raise ValueError("Expected a JSON array of feature objects.")
+                raise ValueError("Invalid JSON: unexpected end of the array.")
+            if pos < len(buf):
+                try:
+                    value, end = decoder.raw_decode(buf, pos)
+                except ValueError:
+                    end = None
+                    if eof:
+                        raise ValueError("Invalid JSON in the array.")
+                # a number cut at the buffer's edge ("-1.5e" + "3") may continue in the next piece
+                if end is not None and (eof or end < len(buf) and buf[end] not in "0123456789.eE+-"):
+                    pos, expect = end, "separator"
+                    yield value
+                    continue
+            chunk = b"" if eof else stream.read(read_size)
+            eof = not chunk
+            buf, pos = buf[pos:] + text.decode(chunk, final=eof), 0
+            continue
+        char = buf[pos]
+        pos += 1
+        if expect == "[" and char == "[":
+            expect = "value_or_end"
+        elif expect in ("value_or_end", "separator") and char == "]":
+            expect = "done"
+        elif expect == "separator" and char == ",":
+            expect = "value"
+        elif expect == "[":
+            raise ValueError("Expected a JSON array of feature objects.")
+        else:
+            raise ValueError("Invalid JSON in the array.")
+
+
+def _iter_chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class BulkPredictView(APIView):
+    """
+    Base view for bulk scoring. Accepts a JSON array of feature objects, or an
+    NDJSON body (Content-Type: application/x-ndjson) with one object per line.
+    Records are scored in chunks and streamed back as NDJSON, one result per
+    line in input order, so memory stays flat and the client can start reading
+    before the last chunk is scored. ?explain= and ?top_k= work as for the
+    single-record views; with ?explain=none no explanation is built or encoded.
+    """
+    scorer = None
+
     def post(self, request, *args, **kwargs):
-        features = request.data if isinstance(request.data, dict) else {}
-        score, explanation, model_ver = predict_company_risk(features)
-        return Response({"score": int(score) if score is not None else None, "explanation": explanation, "model_version": model_ver})
+        try:
+            explain, top_k = _explain_params(request)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        chunk_size = getattr(settings, "SCORING_BULK_CHUNK_SIZE", 1000)
+        max_records = getattr(settings, "SCORING_BULK_MAX_RECORDS", 50000)
+
+        if request.content_type.startswith(NDJSON_CONTENT_TYPE):
+            records = _iter_ndjson(request.stream)
+        else:
+            # parsed from the raw stream rather than request.data, which buffers the
+            # whole body and is capped by DATA_UPLOAD_MAX_MEMORY_SIZE (2.5 MB by default)
+            try:
+                data = list(islice(_iter_json_array(request.stream), max_records + 1))
+            except ValueError as exc:
+                return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+            if len(data) > max_records:
+                return Response(
+                    {"detail": f"Too many records: more than {max_records}."},
+                    status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                )
+            records = ((index, record, None) for index, record in enumerate(data))
+
+        return StreamingHttpResponse(
+            self._stream_results(records, chunk_size, max_records, explain, top_k),
+            content_type=NDJSON_CONTENT_TYPE,
+        )
+
+    def _stream_results(self, records, chunk_size, max_records, explain="full", top_k=None):
+        for chunk in _iter_chunks(self._limit(records, max_records), chunk_size):
+            valid = [record for _, record, error in chunk if error is None]
+            try:
+                results = iter(self.scorer(valid, explain=explain, top_k=top_k))
+            except Exception as exc:
+                # one bad record must not end the stream: score this chunk record by record
+                logger.warning("bulk chunk at index %s failed (%s), scoring it record by record", chunk[0][0], exc)
+                results = iter([self._score_one(record, explain, top_k) for record in valid])
+            lines = []
+            for index, _, error in chunk:
+                if error is None:
+                    result = next(results)
+                    error = result if isinstance(result, str) else None
+                if error is not None:
+                    item = {"index": index, "error": error}
+                else:
+                    item = {"index": index, **_result(*result, explain)}
+                lines.append(json.dumps(item))
+            yield "\n".join(lines) + "\n"
+
+    def _score_one(self, record, explain, top_k):
+        """The record's result tuple, or an error message if it can't be scored."""
+        try:
+            return self.scorer([record], explain=explain, top_k=top_k)[0]
+        except Exception as exc:
+            return f"could not score record: {exc}"
+
+    @staticmethod
+    def _limit(records, max_records):
+        for index, record, error in records:
+            if index >= max_records:
+                yield index, None, f"record limit of {max_records} exceeded"
+                return
+            yield index, record, error
+
+
+class BulkPredictIndividualView(BulkPredictView):
+    """POST /api/score/individual/bulk/ - JSON array or NDJSON in, NDJSON stream of scores out"""
+    scorer = staticmethod(predict_individual_risk_batch)
+
+
+class BulkPredictCompanyView(BulkPredictView):
+    """POST /api/score/company/bulk/ - JSON array or NDJSON in, NDJSON stream of scores out"""
+    scorer = staticmethod(predict_company_risk_batch)
+
+
+class PredictionAttributionsView(APIView):
+    """
+    GET /api/score/logs/<id>/attributions/ - SHAP top-k drivers of a model-scored
+    prediction. Computed on the first request (unless the background task got
+    there first) and stored on the PredictionLog row; null for rule-scored
+    predictions and for models that are no longer active, empty when the
+    active model can't explain the prediction.
+    """
+    def get(self, request, pk, *args, **kwargs):
+        from apps.individuals.models import PredictionLog
+
+        log = get_object_or_404(PredictionLog, pk=pk)
+        return Response({
+            "id": log.id,
+            "score": log.score,
+            "model_version": log.model_version,
+            "explanation": log.explanation,
+            "attributions": get_attributions(log),
+        })
+
+
+def _model_status():
+    return {
+        registry.name: {"ready": registry.is_ready(), "version": registry.version}
+        for registry in (individual_models, company_models)
+    }
+
+
+class HealthView(APIView):
+    """GET /api/score/health/ - liveness; answers immediately, even while models are still loading"""
+    def get(self, request, *args, **kwargs):
+        return Response({
+            "status": "ok",
+            "models_ready": models_ready(),
+            "models": _model_status(),
+            "score_cache": score_cache.stats(),
+        })
+
+
+class ReadinessView(APIView):
+    """GET /api/score/ready/ - 200 once the scoring models are loaded, 503 while they are warming up"""
+    def get(self, request, *args, **kwargs):
+        ready = models_ready()
+        return Response(
+            {"ready": ready, "models": _model_status()},
+            status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
@@ -0,0 +1,84 @@
+"""
+Cost of explanations in bulk scoring.
+
+Scores N synthetic individual records through predict_individual_risk_batch
+in chunks (as the bulk endpoint and the rescoring task do) and encodes each
+result as an NDJSON line, once per explain mode:
+- full:  every rule's reason string, as before
+- top_k: the top_k largest |impact| entries
+- none:  no explanation built or encoded
+
+Times scoring and encoding separately and reports rows/sec. Uses the rule
+tables (no model artifacts), where explanations are most of the work.
+
+Usage: python benchmarks/bench_explain.py [--sizes 10000 1000000] [--chunk-size 10000]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = ("full", "top_k", "none")
+
+
+def _records(rng, n):
+    return [
+        {
+            "yearly_income": rng.choice([None, rng.randint(1, 5_000_000)]),
+            "existing_debt": rng.randint(0, 5_000_000),
+            "requested_amount": rng.randint(1, 5_000_000),
+            "collateral_value": rng.randint(0, 5_000_000),
+            "credit_history_score": rng.choice([None, rng.randint(300, 850)]),
+            "criminal_history": rng.random() < 0.1,
+        }
+        for _ in range(n)
+    ]
+
+
+def _run(size, chunk_size, explain, top_k):
+    from apps.scoring_engine.ml.risk_model import predict_individual_risk_batch
+
+    rng = random.Random(0)
+    score_time = encode_time = 0.0
+    encoded = 0
+    for start in range(0, size, chunk_size):
+        records = _records(rng, min(chunk_size, size - start))
+        t0 = time.perf_counter()
+        results = predict_individual_risk_batch(records, explain=explain, top_k=top_k)
+        t1 = time.perf_counter()
+        lines = []
+        for index, (score, explanation, model_ver) in enumerate(results, start):
+            item = {"index": index, "score": score}
+            if explain != "none":
+                item["explanation"] = explanation
+            item["model_version"] = model_ver
+            lines.append(json.dumps(item))
+        encoded += len("\n".join(lines)) + 1
+        encode_time += time.perf_counter() - t1
+        score_time += t1 - t0
+    return score_time, encode_time, encoded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'records':>9}  {'explain':<7}{'score s':>9}{'encode s':>10}{'total s':>9}{'rows/s':>11}{'MB out':>8}")
+    for size in args.sizes:
+        for explain in MODES:
+            score_time, encode_time, encoded = _run(size, args.chunk_size, explain, args.top_k)
+            total = score_time + encode_time
+            print(f"{size:>9}  {explain:<7}{score_time:>9.2f}{encode_time:>10.2f}{total:>9.2f}"
+                  f"{size / total:>11,.0f}{encoded / 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
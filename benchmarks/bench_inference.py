@@ -0,0 +1,76 @@
+"""
+Compiled vs estimator inference latency.
+
+Fits each supported model family on synthetic data (8 features, like the
+individual model), compiles it with compile_model() and times predict_proba
+on both for a single row and for batches, checking the outputs are
+identical. Single rows are the per-request scoring path; the batch sizes
+show where the estimators' own compiled loops take over.
+
+Usage: python benchmarks/bench_inference.py [--batch-sizes 100 1000] [--repeat 200]
+"""
+import argparse
+import os
+import sys
+import timeit
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _models():
+    from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+
+    models = [
+        ("logistic", LogisticRegression(max_iter=1000)),
+        ("random_forest", RandomForestClassifier(100, max_depth=8, random_state=0)),
+        ("gradient_boosting", GradientBoostingClassifier(n_estimators=200, random_state=0)),
+    ]
+    try:
+        import xgboost
+        models.append(("xgboost", xgboost.XGBClassifier(n_estimators=200, max_depth=4)))
+    except ImportError:
+        pass
+    try:
+        import lightgbm
+        models.append(("lightgbm", lightgbm.LGBMClassifier(n_estimators=200, verbose=-1)))
+    except ImportError:
+        pass
+    return models
+
+
+def _time(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=200, help="calls per single-row timing")
+    args = parser.parse_args()
+
+    import numpy as np
+    from apps.scoring_engine.ml.compiled import compile_model
+
+    warnings.filterwarnings("ignore")
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(max(3000, *args.batch_sizes), 8))
+    y = (X[:, 0] - X[:, 1] + rng.normal(size=len(X)) > 0).astype(int)
+
+    print(f"{'model':<18}{'rows':>6}{'estimator us':>14}{'compiled us':>13}{'speedup':>9}  identical")
+    for name, model in _models():
+        model.fit(X, y)
+        compiled = compile_model(model)
+        for rows in [1, *args.batch_sizes]:
+            batch = X[:rows].tolist()  # requests arrive as Python lists
+            number = max(1, args.repeat // rows)
+            native = _time(lambda: model.predict_proba(batch), number) * 1e6
+            fast = _time(lambda: compiled.predict_proba(batch), number) * 1e6
+            identical = bool(np.array_equal(model.predict_proba(batch), compiled.predict_proba(batch)))
+            print(f"{name:<18}{rows:>6}{native:>14,.0f}{fast:>13,.0f}{native / fast:>8.1f}x  {identical}")
+
+
+if __name__ == "__main__":
+    main()
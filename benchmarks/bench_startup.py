@@ -0,0 +1,87 @@
+"""
+Startup-time benchmark for the scoring engine.
+
+Trains throwaway sklearn models, writes them as joblib artifacts into a temp
+model dir and times, in fresh interpreters:
+- eager:      import risk_model and load both models before returning
+              (what every process paid when models loaded at import time)
+- lazy:       import risk_model only (manage.py commands, migrations, beat)
+- background: import risk_model and start warm_up_models() (web/worker boot);
+              also reports how long until models_ready() turns True
+
+Usage: python benchmarks/bench_startup.py [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    "eager": """
+import time
+t0 = time.perf_counter()
+from apps.scoring_engine.ml import risk_model
+risk_model.warm_up_models(background=False)
+print(time.perf_counter() - t0, time.perf_counter() - t0)
+""",
+    "lazy": """
+import time
+t0 = time.perf_counter()
+from apps.scoring_engine.ml import risk_model
+print(time.perf_counter() - t0, "nan")
+""",
+    "background": """
+import time
+t0 = time.perf_counter()
+from apps.scoring_engine.ml import risk_model
+risk_model.warm_up_models()
+startup = time.perf_counter() - t0
+risk_model.individual_models.wait_ready()
+risk_model.company_models.wait_ready()
+print(startup, time.perf_counter() - t0)
+""",
+}
+
+
+def _write_models(model_dir):
+    import joblib
+    import numpy as np
+    from sklearn.ensemble import GradientBoostingClassifier
+
+    rng = np.random.default_rng(0)
+    for name, n_features in (("individual_model", 8), ("company_model", 6)):
+        X = rng.normal(size=(2000, n_features))
+        y = (X[:, 0] + rng.normal(size=2000) > 0).astype(int)
+        model = GradientBoostingClassifier(n_estimators=200).fit(X, y)
+        joblib.dump(model, os.path.join(model_dir, f"{name}.joblib"))
+
+
+def _run(code, model_dir):
+    env = dict(os.environ, SCORING_MODEL_DIR=model_dir, PYTHONPATH=ROOT)
+    out = subprocess.run([sys.executable, "-c", code], env=env, cwd=ROOT, check=True, capture_output=True, text=True)
+    startup, ready = out.stdout.split()
+    return float(startup), float(ready)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        _write_models(model_dir)
+        print(f"{'scenario':<12}{'startup ms':>12}{'ready ms':>12}   (median of {args.runs})")
+        for name, code in SCENARIOS.items():
+            results = [_run(code, model_dir) for _ in range(args.runs)]
+            startup = statistics.median(r[0] for r in results) * 1000
+            ready = statistics.median(r[1] for r in results) * 1000
+            ready_col = "-" if ready != ready else f"{ready:.1f}"
+            print(f"{name:<12}{startup:>12.1f}{ready_col:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -129,3 +130,44 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Cache: Redis when REDIS_URL is set (docker-compose / prod), in-process locmem otherwise
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# External integrations: records older than this are refetched on read, and
+# the read-through cache (in-process LRU in front of CACHES) never outlives it.
+EXTERNAL_RECORD_MAX_AGE_DAYS = 30
+EXTERNAL_CACHE_TIMEOUT = 3600  # seconds, shared cache
+EXTERNAL_CACHE_LOCAL_SIZE = 1024  # entries per process
+EXTERNAL_CACHE_LOCAL_TIMEOUT = 60  # seconds, in-process tier
+
+# PredictionLog writes (apps/individuals/prediction_logs.py): above 1, rows are
+# queued after commit and bulk inserted by a background thread in batches of
+# this size or every PREDICTION_LOG_FLUSH_INTERVAL seconds.
+PREDICTION_LOG_BUFFER_SIZE = int(os.environ.get('PREDICTION_LOG_BUFFER_SIZE', '0'))
+PREDICTION_LOG_FLUSH_INTERVAL = float(os.environ.get('PREDICTION_LOG_FLUSH_INTERVAL', '1.0'))
+# cleanup_prediction_logs: seconds to sleep between delete batches
+PREDICTION_LOG_CLEANUP_PAUSE = 0.1
+
+# Async credit request scoring: longest a status long-poll (?wait=) may block.
+# The wait holds a gunicorn sync worker, so keep it short; clients re-poll.
+CREDIT_REQUEST_STATUS_MAX_WAIT = 2  # seconds
+
+
+# Celery (read by tasks/celery.py via the CELERY_ namespace). A result backend
+# is needed for the rescoring chord to aggregate chunk results.
+CELERY_BROKER_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+CELERY_RESULT_BACKEND = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'credit_risk.settings')
 
 application = get_wsgi_application()
+
+# Load scoring models on a background thread so the worker can answer health
+# checks right away; /api/score/ready/ reports when they are loaded.
+from apps.scoring_engine.ml.risk_model import warm_up_models  # noqa: E402
+
+warm_up_models()
@@ -2,6 +2,7 @@
 import os
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_process_init, worker_process_shutdown
 
 # set default Django settings module for 'celery' program.
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "credit_risk.settings")
@@ -23,11 +24,17 @@ app.conf.beat_schedule = {
         "schedule": crontab(day_of_month=1, hour=4, minute=0),
         "args": (90,),  # delete logs older than 90 days
     },
-    # rescore pending credit requests every hour
+    # rescore pending credit requests every 30 minutes, fanned out across workers
     "rescore-pending-credit-requests": {
-        "task": "tasks.tasks.rescore_pending_credit_requests",
-        "schedule": crontab(minute="*/30"),  # every 30 minutes
-        "args": (100,),  # process up to 100 pending requests per run
+        "task": "tasks.tasks.fan_out_rescore_pending_credit_requests",
+        "schedule": crontab(minute="*/30"),
+        "kwargs": {"chunk_size": 500, "lease_seconds": 900},
+    },
+    # SHAP attributions for model-scored predictions, off the request path
+    "explain-prediction-logs": {
+        "task": "tasks.tasks.explain_prediction_logs",
+        "schedule": crontab(minute="*/15"),
+        "kwargs": {"batch_size": 500},
     },
     # refresh stale external records daily
     "refresh-stale-external-records": {
@@ -37,6 +44,22 @@ app.conf.beat_schedule = {
     },
 }
 
+
+@worker_process_init.connect
+def warm_up_scoring_models(**kwargs):
+    # Warm models in each pool process after fork; beat and one-off commands
+    # never import them until a prediction actually runs.
+    from apps.scoring_engine.ml.risk_model import warm_up_models
+    warm_up_models()
+
+
+@worker_process_shutdown.connect
+def flush_prediction_logs(**kwargs):
+    # pool processes exit without running atexit handlers
+    from apps.individuals.prediction_logs import prediction_log_writer
+    prediction_log_writer.flush()
+
+
 # Optional: make sure tasks module is imported so tasks register
 # (this import is safe even if file doesn't exist yet)
 try:
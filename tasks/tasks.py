@@ -1,8 +1,10 @@
 # tasks/tasks.py
 import logging
+import time
 from datetime import timedelta, datetime
 
 from celery import shared_task
+from django.conf import settings
 from django.utils import timezone
 
 logger = logging.getLogger(__name__)
@@ -11,23 +13,20 @@ logger = logging.getLogger(__name__)
 @shared_task(bind=True)
 def refresh_soliq_record(self, inn: str) -> dict:
     """
-    Fetch (mock) Soliq record for the given INN and persist/update the DB record.
+    Fetch Soliq record for the given INN and persist/update the DB record.
     Returns the record data or {} on failure.
     """
     try:
-        from apps.external_integrations.clients import fetch_soliq_mock
-        from apps.external_integrations.models import SoliqRecord
+        from apps.external_integrations.clients import fetch_soliq
+        from apps.external_integrations.services import upsert_soliq_records
     except Exception as exc:
         logger.exception("Missing external_integrations app or imports: %s", exc)
         return {}
 
     try:
-        data = fetch_soliq_mock(inn)
-        rec, created = SoliqRecord.objects.update_or_create(
-            inn=inn,
-            defaults={"name": data.get("registered_name"), "data": data},
-        )
-        logger.info("Soliq record refreshed for %s (created=%s)", inn, created)
+        data = fetch_soliq(inn)
+        upsert_soliq_records({inn: data})
+        logger.info("Soliq record refreshed for %s", inn)
         return data
     except Exception:
         logger.exception("Failed to refresh Soliq for %s", inn)
@@ -37,138 +36,500 @@ def refresh_soliq_record(self, inn: str) -> dict:
 @shared_task(bind=True)
 def refresh_kadastr_record(self, parcel_id: str) -> dict:
     """
-    Fetch (mock) Kadastr record for the given parcel id and persist/update the DB record.
+    Fetch Kadastr record for the given parcel id and persist/update the DB record.
     """
     try:
-        from apps.external_integrations.clients import fetch_kadastr_mock
-        from apps.external_integrations.models import KadastrRecord
+        from apps.external_integrations.clients import fetch_kadastr
+        from apps.external_integrations.services import upsert_kadastr_records
     except Exception as exc:
         logger.exception("Missing external_integrations app or imports: %s", exc)
         return {}
 
     try:
-        data = fetch_kadastr_mock(parcel_id)
-        rec, created = KadastrRecord.objects.update_or_create(
-            parcel_id=parcel_id,
-            defaults={"owner_name": data.get("owner_name"), "address": data.get("address"), "data": data},
-        )
-        logger.info("Kadastr record refreshed for %s (created=%s)", parcel_id, created)
+        data = fetch_kadastr(parcel_id)
+        upsert_kadastr_records({parcel_id: data})
+        logger.info("Kadastr record refreshed for %s", parcel_id)
         return data
     except Exception:
         logger.exception("Failed to refresh Kadastr for %s", parcel_id)
         return {}
 
 
+@shared_task(bind=True, rate_limit=getattr(settings, "EXTERNAL_REFRESH_RATE_LIMIT", "30/m"))
+def refresh_soliq_records(self, inns: list) -> int:
+    """
+    Refresh a chunk of Soliq records in one task message: one batch fetch
+    through the client layer and one upsert statement for the whole chunk.
+    Rate limited per worker (EXTERNAL_REFRESH_RATE_LIMIT chunks per worker) so
+    the upstream API sees at most rate * chunk size calls.
+    Returns the number of keys refreshed.
+    """
+    try:
+        from apps.external_integrations.clients import fetch_soliq_many
+        from apps.external_integrations.services import upsert_soliq_records
+    except Exception as exc:
+        logger.exception("Missing external_integrations app or imports: %s", exc)
+        return 0
+
+    try:
+        records = fetch_soliq_many(inns)
+        upsert_soliq_records(records)
+    except Exception:
+        logger.exception("Failed to refresh Soliq chunk of %d INNs", len(inns))
+        return 0
+    logger.info("Soliq records refreshed for %d INNs", len(records))
+    return len(records)
+
+
+@shared_task(bind=True, rate_limit=getattr(settings, "EXTERNAL_REFRESH_RATE_LIMIT", "30/m"))
+def refresh_kadastr_records(self, parcel_ids: list) -> int:
+    """
+    Refresh a chunk of Kadastr records in one task message. See refresh_soliq_records.
+    """
+    try:
+        from apps.external_integrations.clients import fetch_kadastr_many
+        from apps.external_integrations.services import upsert_kadastr_records
+    except Exception as exc:
+        logger.exception("Missing external_integrations app or imports: %s", exc)
+        return 0
+
+    try:
+        records = fetch_kadastr_many(parcel_ids)
+        upsert_kadastr_records(records)
+    except Exception:
+        logger.exception("Failed to refresh Kadastr chunk of %d parcels", len(parcel_ids))
+        return 0
+    logger.info("Kadastr records refreshed for %d parcels", len(records))
+    return len(records)
+
+
+def _stale_keys(model, key_field: str, cutoff, after=None, limit: int = None) -> list:
+    """
+    The next `limit` distinct keys after `after` whose record is older than
+    cutoff, in key order, reading only the key column. Keys are unique per
+    table, but grouping keeps this correct (newest fetched_at wins) even if
+    duplicates slip in.
+    """
+    from django.db.models import Max
+
+    qs = model.objects.order_by()
+    if after is not None:
+        qs = qs.filter(**{f"{key_field}__gt": after})
+    qs = (
+        qs.values(key_field)
+        .annotate(last_fetched_at=Max("fetched_at"))
+        .filter(last_fetched_at__lt=cutoff)
+        .order_by(key_field)
+        .values_list(key_field, flat=True)
+    )
+    return list(qs[:limit] if limit else qs)
+
+
 @shared_task(bind=True)
-def refresh_stale_external_records(self, ttl_days: int = 30):
+def refresh_stale_external_records(self, ttl_days: int = 30, chunk_size: int = 200, max_in_flight: int = 10,
+                                   wave_interval: float = 60, sources: list = None, after: str = None,
+                                   cutoff: str = None):
     """
-    Find stored external records older than ttl_days and refresh them.
-    This task iterates both SoliqRecord and KadastrRecord tables.
+    Find external records older than ttl_days and refresh them in waves.
+    Only the distinct stale keys are read from SoliqRecord and KadastrRecord,
+    and they are sent as refresh_soliq_records / refresh_kadastr_records chunk
+    tasks of `chunk_size` keys rather than one message per row.
+
+    Each run dispatches one wave per source: at most `max_in_flight` chunks,
+    as a chord whose callback is this task again, from the last key of the
+    wave. The next wave is only enqueued once every chunk of the previous one
+    has finished (and `wave_interval` seconds later), so at most
+    `max_in_flight` chunks per source are ever queued or running. The
+    continuation carries the cutoff of the first run, so the walk ends.
+    Returns the number of chunks dispatched in this wave per source.
     """
     try:
+        from celery import chord, group
         from apps.external_integrations.models import SoliqRecord, KadastrRecord
     except Exception as exc:
         logger.exception("Missing external_integrations models: %s", exc)
         return
 
-    cutoff = timezone.now() - timedelta(days=ttl_days)
-
-    # Soliq
-    stale_soliq = SoliqRecord.objects.filter(fetched_at__lt=cutoff)
-    for rec in stale_soliq:
+    cutoff = datetime.fromisoformat(cutoff) if cutoff else timezone.now() - timedelta(days=ttl_days)
+    summary = {}
+    for name, model, key_field, task in (
+        ("soliq", SoliqRecord, "inn", refresh_soliq_records),
+        ("kadastr", KadastrRecord, "parcel_id", refresh_kadastr_records),
+    ):
+        if sources is not None and name not in sources:
+            continue
         try:
-            refresh_soliq_record.delay(rec.inn)
-        except Exception:
-            logger.exception("Failed to schedule refresh_soliq_record for %s", rec.inn)
-
-    # Kadastr
-    stale_kadastr = KadastrRecord.objects.filter(fetched_at__lt=cutoff)
-    for rec in stale_kadastr:
-        try:
-            refresh_kadastr_record.delay(rec.parcel_id)
+            keys = _stale_keys(model, key_field, cutoff, after=after, limit=chunk_size * max_in_flight)
+            chunks = [keys[i:i + chunk_size] for i in range(0, len(keys), chunk_size)]
+            summary[name] = len(chunks)
+            if not chunks:
+                continue
+            header = group(task.s(chunk) for chunk in chunks)
+            if len(keys) < chunk_size * max_in_flight:
+                header.apply_async()  # last wave
+                continue
+            next_wave = refresh_stale_external_records.si(
+                ttl_days, chunk_size, max_in_flight, wave_interval,
+                sources=[name], after=keys[-1], cutoff=cutoff.isoformat(),
+            ).set(countdown=wave_interval)
+            chord(header)(next_wave)
         except Exception:
-            logger.exception("Failed to schedule refresh_kadastr_record for %s", rec.parcel_id)
+            logger.exception("Failed to schedule %s refresh chunks", name)
+            summary[name] = None
+    logger.info("Scheduled stale external record refresh chunks: %s", summary)
+    return summary
 
 
 @shared_task(bind=True)
-def rescore_pending_credit_requests(self, limit: int = 100):
+def rescore_pending_credit_requests(self, limit: int = None, chunk_size: int = 500, after_id: int = 0, time_budget: float = 600,
+                                    explain: str = None, workers: int = None, lease_seconds: int = 900):
     """
-    Recompute scores for recent (pending) credit requests that don't have scores or whose status is pending.
-    Limit controls how many are processed per run to avoid long tasks.
+    Recompute scores for pending credit requests in this task, walking the backlog
+    by primary key (see fan_out_rescore_pending_credit_requests for the
+    multi-worker version). Each chunk is leased for `lease_seconds` like the
+    fan-out chunks, so rows another run holds are skipped and rows this run
+    loses to an expired lease aren't saved twice. It is loaded with its profiles in one query, scored through the batch
+    scorers and written back with one bulk_update plus one bulk_create of
+    PredictionLog rows inside a single transaction. Rows whose feature
+    fingerprint still matches their inputs and the current model are skipped.
+
+    `limit` caps the rows handled by this run (None = whole backlog). When the
+    run exceeds `time_budget` seconds it re-enqueues itself from the current
+    cursor, so a large backlog drains without one task holding a worker forever.
+    `explain` ("full", "top_k" or "none"; default settings.RESCORE_EXPLAIN,
+    "full") controls what is stored as the explanation; "none" skips building
+    and encoding it entirely.
+    `workers` > 0 scores each chunk on a ScoringPool of that many processes
+    (default settings.RESCORE_WORKERS, 0 = in this process); raise
+    `chunk_size` with it so every worker gets a useful share of a chunk.
+    Returns a summary with processed/failed counts, the cursor and rows/sec.
     """
     try:
+        import uuid
+        from django.db.models import Q
         from apps.credit_requests.models import CreditRequest
-        from apps.scoring_engine.ml.risk_model import predict_individual_risk, predict_company_risk
-        from apps.individuals.models import PredictionLog
+        from apps.credit_requests.scoring import (
+            claim_for_rescore, needs_rescore, release_lease, score_credit_requests, save_scores,
+        )
+        from apps.scoring_engine.ml.risk_model import explain_mode
+        from apps.scoring_engine.pool import ScoringPool
     except Exception as exc:
         logger.exception("Missing apps: %s", exc)
         return
 
-    qs = CreditRequest.objects.filter(status=CreditRequest.STATUS_PENDING).order_by("created_at")[:limit]
-    logger.info("Rescoring %d pending credit requests", qs.count())
+    # validate once up front rather than failing every chunk
+    explain = explain_mode(getattr(settings, "RESCORE_EXPLAIN", "full") if explain is None else explain)
+    if workers is None:
+        workers = getattr(settings, "RESCORE_WORKERS", 0)
+    pool = ScoringPool(workers) if workers else None
+    started = time.monotonic()
+    cursor = after_id
+    processed = failed = skipped = 0
+    continued = False
 
-    for cr in qs:
-        try:
-            if cr.applicant_type == CreditRequest.APPLICANT_INDIVIDUAL and cr.individual:
-                p = cr.individual
-                features = {
-                    "yearly_income": p.yearly_income,
-                    "existing_debt": p.existing_debt,
-                    "requested_amount": cr.requested_amount,
-                    "collateral_value": p.collateral_value,
-                    "credit_history_score": p.credit_history_score,
-                    "criminal_history": p.criminal_history,
-                }
-                score, explanation, model_ver = predict_individual_risk(features)
-            elif cr.applicant_type == CreditRequest.APPLICANT_COMPANY and cr.company:
-                c = cr.company
-                features = {
-                    "revenue": c.revenue,
-                    "net_income": c.net_income,
-                    "assets": c.assets,
-                    "liabilities": c.liabilities,
-                    "requested_amount": cr.requested_amount,
-                }
-                score, explanation, model_ver = predict_company_risk(features)
-            else:
-                continue
+    pending = CreditRequest.objects.filter(status=CreditRequest.STATUS_PENDING)
+    token = self.request.id or uuid.uuid4().hex
 
-            cr.score = int(score) if score is not None else None
-            cr.model_version = model_ver
-            cr.explanation = explanation
-            cr.updated_at = timezone.now()
-            cr.save(update_fields=["score", "model_version", "explanation", "updated_at"])
+    try:
+        while limit is None or processed + failed + skipped < limit:
+            size = chunk_size if limit is None else min(chunk_size, limit - processed - failed - skipped)
+            ids = list(
+                pending.filter(id__gt=cursor)
+                # leave rows alone while another run holds their lease
+                .filter(Q(rescore_lease_expires_at__isnull=True) | Q(rescore_lease_expires_at__lt=timezone.now()))
+                .order_by("id").values_list("id", flat=True)[:size]
+            )
+            if not ids:
+                break
+            cursor = ids[-1]
 
-            # log prediction
+            chunk = claim_for_rescore(pending.filter(id__in=ids), token, lease_seconds)
+            stale = [cr for cr in chunk if needs_rescore(cr)]
+            # rows claimed by another run in the meantime count as skipped
+            skipped += len(ids) - len(stale)
             try:
-                PredictionLog.objects.create(
-                    content_object=cr,
-                    score=int(score) if score is not None else None,
-                    model_version=model_ver,
-                    explanation=explanation,
-                    features=features,
-                )
+                if stale:
+                    saved = save_scores(score_credit_requests(stale, explain=explain, pool=pool),
+                                        meta={"updated_via": "rescore_pending_credit_requests"}, lease_token=token)
+                    processed += saved
+                    skipped += len(stale) - saved
             except Exception:
-                logger.exception("Failed to create PredictionLog for CreditRequest %s", cr.id)
-        except Exception:
-            logger.exception("Failed to rescore CreditRequest %s", cr.id)
+                logger.exception("Failed to rescore CreditRequest chunk ending at id %s", cursor)
+                failed += len(stale)
+            release_lease(token)
+
+            if time_budget is not None and time.monotonic() - started >= time_budget:
+                remaining = None if limit is None else limit - processed - failed - skipped
+                if remaining is None or remaining > 0:
+                    self.apply_async(kwargs={
+                        "limit": remaining,
+                        "chunk_size": chunk_size,
+                        "after_id": cursor,
+                        "time_budget": time_budget,
+                        "explain": explain,
+                        "workers": workers,
+                        "lease_seconds": lease_seconds,
+                    })
+                    continued = True
+                break
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    elapsed = time.monotonic() - started
+    summary = {
+        "processed": processed,
+        "failed": failed,
+        "skipped": skipped,
+        "cursor": cursor,
+        "continued": continued,
+        "rows_per_sec": round(processed / elapsed, 1) if elapsed > 0 else None,
+    }
+    logger.info("Rescored pending credit requests: %s", summary)
+    return summary
 
 
 @shared_task(bind=True)
-def cleanup_prediction_logs(self, older_than_days: int = 90) -> int:
+def fan_out_rescore_pending_credit_requests(self, chunk_size: int = 500, lease_seconds: int = 900, explain: str = None):
     """
-    Delete PredictionLog entries older than `older_than_days`.
-    Returns the count of deleted entries.
+    Coordinator for rescoring the pending backlog across workers.
+    Streams pending ids in primary-key order, cuts them into id ranges of
+    `chunk_size` rows and dispatches a chord of rescore_credit_request_range
+    tasks whose results are summed by aggregate_rescore_results.
+    Overlapping runs are safe: each chunk worker claims its rows with a lease,
+    so a row already leased by another run is skipped rather than rescored.
+    `explain` is passed to every chunk (see rescore_pending_credit_requests).
+    """
+    try:
+        from celery import chord, group
+        from apps.credit_requests.models import CreditRequest
+    except Exception as exc:
+        logger.exception("Missing apps: %s", exc)
+        return
+
+    ids = (
+        CreditRequest.objects.filter(status=CreditRequest.STATUS_PENDING)
+        .order_by("id")
+        .values_list("id", flat=True)
+        .iterator(chunk_size=10000)
+    )
+    ranges = []
+    first = last = None
+    count = 0
+    for pk in ids:
+        if first is None:
+            first = pk
+        last = pk
+        count += 1
+        if count == chunk_size:
+            ranges.append((first, last))
+            first, count = None, 0
+    if first is not None:
+        ranges.append((first, last))
+
+    if not ranges:
+        return {"dispatched_chunks": 0}
+
+    logger.info("Dispatching %d rescoring chunks", len(ranges))
+    if explain is None:
+        explain = getattr(settings, "RESCORE_EXPLAIN", "full")
+    header = group(rescore_credit_request_range.s(lo, hi, lease_seconds, explain) for lo, hi in ranges)
+    result = chord(header)(aggregate_rescore_results.s(time.time()))
+    return {"dispatched_chunks": len(ranges), "chord_id": result.id}
+
+
+@shared_task(bind=True)
+def rescore_credit_request_range(self, first_id: int, last_id: int, lease_seconds: int = 900, explain: str = "full") -> dict:
+    """
+    Chunk worker: claim the pending, unleased credit requests with
+    first_id <= id <= last_id, score them in one batch and save them (which
+    releases the lease). A worker that dies leaves its lease to expire so a
+    later run can pick the rows up again; a worker that outlives its lease
+    doesn't save the rows it lost ("lost" in the result).
+    """
+    try:
+        import uuid
+        from apps.credit_requests.models import CreditRequest
+        from apps.credit_requests.scoring import (
+            claim_for_rescore, needs_rescore, release_lease, score_credit_requests, save_scores,
+        )
+    except Exception as exc:
+        logger.exception("Missing apps: %s", exc)
+        return {"claimed": 0, "processed": 0, "failed": 0, "skipped": 0, "lost": 0}
+
+    token = self.request.id or uuid.uuid4().hex
+    chunk = claim_for_rescore(
+        CreditRequest.objects.filter(id__gte=first_id, id__lte=last_id, status=CreditRequest.STATUS_PENDING),
+        token, lease_seconds,
+    )
+    if not chunk:
+        return {"claimed": 0, "processed": 0, "failed": 0, "skipped": 0, "lost": 0}
+
+    stale = [cr for cr in chunk if needs_rescore(cr)]
+    skipped = len(chunk) - len(stale)
+    try:
+        processed = save_scores(
+            score_credit_requests(stale, explain=explain),
+            meta={"updated_via": "rescore_pending_credit_requests"}, lease_token=token,
+        ) if stale else 0
+    except Exception:
+        logger.exception("Failed to rescore CreditRequest ids %s-%s", first_id, last_id)
+        return {"claimed": len(chunk), "processed": 0, "failed": len(stale), "skipped": skipped, "lost": 0}
+    # unchanged rows and rows without a linked profile aren't saved; drop their lease right away
+    release_lease(token)
+    return {"claimed": len(chunk), "processed": processed, "failed": 0, "skipped": skipped, "lost": len(stale) - processed}
+
+
+@shared_task
+def aggregate_rescore_results(results, started_at: float) -> dict:
+    """Chord callback: sum chunk results and report wall time for the whole fan-out."""
+    summary = {
+        "chunks": len(results),
+        "claimed": sum(r.get("claimed", 0) for r in results),
+        "processed": sum(r.get("processed", 0) for r in results),
+        "failed": sum(r.get("failed", 0) for r in results),
+        "skipped": sum(r.get("skipped", 0) for r in results),
+        "lost": sum(r.get("lost", 0) for r in results),
+        "failed_chunks": sum(1 for r in results if r.get("failed")),
+        "wall_time_sec": round(time.time() - started_at, 3),
+    }
+    logger.info("Rescoring fan-out finished: %s", summary)
+    return summary
+
+
+@shared_task(bind=True)
+def score_credit_request(self, credit_request_id: int) -> dict:
+    """
+    Score one credit request created with async scoring and save the result
+    (plus its PredictionLog row). Marks the request failed when it can't be
+    scored so pollers of the status URL stop waiting.
+    """
+    try:
+        from apps.credit_requests.models import CreditRequest
+        from apps.credit_requests.scoring import score_credit_requests, save_scores
+    except Exception as exc:
+        logger.exception("Missing apps: %s", exc)
+        return {}
+
+    cr = CreditRequest.objects.select_related("individual", "company").filter(pk=credit_request_id).first()
+    if cr is None:
+        logger.warning("CreditRequest %s disappeared before scoring", credit_request_id)
+        return {}
+
+    try:
+        scored = score_credit_requests([cr])
+        if scored:
+            save_scores(scored, meta={"requested_amount": cr.requested_amount, "term_months": cr.term_months})
+            return {"id": cr.pk, "score": cr.score, "model_version": cr.model_version}
+        logger.warning("CreditRequest %s has no linked profile; nothing to score", credit_request_id)
+    except Exception:
+        logger.exception("Failed to score CreditRequest %s", credit_request_id)
+    CreditRequest.objects.filter(pk=credit_request_id).update(
+        scoring_status=CreditRequest.SCORING_FAILED, updated_at=timezone.now()
+    )
+    return {"id": credit_request_id, "score": None}
+
+
+@shared_task(bind=True)
+def explain_prediction_logs(self, batch_size: int = 500, limit: int = None, top_k: int = None) -> dict:
+    """
+    Fill in SHAP attributions for model-scored PredictionLog rows that don't
+    have them yet, newest first, one SHAP batch per chunk. Only rows scored by
+    the currently active models are picked up; older ones can't be explained
+    any more and are left alone. Rows already explained on demand are skipped,
+    and so are rows marked unavailable by an earlier run (attributions = []).
     """
     try:
         from apps.individuals.models import PredictionLog
+        from apps.scoring_engine.attributions import MODEL_VERSION_PREFIX, attach_attributions
+        from apps.scoring_engine.ml.risk_model import current_model_version
+    except Exception as exc:
+        logger.exception("Missing apps: %s", exc)
+        return {"explained": 0, "unavailable": 0}
+
+    versions = [v for v in (current_model_version("individual"), current_model_version("company")) if v.startswith(MODEL_VERSION_PREFIX)]
+    if not versions:
+        return {"explained": 0, "unavailable": 0}
+
+    started = time.monotonic()
+    base_qs = PredictionLog.objects.filter(attributions__isnull=True, model_version__in=versions).order_by("-id")
+    explained = unavailable = 0
+    cursor = None
+    while limit is None or explained + unavailable < limit:
+        size = batch_size if limit is None else min(batch_size, limit - explained - unavailable)
+        qs = base_qs if cursor is None else base_qs.filter(id__lt=cursor)
+        chunk = list(qs.only("id", "model_version", "meta", "attributions")[:size])
+        if not chunk:
+            break
+        cursor = chunk[-1].id
+        saved = attach_attributions(chunk, top_k=top_k)
+        explained += saved
+        unavailable += len(chunk) - saved
+
+    elapsed = time.monotonic() - started
+    summary = {
+        "explained": explained,
+        "unavailable": unavailable,
+        "rows_per_sec": round(explained / elapsed, 1) if elapsed > 0 else None,
+    }
+    logger.info("Explained model-scored predictions: %s", summary)
+    return summary
+
+
+@shared_task(bind=True, acks_late=True)
+def cleanup_prediction_logs(self, older_than_days: int = 90, batch_size: int = 5000, pause: float = None,
+                            time_budget: float = 600, after_id: int = 0, cutoff: str = None) -> dict:
+    """
+    Delete PredictionLog entries older than `older_than_days`, `batch_size`
+    ids per DELETE (see delete_logs_before). Every batch is its own short
+    transaction, followed by `pause` seconds of sleep (default
+    settings.PREDICTION_LOG_CLEANUP_PAUSE, 0.1) so the scoring views' inserts
+    aren't starved.
+
+    Resumable: nothing is left half done between batches, and the message is
+    acked only when the task finishes, so if the worker dies the redelivered
+    task starts again at the lowest remaining id. Past `time_budget` seconds
+    the task re-enqueues itself from its cursor with the same cutoff.
+    Returns deleted rows, batches, the cursor and rows deleted per second.
+    """
+    try:
+        from apps.individuals.prediction_logs import delete_logs_before
     except Exception as exc:
         logger.exception("Missing PredictionLog model: %s", exc)
-        return 0
+        return {"deleted": 0, "batches": 0, "cursor": after_id, "continued": False, "rows_per_sec": None}
+
+    if pause is None:
+        pause = getattr(settings, "PREDICTION_LOG_CLEANUP_PAUSE", 0.1)
+    cutoff_at = datetime.fromisoformat(cutoff) if cutoff else timezone.now() - timedelta(days=older_than_days)
+    started = time.monotonic()
+    cursor = after_id
+    deleted = batches = 0
+    continued = False
+
+    for count, cursor in delete_logs_before(cutoff_at, batch_size, after_id):
+        deleted += count
+        batches += 1
+        if time_budget is not None and time.monotonic() - started >= time_budget:
+            self.apply_async(kwargs={
+                "older_than_days": older_than_days,
+                "batch_size": batch_size,
+                "pause": pause,
+                "time_budget": time_budget,
+                "after_id": cursor,
+                "cutoff": cutoff_at.isoformat(),
+            })
+            continued = True
+            break
+        if pause:
+            time.sleep(pause)
 
-    cutoff = timezone.now() - timedelta(days=older_than_days)
-    qs = PredictionLog.objects.filter(created_at__lt=cutoff)
-    count = qs.count()
-    qs.delete()
-    logger.info("Deleted %d prediction logs older than %d days", count, older_than_days)
-    return count
\ No newline at end of file
+    elapsed = time.monotonic() - started
+    summary = {
+        "deleted": deleted,
+        "batches": batches,
+        "cursor": cursor,
+        "continued": continued,
+        "rows_per_sec": round(deleted / elapsed, 1) if elapsed > 0 else None,
+    }
+    logger.info("Deleted prediction logs older than %s: %s", cutoff_at.isoformat(), summary)
+    return summary
\ No newline at end of file
@@ -0,0 +1,375 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.companies.models import CompanyCreditProfile
+from apps.credit_requests.models import CreditRequest
+from apps.external_integrations.models import SoliqRecord, KadastrRecord
+from apps.individuals.models import IndividualCreditProfile, PredictionLog
+from apps.scoring_engine.ml.risk_model import predict_individual_risk, predict_company_risk
+
+from .tasks import (
+    rescore_pending_credit_requests,
+    fan_out_rescore_pending_credit_requests,
+    rescore_credit_request_range,
+    aggregate_rescore_results,
+    refresh_stale_external_records,
+    refresh_soliq_records,
+    refresh_kadastr_records,
+    explain_prediction_logs,
+    cleanup_prediction_logs,
+)
+
+
+class RescorePendingCreditRequestsTests(TestCase):
+    def setUp(self):
+        self.individual = IndividualCreditProfile.objects.create(
+            full_name="Pending Person",
+            yearly_income=1000000,
+            existing_debt=300000,
+            collateral_value=50000,
+            credit_history_score=720,
+        )
+        self.company = CompanyCreditProfile.objects.create(
+            company_name="Pending Co",
+            revenue=5000000,
+            net_income=800000,
+            assets=3000000,
+            liabilities=2500000,
+        )
+
+    def _create_requests(self, n):
+        requests = []
+        for i in range(n):
+            if i % 2:
+                requests.append(CreditRequest(applicant_type="company", company=self.company, requested_amount=1000 * (i + 1)))
+            else:
+                requests.append(CreditRequest(applicant_type="individual", individual=self.individual, requested_amount=1000 * (i + 1)))
+        return CreditRequest.objects.bulk_create(requests)
+
+    def test_rescores_whole_backlog_in_chunks(self):
+        self._create_requests(7)
+        CreditRequest.objects.create(applicant_type="individual", requested_amount=5000)  # no profile: skipped
+        approved = self._create_requests(1)[0]
+        CreditRequest.objects.filter(pk=approved.pk).update(status=CreditRequest.STATUS_APPROVED)
+
+        summary = rescore_pending_credit_requests(chunk_size=3)
+
+        self.assertEqual(summary["processed"], 7)
+        self.assertEqual(summary["failed"], 0)
+        self.assertFalse(summary["continued"])
+        for cr in CreditRequest.objects.filter(individual__isnull=False, status=CreditRequest.STATUS_PENDING):
+            features = {
+                "yearly_income": 1000000, "existing_debt": 300000, "requested_amount": cr.requested_amount,
+                "collateral_value": 50000, "credit_history_score": 720, "criminal_history": False,
+            }
+            self.assertEqual((cr.score, cr.explanation, cr.model_version), predict_individual_risk(features))
+        for cr in CreditRequest.objects.filter(company__isnull=False):
+            features = {"revenue": 5000000, "net_income": 800000, "assets": 3000000, "liabilities": 2500000}
+            self.assertEqual(cr.score, predict_company_risk(features)[0])
+        self.assertIsNone(CreditRequest.objects.get(pk=approved.pk).score)
+        self.assertEqual(PredictionLog.objects.filter(credit_request__isnull=False).count(), 7)
+        self.assertEqual(PredictionLog.objects.filter(profile=self.individual).count(), 4)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self._create_requests(3)
+        with CaptureQueriesContext(connection) as small:
+            rescore_pending_credit_requests(chunk_size=100)
+        CreditRequest.objects.all().delete()
+        self._create_requests(30)
+        with CaptureQueriesContext(connection) as large:
+            rescore_pending_credit_requests(chunk_size=100)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_limit_and_cursor(self):
+        created = self._create_requests(5)
+        summary = rescore_pending_credit_requests(limit=2, chunk_size=10)
+        self.assertEqual(summary["processed"], 2)
+        self.assertEqual(summary["cursor"], created[1].id)
+        summary = rescore_pending_credit_requests(chunk_size=10, after_id=summary["cursor"])
+        self.assertEqual(summary["processed"], 3)
+        self.assertFalse(CreditRequest.objects.filter(score__isnull=True).exists())
+
+    def test_unchanged_rows_are_skipped(self):
+        self._create_requests(4)
+        self.assertEqual(rescore_pending_credit_requests()["processed"], 4)
+        logs = PredictionLog.objects.count()
+
+        summary = rescore_pending_credit_requests()
+        self.assertEqual((summary["processed"], summary["skipped"]), (0, 4))
+        self.assertEqual(PredictionLog.objects.count(), logs)
+
+        # a changed scoring input rescored only the requests that depend on it
+        IndividualCreditProfile.objects.filter(pk=self.individual.pk).update(existing_debt=900000)
+        summary = rescore_pending_credit_requests()
+        self.assertEqual((summary["processed"], summary["skipped"]), (2, 2))
+
+    def test_explain_modes(self):
+        self._create_requests(4)
+        rescore_pending_credit_requests(explain="none")
+        self.assertFalse(CreditRequest.objects.filter(explanation__isnull=False).exists())
+        self.assertFalse(PredictionLog.objects.filter(explanation__isnull=False).exists())
+
+        CreditRequest.objects.update(feature_fingerprint=None)
+        rescore_pending_credit_requests(explain="top_k")
+        for cr in CreditRequest.objects.all():
+            self.assertLessEqual(len(cr.explanation), 3)
+            impacts = [abs(item["impact"]) for item in cr.explanation]
+            self.assertEqual(impacts, sorted(impacts, reverse=True))
+
+    def test_process_pool_matches_in_process(self):
+        self._create_requests(9)
+        summary = rescore_pending_credit_requests(chunk_size=4, workers=2)
+        self.assertEqual((summary["processed"], summary["failed"]), (9, 0))
+        pooled = list(CreditRequest.objects.order_by("id").values_list("score", "explanation"))
+
+        CreditRequest.objects.update(feature_fingerprint=None)
+        rescore_pending_credit_requests(chunk_size=4, workers=0)
+        self.assertEqual(list(CreditRequest.objects.order_by("id").values_list("score", "explanation")), pooled)
+
+    def test_management_command(self):
+        self._create_requests(5)
+        out = StringIO()
+        call_command("rescore_credit_requests", "--workers", "2", "--chunk-size", "2", "--explain", "none", stdout=out)
+        self.assertIn("processed=5 failed=0 skipped=0", out.getvalue())
+        self.assertFalse(CreditRequest.objects.filter(score__isnull=True).exists())
+        with self.assertRaises(CommandError):
+            call_command("rescore_credit_requests", "--workers", "0", "--explain", "verbose", stdout=out)
+
+    def test_rejects_unknown_explain_mode(self):
+        with self.assertRaises(ValueError):
+            rescore_pending_credit_requests(explain="verbose")
+
+
+class ExplainPredictionLogsTests(TestCase):
+    def setUp(self):
+        from sklearn.ensemble import GradientBoostingClassifier
+        from apps.scoring_engine.ml import risk_model
+
+        rng = np.random.default_rng(1)
+        X = rng.normal(size=(200, 8)) * 1e5
+        model = GradientBoostingClassifier(n_estimators=10, random_state=0).fit(X, (X[:, 0] > 0).astype(int))
+        risk_model.individual_models.activate(model, "individual_model.joblib@task")
+        self.addCleanup(risk_model.individual_models.reset)
+        self.addCleanup(risk_model.tree_explainers.clear)
+        self.profile = IndividualCreditProfile.objects.create(full_name="Task Person", yearly_income=1)
+
+    def _log(self, model_version, **meta):
+        return PredictionLog.objects.create(
+            profile=self.profile, score=50, model_version=model_version,
+            meta={"raw_features": {"yearly_income": 500000, "existing_debt": 1000}, **meta},
+        )
+
+    def test_explains_pending_rows_of_the_active_model(self):
+        current = [self._log("joblib:individual_model.joblib@task") for _ in range(5)]
+        old = self._log("joblib:individual_model.joblib@old")
+        rules = self._log("rule/v1")
+
+        summary = explain_prediction_logs(batch_size=2)
+        self.assertEqual((summary["explained"], summary["unavailable"]), (5, 0))
+        for log in current:
+            self.assertTrue(PredictionLog.objects.get(pk=log.pk).attributions)
+        self.assertIsNone(PredictionLog.objects.get(pk=old.pk).attributions)
+        self.assertIsNone(PredictionLog.objects.get(pk=rules.pk).attributions)
+        self.assertEqual(explain_prediction_logs()["explained"], 0)
+
+    def test_unexplainable_rows_are_marked_and_not_read_again(self):
+        version = "joblib:individual_model.joblib@task"
+        no_features = PredictionLog.objects.create(profile=self.profile, score=50, model_version=version, meta={})
+        unparseable = PredictionLog.objects.create(
+            profile=self.profile, score=50, model_version=version, meta={"raw_features": {"yearly_income": "n/a"}},
+        )
+        explainable = self._log(version)
+
+        summary = explain_prediction_logs()
+        self.assertEqual((summary["explained"], summary["unavailable"]), (1, 2))
+        self.assertEqual(PredictionLog.objects.get(pk=no_features.pk).attributions, [])
+        self.assertEqual(PredictionLog.objects.get(pk=unparseable.pk).attributions, [])
+        self.assertTrue(PredictionLog.objects.get(pk=explainable.pk).attributions)
+        summary = explain_prediction_logs()
+        self.assertEqual((summary["explained"], summary["unavailable"]), (0, 0))
+
+    def test_limit(self):
+        for _ in range(3):
+            self._log("joblib:individual_model.joblib@task")
+        self.assertEqual(explain_prediction_logs(limit=2)["explained"], 2)
+        self.assertEqual(PredictionLog.objects.filter(attributions__isnull=True).count(), 1)
+
+
+class RescoreFanOutTests(TestCase):
+    def setUp(self):
+        self.individual = IndividualCreditProfile.objects.create(
+            full_name="Fan Out", yearly_income=900000, existing_debt=100000, credit_history_score=610,
+        )
+        self.requests = CreditRequest.objects.bulk_create(
+            CreditRequest(applicant_type="individual", individual=self.individual, requested_amount=1000 * (i + 1))
+            for i in range(6)
+        )
+
+    def test_range_worker_scores_and_releases_lease(self):
+        ids = [cr.id for cr in self.requests]
+        result = rescore_credit_request_range(ids[0], ids[2])
+        self.assertEqual(result, {"claimed": 3, "processed": 3, "failed": 0, "skipped": 0, "lost": 0})
+        scored = CreditRequest.objects.filter(score__isnull=False)
+        self.assertEqual(sorted(scored.values_list("id", flat=True)), ids[:3])
+        self.assertFalse(CreditRequest.objects.filter(rescore_lease_token__isnull=False).exists())
+
+    def test_leased_rows_are_not_double_scored(self):
+        ids = [cr.id for cr in self.requests]
+        CreditRequest.objects.filter(id=ids[1]).update(
+            rescore_lease_token="other-run", rescore_lease_expires_at=timezone.now() + timedelta(minutes=5)
+        )
+        CreditRequest.objects.filter(id=ids[2]).update(
+            rescore_lease_token="dead-run", rescore_lease_expires_at=timezone.now() - timedelta(minutes=5)
+        )
+        result = rescore_credit_request_range(ids[0], ids[-1])
+        self.assertEqual(result["claimed"], 5)
+        self.assertIsNone(CreditRequest.objects.get(id=ids[1]).score)
+        self.assertIsNotNone(CreditRequest.objects.get(id=ids[2]).score)
+        self.assertFalse(PredictionLog.objects.filter(credit_request_id=ids[1]).exists())
+
+        # the sequential task respects the lease as well (and finds the rest up to date)
+        summary = rescore_pending_credit_requests()
+        self.assertEqual((summary["processed"], summary["skipped"]), (0, 5))
+        self.assertIsNone(CreditRequest.objects.get(id=ids[1]).score)
+
+    def _steal_lease_while_scoring(self, stolen_id):
+        from apps.credit_requests import scoring
+
+        real = scoring.score_credit_requests
+
+        def slow_scoring(stale, **kwargs):
+            # this run overran its lease and another run re-claimed one row meanwhile
+            self.assertTrue(all(cr.rescore_lease_token for cr in stale))
+            CreditRequest.objects.filter(id=stolen_id).update(
+                rescore_lease_token="other-run", rescore_lease_expires_at=timezone.now() + timedelta(minutes=5)
+            )
+            return real(stale, **kwargs)
+
+        return mock.patch.object(scoring, "score_credit_requests", slow_scoring)
+
+    def test_rows_whose_lease_was_lost_are_not_saved(self):
+        ids = [cr.id for cr in self.requests]
+        with self._steal_lease_while_scoring(ids[1]):
+            result = rescore_credit_request_range(ids[0], ids[2])
+        self.assertEqual((result["processed"], result["lost"]), (2, 1))
+        self.assertIsNone(CreditRequest.objects.get(id=ids[1]).score)
+        self.assertEqual(CreditRequest.objects.get(id=ids[1]).rescore_lease_token, "other-run")
+        self.assertFalse(PredictionLog.objects.filter(credit_request_id=ids[1]).exists())
+
+    def test_sequential_run_leases_its_chunks(self):
+        ids = [cr.id for cr in self.requests]
+        with self._steal_lease_while_scoring(ids[0]):
+            summary = rescore_pending_credit_requests(chunk_size=3)
+        self.assertEqual((summary["processed"], summary["skipped"]), (5, 1))
+        self.assertFalse(PredictionLog.objects.filter(credit_request_id=ids[0]).exists())
+        self.assertEqual(CreditRequest.objects.filter(rescore_lease_token__isnull=False).count(), 1)
+
+    def test_fan_out_dispatches_chord_over_id_ranges(self):
+        with mock.patch("celery.chord") as chord:
+            chord.return_value.return_value.id = "chord-1"
+            result = fan_out_rescore_pending_credit_requests(chunk_size=4)
+        self.assertEqual(result, {"dispatched_chunks": 2, "chord_id": "chord-1"})
+        header = list(chord.call_args.args[0].tasks)
+        ids = [cr.id for cr in self.requests]
+        self.assertEqual([tuple(sig.args[:2]) for sig in header], [(ids[0], ids[3]), (ids[4], ids[5])])
+
+    def test_aggregate_results(self):
+        summary = aggregate_rescore_results(
+            [{"claimed": 3, "processed": 3, "failed": 0}, {"claimed": 2, "processed": 0, "failed": 2}], 0.0
+        )
+        self.assertEqual(summary["processed"], 3)
+        self.assertEqual(summary["failed"], 2)
+        self.assertEqual(summary["failed_chunks"], 1)
+
+
+class RefreshStaleExternalRecordsTests(TestCase):
+    def _record(self, model, age_days, **fields):
+        rec = model.objects.create(**fields)
+        model.objects.filter(pk=rec.pk).update(fetched_at=timezone.now() - timedelta(days=age_days))
+        return rec
+
+    def test_dispatches_distinct_stale_keys_in_bounded_waves(self):
+        for inn in ("100", "101", "102", "103", "104"):
+            self._record(SoliqRecord, 40, inn=inn)
+        self._record(SoliqRecord, 1, inn="105")  # refreshed recently: not stale
+        self._record(KadastrRecord, 40, parcel_id="P-1")
+
+        with mock.patch("celery.group") as group, mock.patch("celery.chord") as chord:
+            summary = refresh_stale_external_records(ttl_days=30, chunk_size=2, max_in_flight=2, wave_interval=10)
+        self.assertEqual(summary, {"soliq": 2, "kadastr": 1})
+        soliq_wave, kadastr_wave = [list(c.args[0]) for c in group.call_args_list]
+        self.assertEqual([sig.args for sig in soliq_wave], [(["100", "101"],), (["102", "103"],)])
+        self.assertEqual([sig.args for sig in kadastr_wave], [(["P-1"],)])
+        # a full wave continues through a chord; the short kadastr wave is the last one
+        chord.assert_called_once()
+        next_wave = chord.return_value.call_args.args[0]
+        self.assertEqual((next_wave.kwargs["sources"], next_wave.kwargs["after"]), (["soliq"], "103"))
+        self.assertEqual(next_wave.options["countdown"], 10)
+        group.return_value.apply_async.assert_called_once()
+
+        # the next wave only picks up keys after the cursor, with the first run's cutoff
+        self._record(SoliqRecord, 40, inn="099")
+        with mock.patch("celery.group") as group, mock.patch("celery.chord") as chord:
+            summary = refresh_stale_external_records(*next_wave.args, **next_wave.kwargs)
+        self.assertEqual(summary, {"soliq": 1})
+        self.assertEqual([sig.args for sig in group.call_args.args[0]], [(["104"],)])
+        chord.assert_not_called()
+
+    def test_chunk_task_refreshes_fetched_at(self):
+        rec = self._record(SoliqRecord, 40, inn="200")
+        self.assertEqual(refresh_soliq_records(["200"]), 1)
+        rec.refresh_from_db()
+        self.assertGreater(rec.fetched_at, timezone.now() - timedelta(minutes=1))
+
+
+class BulkUpsertExternalRecordsTests(TestCase):
+    def test_chunk_upserts_in_one_statement(self):
+        SoliqRecord.objects.create(inn="300", name="old", data={})
+        with self.assertNumQueries(1):
+            self.assertEqual(refresh_soliq_records(["300", "301", "301", "302"]), 3)
+        self.assertEqual(SoliqRecord.objects.count(), 3)
+        rec = SoliqRecord.objects.get(inn="300")
+        self.assertEqual(rec.name, "Entity 300")
+        self.assertEqual(rec.data["inn"], "300")
+
+    def test_kadastr_chunk_upsert(self):
+        KadastrRecord.objects.create(parcel_id="P-9", owner_name="old")
+        with self.assertNumQueries(1):
+            self.assertEqual(refresh_kadastr_records(["P-9", "P-10"]), 2)
+        self.assertEqual(KadastrRecord.objects.get(parcel_id="P-9").owner_name, "Owner P-9")
+        self.assertEqual(KadastrRecord.objects.count(), 2)
+
+
+class CleanupPredictionLogsTests(TestCase):
+    def test_deletes_only_old_logs(self):
+        logs = PredictionLog.objects.bulk_create([PredictionLog(score=i) for i in range(7)])
+        PredictionLog.objects.filter(id__in=[log.id for log in logs[:5]]).update(created_at=timezone.now() - timedelta(days=120))
+        summary = cleanup_prediction_logs(older_than_days=90, batch_size=2, pause=0)
+        self.assertEqual((summary["deleted"], summary["batches"], summary["continued"]), (5, 3, False))
+        self.assertEqual(summary["cursor"], logs[5].id)
+        self.assertIsNotNone(summary["rows_per_sec"])
+        self.assertEqual(set(PredictionLog.objects.values_list('id', flat=True)), {logs[5].id, logs[6].id})
+
+    def test_continues_from_cursor_with_the_same_cutoff(self):
+        logs = PredictionLog.objects.bulk_create([PredictionLog(score=i) for i in range(6)])
+        PredictionLog.objects.update(created_at=timezone.now() - timedelta(days=120))
+        with mock.patch.object(cleanup_prediction_logs, 'apply_async') as apply_async:
+            summary = cleanup_prediction_logs(older_than_days=90, batch_size=2, pause=0, time_budget=0)
+        self.assertEqual((summary["deleted"], summary["continued"], summary["cursor"]), (2, True, logs[1].id))
+        kwargs = apply_async.call_args.kwargs["kwargs"]
+        self.assertEqual(kwargs["after_id"], logs[1].id)
+
+        # the continuation (or a redelivered run) picks up where this one stopped
+        summary = cleanup_prediction_logs(**kwargs | {"time_budget": None})
+        self.assertEqual(summary["deleted"], 4)
+        self.assertFalse(PredictionLog.objects.exists())
+